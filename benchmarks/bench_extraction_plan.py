@@ -0,0 +1,36 @@
+import argparse
+import os
+import tempfile
+import pandas as pd
+from utils.parser import PATHWAYS_SPEC, PRODUCTS_SPEC, Parser
+from benchmarks.fixtures import best_of, build_fixture
+
+# the extractions done in analysis.ipynb
+SPECS = {
+    "products": PRODUCTS_SPEC,
+    "pathways": PATHWAYS_SPEC,
+    "synonyms": dict(prefix_path=".", nested_fields={"synonyms": "db:synonyms/db:synonym"}, drug_id=None),
+    "targets": dict(prefix_path="db:targets/db:target", simple_fields={"target-id": "db:id", "target-name": "db:name"}),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compiled extraction plans against ElementPath lookups.')
+    parser.add_argument('--num_drugs', type=int, default=20000, help='Number of mock drugs in the generated file')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported')
+    parser.add_argument('--fixture', type=str, default=None, help='Existing DrugBank file to use instead of a generated one')
+    args = parser.parse_args()
+
+    path = args.fixture or build_fixture(
+        os.path.join(tempfile.gettempdir(), f"bench_drugbank_{args.num_drugs}.xml"), args.num_drugs
+    )
+    drugbank = Parser(path)
+
+    print(f"{'spec':<10} {'rows':>8} {'elementpath':>12} {'compiled':>10} {'speedup':>8}")
+    for name, spec in SPECS.items():
+        reference_time, reference = best_of(args.repeat, lambda: drugbank.extract(**spec, compiled=False))
+        compiled_time, compiled = best_of(args.repeat, lambda: drugbank.extract(**spec))
+        pd.testing.assert_frame_equal(compiled, reference)
+        print(f"{name:<10} {len(compiled):>8} {reference_time:>11.3f}s {compiled_time:>9.3f}s {reference_time / compiled_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
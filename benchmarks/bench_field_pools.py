@@ -0,0 +1,42 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from utils.parser import Parser
+from benchmarks.fixtures import build_fixture
+
+def measure(path, **kwargs):
+    # streaming parser, so only the collected field data is measured and not the DOM
+    parser = Parser(path, streaming=True)
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = parser.extract_fields_and_types(**kwargs)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory of extract_fields_and_types with lists vs FieldPools.')
+    parser.add_argument('--num_drugs', type=int, default=20000, help='Number of mock drugs in the generated file')
+    parser.add_argument('--nested_cap', type=int, default=100, help='Cap of the nested pools in the capped run')
+    parser.add_argument('--fixture', type=str, default=None, help='Existing DrugBank file to use instead of a generated one')
+    args = parser.parse_args()
+
+    path = args.fixture or build_fixture(
+        os.path.join(tempfile.gettempdir(), f"bench_drugbank_{args.num_drugs}.xml"), args.num_drugs
+    )
+    runs = {
+        "lists": {},
+        "pools": {"compact": True},
+        f"pools, cap {args.nested_cap}": {"compact": True, "nested_cap": args.nested_cap},
+    }
+    print(f"{'mode':<16} {'time':>8} {'retained MiB':>13} {'peak MiB':>9}")
+    for name, kwargs in runs.items():
+        elapsed, retained, peak = measure(path, **kwargs)
+        print(f"{name:<16} {elapsed:>7.2f}s {retained / 2**20:>13.1f} {peak / 2**20:>9.1f}")
+
+if __name__ == "__main__":
+    main()
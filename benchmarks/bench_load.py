@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from benchmarks.fixtures import build_fixture
+from utils.offset_index import OffsetIndex
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# how a request of each endpoint is made for a drug id
+ENDPOINTS = {
+    "pathways": lambda client, drug_id: client.post("/pathways/", json={"id": drug_id}),
+    "drug": lambda client, drug_id: client.get(f"/drugs/{drug_id}"),
+    "drug_field": lambda client, drug_id: client.get(f"/drugs/{drug_id}/pathways"),
+    "drug_xml": lambda client, drug_id: client.get(f"/drugs/{drug_id}/xml"),
+}
+
+def percentile(values, q):
+    """q-th percentile (0-100) of sorted values, nearest rank."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+class RequestMix():
+    """
+        Draws (endpoint, drug id) pairs: ids of existing drugs with a Zipf-like skew,
+        so a few hundred ids get most of the traffic, and a miss_ratio share of unknown ids (404s).
+    """
+    def __init__(self, ids, weights, miss_ratio, skew=1.1, seed=0):
+        self.random = random.Random(seed)
+        self.ids = list(ids)
+        self.random.shuffle(self.ids)
+        self.id_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(len(self.ids))))
+        self.endpoints = list(weights)
+        self.endpoint_weights = list(itertools.accumulate(weights[name] for name in self.endpoints))
+        self.miss_ratio = miss_ratio
+
+    def draw(self):
+        # cumulative weights, so a draw is a bisection instead of a pass over all ids
+        endpoint = self.random.choices(self.endpoints, cum_weights=self.endpoint_weights)[0]
+        if not self.ids or self.random.random() < self.miss_ratio:
+            return endpoint, f"DB9{self.random.randrange(10**7):07d}"
+        return endpoint, self.random.choices(self.ids, cum_weights=self.id_weights)[0]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(path, port, workers, cache_dir, shared, background_index):
+    """Starts server.py (or serve.py with shared) on path in a new process, the cache dir decides between a cold and a warm start."""
+    env = dict(os.environ, DRUGBANK_FILE=path, DRUGBANK_CACHE_DIR=cache_dir)
+    if background_index:
+        env["DRUGBANK_INDEX_BACKGROUND"] = "1"
+    if shared:
+        command = [sys.executable, "serve.py", "--input", path, "--cache_dir", cache_dir, "--workers", str(workers)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "server:app", "--workers", str(workers)]
+    command += ["--host", "127.0.0.1", "--port", str(port)]
+    # logged to a file, a full pipe would block the server
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    process.log = log
+    return process
+
+def _read_kib(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+def worker_memory(pid):
+    """
+        RSS and PSS in MiB of every worker of the server process pid (the process itself with a single worker).
+        PSS splits shared pages between the processes mapping them, so it shows what a worker really adds.
+        Read from /proc, empty where it isn't available.
+    """
+    if not os.path.isdir("/proc"):
+        return []
+    workers = _children(pid) or [pid]
+    memory = []
+    for worker in workers:
+        rss = _read_kib(f"/proc/{worker}/status", "VmRSS")
+        pss = _read_kib(f"/proc/{worker}/smaps_rollup", "Pss")
+        memory.append({
+            "pid": worker,
+            "rss_mib": rss / 1024 if rss is not None else None,
+            "pss_mib": pss / 1024 if pss is not None else None,
+        })
+    return memory
+
+async def wait_for_first_success(client, process, mix, timeout):
+    """
+        Polls until a request for an existing drug succeeds, returns the seconds the port took to open
+        and the seconds until the first successful response, both from now.
+    """
+    import httpx
+
+    start = time.perf_counter()
+    port_open = None
+    drug_id = mix.ids[0] if mix.ids else "DB00001"
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            process.log.seek(0)
+            raise RuntimeError(f"server exited with {process.returncode}: {process.log.read().decode(errors='replace')}")
+        try:
+            response = await ENDPOINTS["pathways"](client, drug_id)
+        except httpx.TransportError:
+            await asyncio.sleep(0.05)
+            continue
+        if port_open is None:
+            port_open = time.perf_counter() - start
+        if response.status_code == 200:
+            return port_open, time.perf_counter() - start
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"no successful response in {timeout}s")
+
+async def drive(client, mix, duration, rate, concurrency):
+    """
+        Sends requests for duration seconds. Returns (endpoint, status, seconds) per request.
+        With a rate, requests go out at rate per second whatever the server does (open loop)
+        and their latency counts from the time they were scheduled, so requests queued behind
+        a slow server aren't left out (coordinated omission). Connections are still capped
+        by the client pool, waiting for one is part of the latency.
+        With rate 0 at most concurrency requests are in flight, each sent as soon as another one finishes.
+    """
+    import httpx
+
+    results = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(endpoint, drug_id, scheduled):
+        try:
+            try:
+                response = await ENDPOINTS[endpoint](client, drug_id)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            results.append((endpoint, status, time.perf_counter() - scheduled))
+        finally:
+            if rate <= 0:
+                semaphore.release()
+
+    tasks = []
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < duration:
+        if rate > 0:
+            scheduled = start + sent / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await semaphore.acquire()
+            scheduled = time.perf_counter()
+        tasks.append(asyncio.create_task(send(*mix.draw(), scheduled)))
+        sent += 1
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+def summarize(results, elapsed):
+    """Throughput, status counts and latency percentiles (in ms) overall and by endpoint."""
+    def latency(rows):
+        latencies = sorted(seconds for _, _, seconds in rows)
+        return {
+            "requests": len(rows),
+            "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+            "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+            "max_ms": latencies[-1] * 1000 if latencies else None,
+        }
+
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [row for row in results if row[1] in (200, 404)]
+    return {
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "statuses": statuses,
+        "latency": latency(ok),
+        "endpoints": {
+            endpoint: latency([row for row in ok if row[0] == endpoint])
+            for endpoint in sorted({row[0] for row in results})
+        },
+    }
+
+async def run(args, path, mix):
+    import httpx
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="drugbank_load_cache_")
+    port = free_port()
+    process = start_server(path, port, args.workers, cache_dir, args.shared, args.background_index)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    # no pool timeout, with a rate the requests waiting for a connection are part of the measured latency
+    timeout = httpx.Timeout(args.request_timeout, pool=None)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+            port_open, first_success = await wait_for_first_success(client, process, mix, args.startup_timeout)
+            # the first requests after startup hit the cold caches of every worker
+            cold, cold_elapsed = await drive(client, mix, args.warmup, args.rate, args.concurrency)
+            memory_before = worker_memory(process.pid)
+            results, elapsed = await drive(client, mix, args.duration, args.rate, args.concurrency)
+            memory_after = worker_memory(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        process.log.close()
+    return {
+        "port_open_seconds": port_open,
+        "time_to_first_success_seconds": first_success,
+        "cold": summarize(cold, cold_elapsed),
+        "steady": summarize(results, elapsed),
+        "memory_after_warmup": memory_before,
+        "memory_after_run": memory_after,
+    }
+
+def print_report(report):
+    def line(name, latency):
+        if not latency["requests"]:
+            return f"  {name:<12} {'no requests':>10}"
+        return (
+            f"  {name:<12} {latency['requests']:>8} req  p50 {latency['p50_ms']:8.2f} ms  "
+            f"p95 {latency['p95_ms']:8.2f} ms  p99 {latency['p99_ms']:8.2f} ms  max {latency['max_ms']:8.2f} ms"
+        )
+
+    print(f"port open after {report['port_open_seconds']:.2f}s, first success after {report['time_to_first_success_seconds']:.2f}s")
+    for phase in ("cold", "steady"):
+        summary = report[phase]
+        print(f"{phase}: {summary['throughput_rps']:.1f} req/s over {summary['elapsed_seconds']:.1f}s, statuses {summary['statuses']}")
+        print(line("all", summary["latency"]))
+        for endpoint, latency in summary["endpoints"].items():
+            print(line(endpoint, latency))
+    for worker in report["memory_after_run"]:
+        rss = f"{worker['rss_mib']:.1f}" if worker["rss_mib"] is not None else "?"
+        pss = f"{worker['pss_mib']:.1f}" if worker["pss_mib"] is not None else "?"
+        print(f"worker {worker['pid']}: rss {rss} MiB, pss {pss} MiB")
+
+def parse_mix(items):
+    weights = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name}, expected one of {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of server.py on a generated mock DrugBank with an async client.')
+    parser.add_argument('--num_drugs', type=int, default=10000, help='Number of mock drugs in the generated file')
+    parser.add_argument('--fixture', type=str, default=None, help='Existing DrugBank file to use instead of a generated one')
+    parser.add_argument('--fixture_dir', type=str, default=tempfile.gettempdir(), help='Directory of the generated files')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Cache dir of the server, by default a new empty one (cold start)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of server processes')
+    parser.add_argument('--shared', action='store_true', help='Start serve.py, workers attach to one shared snapshot of the tables')
+    parser.add_argument('--background_index', action='store_true', help='Accept connections right away and answer 503 until the data is built')
+    parser.add_argument('--rate', type=float, default=0, help='Requests per second, 0 sends as fast as --concurrency allows')
+    parser.add_argument('--concurrency', type=int, default=32, help='Most requests in flight at once, and connections of the client')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of the measured run')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of the cold phase right after startup, reported apart')
+    parser.add_argument('--miss_ratio', type=float, default=0.1, help='Share of requests for unknown ids (404)')
+    parser.add_argument('--mix', type=str, nargs='+', default=['pathways=8', 'drug=2'], help='Endpoint weights, e.g. pathways=8 drug=1 drug_xml=1')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the request mix')
+    parser.add_argument('--startup_timeout', type=float, default=600, help='Seconds to wait for the first successful response')
+    parser.add_argument('--request_timeout', type=float, default=30, help='Seconds before a request counts as failed')
+    parser.add_argument('--output', type=str, default=None, help='JSON file the report is written to')
+    args = parser.parse_args()
+
+    path = args.fixture or build_fixture(os.path.join(args.fixture_dir, f"bench_drugbank_{args.num_drugs}.xml"), args.num_drugs)
+    # ids come from a raw scan, nothing is parsed in this process
+    ids = list(OffsetIndex.build(path).positions)
+    mix = RequestMix(ids, parse_mix(args.mix), args.miss_ratio, seed=args.seed)
+
+    report = asyncio.run(run(args, os.path.abspath(path), mix))
+    report["meta"] = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "file": path,
+        "drugs": len(ids),
+        **{key: value for key, value in vars(args).items() if key not in ("output",)},
+    }
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
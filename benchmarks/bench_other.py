@@ -0,0 +1,74 @@
+import argparse
+import os
+import tempfile
+import pandas as pd
+from utils.parser import Parser
+from utils.other import get_pathway_id_df, get_id_to_synonyms_df, get_id_name_map
+from benchmarks.fixtures import best_of, build_fixture
+
+# the name-merge versions the helpers replaced, kept here as the reference
+
+def merge_pathway_id_df(parser):
+    pathways_df = parser.extract(
+        "db:pathways/db:pathway",
+        simple_fields={"pathway-name": "db:name"},
+        nested_fields={"drugs": "db:drugs/db:drug/db:name"},
+        drug_id=None,
+        drug_name=None,
+    ).explode("drugs")
+    id_name_df = parser.extract_id_name_df()
+    id_pathways_df = pd.merge(id_name_df, pathways_df, left_on="name", right_on="drugs", how="left")
+    id_no_pathways = id_pathways_df.drop(columns=["name", "drugs"]).groupby("id")["pathway-name"].count()
+    id_no_pathways.sort_values(ascending=False, inplace=True)
+    return id_no_pathways
+
+def merge_id_to_synonyms_df(parser):
+    id_name_df = parser.extract_id_name_df()
+    id_to_synonyms_df = parser.extract(".", nested_fields={"synonyms": "db:synonyms/db:synonym"}, drug_id=None)
+    return pd.merge(id_name_df, id_to_synonyms_df, on="name", how="inner")
+
+class FrozenParser():
+    """Returns precomputed tables, so only the joins and counts are timed."""
+    def __init__(self, parser):
+        self.tables = {}
+        self.parser = parser
+
+    def extract(self, *args, **kwargs):
+        key = repr((args, sorted(kwargs.items())))
+        if key not in self.tables:
+            self.tables[key] = self.parser.extract(*args, **kwargs)
+        return self.tables[key].copy()
+
+    def extract_id_name_df(self):
+        if "id_name" not in self.tables:
+            self.tables["id_name"] = self.parser.extract_id_name_df()
+        return self.tables["id_name"].copy()
+
+def main():
+    parser = argparse.ArgumentParser(description='Integer-code helpers of utils.other against the name merges.')
+    parser.add_argument('--num_drugs', type=int, default=20000, help='Number of mock drugs in the generated file')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+    parser.add_argument('--fixture', type=str, default=None, help='Existing DrugBank file to use instead of a generated one')
+    args = parser.parse_args()
+
+    path = args.fixture or build_fixture(
+        os.path.join(tempfile.gettempdir(), f"bench_drugbank_{args.num_drugs}.xml"), args.num_drugs
+    )
+    frozen = FrozenParser(Parser(path))
+    # warm up the extractions and the shared id/name map
+    get_id_name_map(frozen)
+    merge_pathway_id_df(frozen)
+    merge_id_to_synonyms_df(frozen)
+
+    print(f"{'helper':<22} {'merge':>9} {'codes':>9} {'speedup':>8}")
+    for name, reference, helper, check in [
+        ("get_pathway_id_df", merge_pathway_id_df, get_pathway_id_df, pd.testing.assert_series_equal),
+        ("get_id_to_synonyms_df", merge_id_to_synonyms_df, get_id_to_synonyms_df, pd.testing.assert_frame_equal),
+    ]:
+        reference_time, expected = best_of(args.repeat, lambda: reference(frozen))
+        helper_time, result = best_of(args.repeat, lambda: helper(frozen))
+        check(result, expected)
+        print(f"{name:<22} {reference_time:>8.4f}s {helper_time:>8.4f}s {reference_time / helper_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from utils.parser import Parser
+from benchmarks.fixtures import build_fixture
+from benchmarks.bench_extraction_plan import SPECS
+
+def run(path, workers, chunk_size):
+    parser = Parser(path, workers=workers, chunk_size=chunk_size) if workers else Parser(path)
+    return parser.extract_many(list(SPECS.values()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling of the process-pool parser over the number of workers.')
+    parser.add_argument('--num_drugs', type=int, default=20000, help='Number of mock drugs in the generated file')
+    parser.add_argument('--max_workers', type=int, default=os.cpu_count(), help='Largest worker count to try')
+    parser.add_argument('--chunk_size', type=int, default=None, help='Drugs per chunk, by default a few chunks per worker')
+    parser.add_argument('--fixture', type=str, default=None, help='Existing DrugBank file to use instead of a generated one')
+    args = parser.parse_args()
+
+    path = args.fixture or build_fixture(
+        os.path.join(tempfile.gettempdir(), f"bench_drugbank_{args.num_drugs}.xml"), args.num_drugs
+    )
+
+    # serial baseline includes the full ET.parse, like the parallel runs include chunk parsing
+    start = time.perf_counter()
+    expected = run(path, None, None)
+    serial_time = time.perf_counter() - start
+    print(f"{'workers':>7} {'time':>9} {'speedup':>8}")
+    print(f"{'serial':>7} {serial_time:>8.3f}s {1:>7.2f}x")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        results = run(path, workers, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        for result, reference in zip(results, expected):
+            pd.testing.assert_frame_equal(result, reference)
+        print(f"{workers:>7} {elapsed:>8.3f}s {serial_time / elapsed:>7.2f}x")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from utils.parser import Parser
+from utils.other import get_pathway_id_df, get_id_to_synonyms_df
+from benchmarks.fixtures import best_of, build_fixture
+from benchmarks.bench_extraction_plan import SPECS
+
+# metrics compared against the baseline, a higher value is worse for all of them
+COMPARED_METRICS = ("seconds", "peak_mib")
+
+# every parser entry point, each case gets a fresh Parser over the already parsed tree,
+# so memoized state (like the id/name map of utils.other) is rebuilt on every run
+CASES = {
+    "extract_products": lambda parser: parser.extract(**SPECS["products"]),
+    "extract_pathways": lambda parser: parser.extract(**SPECS["pathways"]),
+    "extract_targets": lambda parser: parser.extract(**SPECS["targets"]),
+    "extract_proteins": lambda parser: parser.extract_proteins(),
+    "extract_id_name_df": lambda parser: parser.extract_id_name_df(),
+    "extract_fields_and_types": lambda parser: parser.extract_fields_and_types(),
+    "get_pathway_id_df": get_pathway_id_df,
+    "get_id_to_synonyms_df": get_id_to_synonyms_df,
+}
+
+def peak_memory(fn):
+    """Peak traced memory of one run of fn in MiB, measured apart from the timed runs since tracing slows them down."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 2**20
+
+def bench_parser(path, repeat, cases):
+    """Times and measures every case on the file at path."""
+    results = {}
+    start = time.perf_counter()
+    root = ET.parse(path).getroot()
+    results["parse"] = {"seconds": time.perf_counter() - start}
+    for name in cases:
+        fn = lambda: CASES[name](Parser(path, root=root))
+        results[name] = {"seconds": best_of(repeat, fn)[0], "peak_mib": peak_memory(fn)}
+    return results
+
+def bench_server(path, requests):
+    """
+        Latency of the server endpoints on the file at path, through the in-process test client.
+        seconds is the median latency of a request, so it compares like the parser cases.
+    """
+    from fastapi.testclient import TestClient
+    from utils.dataset import DatasetHolder
+    import server
+
+    holder = DatasetHolder(path)
+    # swapped back afterwards, so later users of the server module in this process get their own data
+    previous_holder = server.holder
+    server.holder = holder
+    try:
+        results = {}
+        with TestClient(server.app) as client:
+            ids = list(holder.current.pathway_counts.index[:1000])
+            endpoints = {
+                "server_pathways": lambda i: client.post("/pathways/", json={"id": ids[i % len(ids)]}),
+                "server_pathways_batch": lambda i: client.post("/pathways/batch", json={"ids": ids}),
+                "server_drug": lambda i: client.get(f"/drugs/{ids[i % len(ids)]}"),
+                "server_drugs_batch": lambda i: client.post("/drugs/batch", json={"ids": ids[:100]}),
+            }
+            for name, request in endpoints.items():
+                request(0)  # warm up
+                latencies = []
+                for i in range(requests):
+                    start = time.perf_counter()
+                    response = request(i)
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                latencies.sort()
+                results[name] = {
+                    "seconds": statistics.median(latencies),
+                    "p95_seconds": latencies[int(0.95 * (len(latencies) - 1))],
+                    "requests": requests,
+                }
+    finally:
+        server.holder = previous_holder
+    return results
+
+def compare(results, baseline, threshold):
+    """
+        Returns a list of (size, case, metric, baseline value, new value) for every compared metric
+        that grew by more than threshold (0.1 = 10%) over the baseline. Cases missing from either side are skipped.
+    """
+    regressions = []
+    for size, cases in results["results"].items():
+        for case, metrics in cases.items():
+            reference = baseline.get("results", {}).get(size, {}).get(case)
+            if reference is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if metric not in metrics or metric not in reference:
+                    continue
+                if metrics[metric] > reference[metric] * (1 + threshold):
+                    regressions.append((size, case, metric, reference[metric], metrics[metric]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and memory of every parser entry point on mock files of growing size.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of mock drugs to benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs, the best one is reported')
+    parser.add_argument('--cases', type=str, nargs='+', default=list(CASES), choices=list(CASES), help='Parser cases to run')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per server endpoint, 0 skips the server')
+    parser.add_argument('--fixture_dir', type=str, default=tempfile.gettempdir(), help='Directory of the generated files')
+    parser.add_argument('--output', type=str, default='bench_results.json', help='JSON file the results are written to')
+    parser.add_argument('--baseline', type=str, default=None, help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative growth over the baseline')
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        path = build_fixture(os.path.join(args.fixture_dir, f"bench_drugbank_{size}.xml"), size)
+        print(f"{size} drugs")
+        size_results = bench_parser(path, args.repeat, args.cases)
+        if args.requests > 0:
+            size_results.update(bench_server(path, args.requests))
+        for case, metrics in size_results.items():
+            peak = f"{metrics['peak_mib']:>9.1f}" if "peak_mib" in metrics else f"{'':>9}"
+            print(f"  {case:<26} {metrics['seconds']:>10.4f}s {peak} MiB")
+        # json keys are strings, the baseline is read back with string sizes
+        results["results"][str(size)] = size_results
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for size, case, metric, reference, value in regressions:
+            print(f"REGRESSION {size} {case} {metric}: {reference:.4f} -> {value:.4f} ({value / reference - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
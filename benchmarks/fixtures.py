@@ -0,0 +1,104 @@
+import os
+import time
+from utils.mock_generator import generate_mock_database
+
+# A few hand written drugs in DrugBank layout, used as the seed of the mock generator.
+# Every mock drug copies all nested entries of the seed, so the row counts grow linearly.
+SEED_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1" exported-on="2025-01-01">
+<drug type="biotech" created="2005-06-13" updated="2024-01-02">
+  <drugbank-id primary="true">DB00001</drugbank-id>
+  <drugbank-id>BTD00024</drugbank-id>
+  <name>Lepirudin</name>
+  <description>Lepirudin is a recombinant hirudin.</description>
+  <state>liquid</state>
+  <indication>Heparin-induced thrombocytopenia.</indication>
+  <mechanism-of-action>Direct thrombin inhibitor.</mechanism-of-action>
+  <groups><group>approved</group><group>withdrawn</group></groups>
+  <synonyms><synonym>Hirudin variant-1</synonym><synonym>Lepirudin recombinant</synonym></synonyms>
+  <products>
+    <product><name>Refludan</name><labeller>Bayer</labeller><ndc-product-code>50419-150</ndc-product-code><dosage-form>Powder</dosage-form><strength>50 mg</strength><route>Intravenous</route><country>US</country><source>FDA NDC</source></product>
+    <product><name>Refludan</name><labeller>Celgene Europe</labeller><dosage-form>Injection</dosage-form><strength>20 mg</strength><route>Intravenous</route><country>EU</country><source>EMA</source></product>
+  </products>
+  <food-interactions><food-interaction>Avoid herbs with anticoagulant activity.</food-interaction></food-interactions>
+  <pathways>
+    <pathway><smpdb-id>SMP0000278</smpdb-id><name>Lepirudin Action Pathway</name><drugs><drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug><drug><drugbank-id>DB01373</drugbank-id><name>Calcium</name></drug></drugs></pathway>
+  </pathways>
+  <targets>
+    <target><id>BE0000048</id><name>Prothrombin</name><polypeptide id="P00734" source="Swiss-Prot"><name>Prothrombin</name><gene-name>F2</gene-name><locus>11p11</locus><cellular-location>Secreted</cellular-location><external-identifiers><external-identifier><resource>HUGO Gene Nomenclature Committee (HGNC)</resource><identifier>HGNC:3535</identifier></external-identifier><external-identifier><resource>GenAtlas</resource><identifier>F2</identifier></external-identifier></external-identifiers></polypeptide></target>
+  </targets>
+</drug>
+<drug type="small molecule" created="2005-06-13" updated="2024-03-01">
+  <drugbank-id primary="true">DB00006</drugbank-id>
+  <drugbank-id>APRD00164</drugbank-id>
+  <name>Bivalirudin</name>
+  <description>Bivalirudin is a synthetic 20 residue peptide.</description>
+  <state>solid</state>
+  <indication>Anticoagulant in percutaneous coronary intervention.</indication>
+  <mechanism-of-action>Reversible direct thrombin inhibitor.</mechanism-of-action>
+  <groups><group>approved</group><group>investigational</group></groups>
+  <synonyms><synonym>Bivalirudina</synonym><synonym>Bivalirudine</synonym><synonym>Hirulog</synonym></synonyms>
+  <products>
+    <product><name>Angiomax</name><labeller>Sandoz</labeller><ndc-product-code>0781-3158</ndc-product-code><dosage-form>Injection, powder</dosage-form><strength>250 mg/50mL</strength><route>Intravenous</route><country>US</country><source>FDA NDC</source></product>
+    <product><name>Angiox</name><labeller>The Medicines Company</labeller><dosage-form>Powder</dosage-form><strength>250 mg</strength><route>Intravenous</route><country>EU</country><source>EMA</source></product>
+    <product><name>Bivalirudin</name><labeller>Hospira</labeller><dosage-form>Solution</dosage-form><strength>5 mg/mL</strength><route>Intravenous</route><country>Canada</country><source>DPD</source></product>
+  </products>
+  <food-interactions/>
+  <pathways>
+    <pathway><smpdb-id>SMP0000277</smpdb-id><name>Bivalirudin Action Pathway</name><drugs><drug><drugbank-id>DB00006</drugbank-id><name>Bivalirudin</name></drug><drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug></drugs></pathway>
+  </pathways>
+  <targets>
+    <target><id>BE0000048</id><name>Prothrombin</name><polypeptide id="P00734" source="Swiss-Prot"><name>Prothrombin</name><gene-name>F2</gene-name><locus>11p11</locus><cellular-location>Secreted</cellular-location><external-identifiers><external-identifier><resource>GenAtlas</resource><identifier>F2</identifier></external-identifier></external-identifiers></polypeptide></target>
+    <target><id>BE0000294</id><name>Steroid hormone receptor ERR1</name><polypeptide id="P11474" source="Swiss-Prot"><name>Steroid hormone receptor ERR1</name><gene-name>ESRRA</gene-name><locus>Xp22.32 and Yp11.3</locus><cellular-location>Nucleus</cellular-location></polypeptide></target>
+  </targets>
+</drug>
+<drug type="small molecule" created="2005-06-13" updated="2023-11-20">
+  <drugbank-id primary="true">DB00014</drugbank-id>
+  <name>Goserelin</name>
+  <description>Goserelin is a synthetic analog of LHRH.</description>
+  <state>solid</state>
+  <indication>Prostate and breast cancer.</indication>
+  <groups><group>approved</group></groups>
+  <synonyms><synonym>Goserelina</synonym></synonyms>
+  <products>
+    <product><name>Zoladex</name><labeller>AstraZeneca</labeller><dosage-form>Implant</dosage-form><strength>3.6 mg</strength><route>Subcutaneous</route><country>US</country><source>FDA NDC</source></product>
+  </products>
+  <food-interactions><food-interaction>Take with or without food.</food-interaction></food-interactions>
+  <targets>
+    <target><id>BE0000203</id><name>Gonadotropin-releasing hormone receptor</name><polypeptide id="P30968" source="Swiss-Prot"><name>Gonadotropin-releasing hormone receptor</name><gene-name>GNRHR</gene-name><locus>4q21.2</locus><cellular-location>Cell membrane</cellular-location></polypeptide></target>
+  </targets>
+</drug>
+</drugbank>
+"""
+
+def write_seed(path):
+    """Writes the seed DrugBank file to path."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(SEED_XML)
+    return path
+
+def build_fixture(path, num_drugs, seed=0):
+    """
+        Generates a mock DrugBank file with num_drugs mock drugs (plus the seed drugs) at path.
+        Fixtures are reused if they already exist. The streaming generator is seeded,
+        so a fixture is the same file for a given size and seed on every machine.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    seed_path = f"{path}.seed.xml"
+    write_seed(seed_path)
+    try:
+        generate_mock_database(seed_path, path, num_mock_entries=num_drugs, num_real_entries=3, seed=seed)
+    finally:
+        os.remove(seed_path)
+    return path
+
+def best_of(repeat, fn):
+    """Runs fn repeat times, returns the best time in seconds and the result of the last run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+from utils.parser import PATHWAYS_SPEC, PRODUCTS_SPEC, Parser
+from utils.cache import TableCache
+from utils.incremental import IncrementalExtractor
+
+# the extractions done by utils.other, server.py and analysis.ipynb,
+# they have to match the calls exactly to be hit later
+PREWARM_SPECS = [
+    # utils.other.get_pathway_id_df
+    PATHWAYS_SPEC,
+    # utils.other.get_id_to_synonyms_df
+    dict(prefix_path=".", nested_fields={"synonyms": "db:synonyms/db:synonym"}, drug_id=None),
+    # analysis.ipynb
+    dict(
+        prefix_path=".",
+        simple_fields={
+            "name": "db:name",
+            "description": "db:description",
+            "state": "db:state",
+            "indication": "db:indication",
+            "mechanism-of-action": "db:mechanism-of-action",
+        },
+        nested_fields={"food_interactions": "db:food-interactions/db:food-interaction"},
+    ),
+    PRODUCTS_SPEC,
+    dict(prefix_path=".", nested_fields={"groups": "db:groups/db:group"}, drug_id=None),
+]
+
+def prewarm(file, cache_dir, key_mode):
+    parser = Parser(file, cache_dir=cache_dir, cache_key=key_mode)
+    parser.extract_many(PREWARM_SPECS)
+    parser.extract_proteins()
+    parser.extract_id_name_df()
+    return parser.cache.files()
+
+def refresh(file, cache_dir, key_mode):
+    """Patches the tables kept by the IncrementalExtractor to match file and publishes them to the cache."""
+    base = os.path.splitext(os.path.basename(file))[0]
+    extractor = IncrementalExtractor(os.path.join(cache_dir, "incremental", base))
+    report = extractor.refresh(file)
+    extractor.publish(file, cache_dir, key_mode)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Prewarm or purge the on-disk cache of parsed DrugBank tables.')
+    parser.add_argument('command', choices=['prewarm', 'refresh', 'purge', 'list'], help='What to do with the cache')
+    parser.add_argument('--input', type=str, default='data/drugbank_partial.xml', help='Input XML file')
+    parser.add_argument('--cache_dir', type=str, default='data/cache', help='Directory of the cached tables')
+    parser.add_argument('--key', choices=['hash', 'mtime'], default='hash', help='How changes of the input are detected')
+    parser.add_argument('--all', action='store_true', help='Purge the current tables as well, not only stale ones')
+
+    args = parser.parse_args()
+
+    if args.command == 'prewarm':
+        start = time.perf_counter()
+        files = prewarm(args.input, args.cache_dir, args.key)
+        print(f"Cached {len(files)} tables in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'refresh':
+        report = refresh(args.input, args.cache_dir, args.key)
+        print(report)
+        for kind in ("added", "changed", "removed", "changed_without_update"):
+            ids = getattr(report, kind)
+            if ids:
+                print(f"{kind}: {', '.join(ids[:20])}{' ...' if len(ids) > 20 else ''}")
+    elif args.command == 'purge':
+        removed = TableCache(args.cache_dir, args.input, key_mode=args.key).purge(stale_only=not args.all)
+        print(f"Removed {len(removed)} cached tables")
+    else:
+        for path in TableCache(args.cache_dir, args.input, key_mode=args.key).files():
+            print(path)
+
+if __name__ == "__main__":
+    main()
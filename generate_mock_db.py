@@ -8,10 +8,23 @@ def main():
     parser.add_argument('--output', type=str, default='data/mock_drugbank.xml', help='Output XML file')
     parser.add_argument('--num_mock_entries', type=int, default=10, help='Number of mock entries to generate')
     parser.add_argument('--num_real_entries', type=int, default=5, help='Number of real entries to include')
+    parser.add_argument('--streaming', action='store_true', help='Write drugs one at a time, memory stays constant in --num_mock_entries')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for a reproducible output, implies --streaming')
+    parser.add_argument('--workers', type=int, default=None, help='Number of generator processes, implies --streaming')
+    parser.add_argument('--nested_cap', type=int, default=None, help='Keep at most this many sampled entries of every nested field, without --streaming this also switches to the pooled field values (a different output for the same random state)')
 
     args = parser.parse_args()
 
-    generate_mock_database(args.input, args.output, num_mock_entries=args.num_mock_entries, num_real_entries=args.num_real_entries)
+    generate_mock_database(
+        args.input,
+        args.output,
+        num_mock_entries=args.num_mock_entries,
+        num_real_entries=args.num_real_entries,
+        streaming=args.streaming,
+        seed=args.seed,
+        workers=args.workers,
+        nested_cap=args.nested_cap,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,40 @@
+import argparse
+import os
+from utils.dataset import DatasetHolder
+from utils.shared_dataset import POINTER_NAME, publishing_loader
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the API with several workers sharing one copy of the drug tables.')
+    parser.add_argument('--input', type=str, default='data/drugbank_partial.xml', help='Input XML file')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory of the cached tables (needs pyarrow), no cache by default')
+    parser.add_argument('--snapshot_dir', type=str, default=None, help='Directory of the shared snapshots, by default snapshots/ in --cache_dir or data/snapshots')
+    parser.add_argument('--workers', type=int, default=4, help='Number of server processes')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--watch_interval', type=float, default=0, help='Seconds between checks of --input for changes, 0 disables the watcher')
+
+    args = parser.parse_args()
+    import uvicorn
+
+    snapshot_dir = args.snapshot_dir or os.path.join(args.cache_dir or "data", "snapshots")
+    # this process parses the file once and publishes the tables, the workers only attach to them
+    holder = DatasetHolder(args.input, cache_dir=args.cache_dir, loader=publishing_loader(snapshot_dir))
+    dataset = holder.load()
+    print(f"Published {len(dataset.index)} drugs in {dataset.build_seconds:.2f}s")
+    if args.watch_interval > 0:
+        holder.start_watching(args.watch_interval)
+
+    os.environ["DRUGBANK_FILE"] = args.input
+    if args.cache_dir is not None:
+        os.environ["DRUGBANK_CACHE_DIR"] = args.cache_dir
+    os.environ["DRUGBANK_SHARED_SNAPSHOT"] = os.path.join(snapshot_dir, POINTER_NAME)
+    if args.watch_interval > 0:
+        # workers follow the snapshots published by the watcher above
+        os.environ["DRUGBANK_WATCH_INTERVAL"] = str(args.watch_interval)
+    try:
+        uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        holder.stop_watching()
+
+if __name__ == "__main__":
+    main()
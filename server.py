@@ -1,32 +1,287 @@
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from typing import Literal
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from utils.parser import Parser
-from utils.other import get_pathway_id_df
+from utils.drug_index import DrugIndex, RECORD_FIELDS
+from utils.dataset import Dataset, DatasetHolder
+from utils.shared_dataset import attach_dataset
+from utils.offset_index import StaleIndexError
+from utils.response_cache import LRUResponseCache
+from utils import instrumentation
 import pandas as pd
-
-app = FastAPI()
+import hmac
+import json
+import os
+import time
 
 # Define the input schema for the POST request
 class DrugIDRequest(BaseModel):
     id: str
 
-# Global parser and data placeholders
-FILE_NAME = "data/drugbank_partial.xml"
-parser = Parser(FILE_NAME)
-data = None
+class DrugIDsRequest(BaseModel):
+    ids: list[str]
+
+# Global dataset holder
+FILE_NAME = os.environ.get("DRUGBANK_FILE", "data/drugbank_partial.xml")
+# off by default, when set (needs pyarrow) tables prewarmed with cache_tables.py are memory mapped instead of parsed
+CACHE_DIR = os.environ.get("DRUGBANK_CACHE_DIR") or None
+# build the dataset in a background thread so the process accepts connections right away,
+# endpoints answer 503 until it's ready
+BACKGROUND_INDEX = os.environ.get("DRUGBANK_INDEX_BACKGROUND", "0") == "1"
+# seconds between checks of the data file for changes, 0 disables the watcher
+WATCH_INTERVAL = float(os.environ.get("DRUGBANK_WATCH_INTERVAL", "0"))
+# pointer to the snapshots published by serve.py, workers attach to them instead of parsing
+# and the watcher follows the pointer instead of the data file
+SHARED_SNAPSHOT = os.environ.get("DRUGBANK_SHARED_SNAPSHOT")
+if SHARED_SNAPSHOT:
+    holder = DatasetHolder(SHARED_SNAPSHOT, cache_dir=CACHE_DIR, loader=attach_dataset)
+else:
+    holder = DatasetHolder(FILE_NAME, cache_dir=CACHE_DIR)
+# token expected in the X-Admin-Token header of /admin/reload, the endpoint is disabled without it
+ADMIN_TOKEN = os.environ.get("DRUGBANK_ADMIN_TOKEN")
+# serialized responses of the single-drug and search endpoints, 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.environ.get("DRUGBANK_RESPONSE_CACHE_SIZE", "4096"))
+response_cache = LRUResponseCache(RESPONSE_CACHE_SIZE)
+
+@asynccontextmanager
+async def lifespan(app):
+    if BACKGROUND_INDEX:
+        holder.reload_in_background()
+    else:
+        holder.load()
+    if WATCH_INTERVAL > 0:
+        holder.start_watching(WATCH_INTERVAL)
+    yield
+    holder.stop_watching()
+
+app = FastAPI(lifespan=lifespan)
+
+class RequestMetricsMiddleware():
+    """
+        Records the latency of every request as drugbank_request_seconds{method,path,status},
+        path being the route template so /drugs/{drug_id} is a single series.
+        Set DRUGBANK_INSTRUMENT=1 to record, otherwise requests pass straight through.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not instrumentation.is_active():
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            instrumentation.get_metrics().observe("drugbank_request_seconds", (
+                ("method", scope["method"]),
+                ("path", getattr(route, "path", "unmatched")),
+                ("status", str(status)),
+            ), time.perf_counter() - start)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+def get_dataset() -> Dataset:
+    """
+    Returns the current dataset, or 503 while the first one is being built.
+    Requests take the reference once, so a reload never changes the data under them.
+    """
+    dataset = holder.current
+    if dataset is None:
+        raise HTTPException(status_code=503, detail="Data is not ready yet.")
+    return dataset
+
+def get_data(dataset: Dataset = Depends(get_dataset)) -> pd.Series:
+    """Returns the pathway counts of every drug ID."""
+    return dataset.pathway_counts
+
+def get_index(dataset: Dataset = Depends(get_dataset)) -> DrugIndex:
+    """Returns the drug index."""
+    return dataset.index
+
+def validators(dataset: Dataset) -> dict:
+    """ETag and Last-Modified headers of every response computed from dataset."""
+    return {
+        "ETag": f'"{dataset.version}"',
+        "Last-Modified": format_datetime(dataset.modified_at.replace(microsecond=0), usegmt=True),
+    }
 
-def get_data() -> pd.Series:
-    """Prepares the pathway data."""
-    global data
-    if data is None:  # Lazy loading of data
-        data = get_pathway_id_df(parser)
-    return data
+def not_modified(request: Request, dataset: Dataset) -> bool:
+    """
+    True if a conditional GET already has the current version of the data.
+    If-None-Match wins over If-Modified-Since, like in RFC 9110.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or f'"{dataset.version}"' in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and dataset.modified_at.replace(microsecond=0) <= since
+    return False
+
+def cached_json(request: Request, dataset: Dataset, key: tuple, build) -> Response:
+    """
+    Returns the JSON of build() from the response cache, building and caching it on a miss.
+    build may raise HTTPException, the 304 of a conditional GET is only sent once the resource exists.
+    """
+    body = response_cache.get(dataset.version, key)
+    if body is None:
+        body = json.dumps(build()).encode("utf-8")
+        response_cache.put(dataset.version, key, body)
+    headers = validators(dataset)
+    if not_modified(request, dataset):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/version")
+def get_version():
+    """Version and build time of the served data, with reload and response cache metrics."""
+    return {**holder.status(), "response_cache": response_cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request latencies and parser timings in the Prometheus text format."""
+    return PlainTextResponse(
+        instrumentation.get_metrics().to_prometheus() + response_cache.to_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+def check_admin_token(x_admin_token: str | None = Header(None)):
+    """403 unless DRUGBANK_ADMIN_TOKEN is set, 401 unless the request sends it in X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set DRUGBANK_ADMIN_TOKEN.")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Missing or wrong X-Admin-Token.")
+
+@app.post("/admin/reload", status_code=202, dependencies=[Depends(check_admin_token)])
+def reload_data():
+    """
+    Rebuilds the data from the file in the background and swaps it in once it's ready.
+    Needs the X-Admin-Token header to match DRUGBANK_ADMIN_TOKEN.
+    Answers 409 with DRUGBANK_SHARED_SNAPSHOT set: the workers only attach to the snapshots
+    and the file is parsed by serve.py, which republishes it when its watcher sees the file change.
+    """
+    if SHARED_SNAPSHOT:
+        raise HTTPException(
+            status_code=409,
+            detail="Reloads are published by serve.py in shared mode, run it with --watch_interval.",
+        )
+    started = holder.reload_in_background()
+    return {"started": started, **holder.status()}
 
 @app.post("/pathways/")
-def get_pathway_count(request: DrugIDRequest, data: pd.Series = Depends(get_data)):
+def get_pathway_count(body: DrugIDRequest, request: Request, dataset: Dataset = Depends(get_dataset)):
     """Handle POST requests to return the pathway count for a given drug ID."""
-    drug_id = request.id
-    if drug_id in data.index:
-        return {"drug_id": drug_id, "pathway_count": int(data[drug_id])}
-    else:
+    drug_id = body.id
+    def build():
+        data = dataset.pathway_counts
+        if drug_id in data.index:
+            return {"drug_id": drug_id, "pathway_count": int(data[drug_id])}
+        else:
+            raise HTTPException(status_code=404, detail=f"Drug with id {drug_id} not found.")
+    return cached_json(request, dataset, ("pathways", drug_id), build)
+
+def lookup_pathway_counts(data: pd.Series, drug_ids) -> list:
+    """Vectorized lookup of many ids, returns a result dict per id with a found flag."""
+    counts = data.reindex(drug_ids)
+    found = counts.notna().tolist()
+    values = counts.fillna(0).astype(int).tolist()
+    return [
+        {"drug_id": drug_id, "found": is_found, "pathway_count": value if is_found else None}
+        for drug_id, is_found, value in zip(drug_ids, found, values)
+    ]
+
+@app.post("/pathways/batch")
+def get_pathway_counts(request: DrugIDsRequest, stream: bool = False, data: pd.Series = Depends(get_data)):
+    """
+    Handle POST requests with many drug IDs, missing IDs are reported instead of raising 404.
+    With ?stream=true the results are streamed as NDJSON, one line per ID.
+    """
+    results = lookup_pathway_counts(data, request.ids)
+    if stream:
+        return StreamingResponse(
+            (json.dumps(result) + "\n" for result in results),
+            media_type="application/x-ndjson",
+        )
+    # serialized directly, jsonable_encoder is slow for thousands of small dicts
+    return Response(content=json.dumps({"results": results}), media_type="application/json")
+
+@app.get("/search")
+def search_drugs(
+    request: Request,
+    q: str,
+    mode: Literal["exact", "prefix", "fuzzy"] = "exact",
+    limit: int = Query(20, ge=1, le=1000),
+    dataset: Dataset = Depends(get_dataset),
+):
+    """Finds drugs by name, synonym or product name, e.g. /search?q=angio&mode=prefix."""
+    def build():
+        results = dataset.search.search(q, mode=mode, limit=limit)
+        return {
+            "query": q,
+            "mode": mode,
+            "results": [
+                {"drug_id": drug_id, "name": name, "score": score} for drug_id, name, score in results
+            ],
+        }
+    return cached_json(request, dataset, ("search", q, mode, limit), build)
+
+@app.post("/drugs/batch")
+def get_drugs(request: DrugIDsRequest, index: DrugIndex = Depends(get_index)):
+    """Returns the records of many drugs at once, missing ids are listed instead of raising 404."""
+    found, missing = index.get_many(request.ids)
+    return {"drugs": found, "missing": missing}
+
+@app.get("/drugs/{drug_id}")
+def get_drug(drug_id: str, request: Request, dataset: Dataset = Depends(get_dataset)):
+    """Returns the whole record of a drug given its primary or secondary ID."""
+    def build():
+        record = dataset.index.get(drug_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Drug with id {drug_id} not found.")
+        return record
+    return cached_json(request, dataset, ("drug", drug_id), build)
+
+@app.get("/drugs/{drug_id}/xml")
+def get_drug_xml(drug_id: str, request: Request, dataset: Dataset = Depends(get_dataset)):
+    """Returns the raw <drug> element of a drug, read straight from the data file (not cached, it's a plain read)."""
+    try:
+        body = dataset.offsets.read(drug_id)
+    except StaleIndexError:
+        raise HTTPException(status_code=503, detail="Data file changed, waiting for the reload.")
+    if body is None:
         raise HTTPException(status_code=404, detail=f"Drug with id {drug_id} not found.")
+    headers = validators(dataset)
+    if not_modified(request, dataset):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/xml", headers=headers)
+
+@app.get("/drugs/{drug_id}/{field}")
+def get_drug_field(drug_id: str, field: str, request: Request, dataset: Dataset = Depends(get_dataset)):
+    """Returns a single field of a drug, e.g. /drugs/DB00001/targets."""
+    if field not in RECORD_FIELDS:
+        raise HTTPException(status_code=404, detail=f"Unknown field {field}, expected one of {', '.join(RECORD_FIELDS)}.")
+    def build():
+        record = dataset.index.get(drug_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Drug with id {drug_id} not found.")
+        return {"drug_id": drug_id, field: record[field]}
+    return cached_json(request, dataset, ("drug_field", drug_id, field), build)
@@ -0,0 +1,28 @@
+import pytest
+
+# two drugs in DrugBank layout, shared by the tests of the dataset, the snapshots and the server
+DRUGBANK_XML = """<drugbank xmlns="http://www.drugbank.ca">
+    <drug>
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>Lepirudin</name>
+        <groups><group>approved</group></groups>
+        <synonyms><synonym>Hirudin variant-1</synonym></synonyms>
+        <pathways>
+            <pathway><name>PathA</name><drugs><drug><name>Lepirudin</name></drug></drugs></pathway>
+            <pathway><name>PathB</name><drugs><drug><name>Lepirudin</name></drug></drugs></pathway>
+        </pathways>
+        <targets><target><id>BE0000048</id><name>Prothrombin</name></target></targets>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00006</drugbank-id>
+        <name>Bivalirudin</name>
+    </drug>
+</drugbank>"""
+
+@pytest.fixture
+def drugbank_xml(tmp_path):
+    """Path of DRUGBANK_XML written to tmp_path/drugbank.xml."""
+    path = tmp_path / "drugbank.xml"
+    path.write_text(DRUGBANK_XML)
+    return path
@@ -0,0 +1,27 @@
+import json
+import sys
+from benchmarks import bench_other, bench_suite
+from benchmarks.fixtures import build_fixture
+
+def run(main, monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["bench", *args])
+    main()
+
+def test_bench_other_runs(tmp_path, monkeypatch, capsys):
+    path = build_fixture(str(tmp_path / "fixtures" / "drugbank.xml"), 50)
+    run(bench_other.main, monkeypatch, "--fixture", path, "--repeat", "1")
+    assert "get_id_to_synonyms_df" in capsys.readouterr().out
+
+def test_bench_suite_runs(tmp_path, monkeypatch, capsys):
+    import server
+    holder = server.holder
+    output = tmp_path / "results.json"
+    run(
+        bench_suite.main, monkeypatch,
+        "--sizes", "50", "--repeat", "1", "--requests", "5",
+        "--fixture_dir", str(tmp_path), "--output", str(output),
+    )
+    results = json.loads(output.read_text())["results"]["50"]
+    assert set(bench_suite.CASES) <= set(results)
+    # the server module is left as it was
+    assert server.holder is holder
@@ -0,0 +1,122 @@
+import warnings
+import pytest
+import pandas as pd
+from unittest.mock import patch
+from utils.parser import Parser
+from utils.cache import TableCache, atomic_write
+from utils.other import get_pathway_id_df
+
+pytest.importorskip("pyarrow")
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>Lepirudin</name>
+        <pathways>
+            <pathway>
+                <name>PathA</name>
+                <drugs><drug><name>Lepirudin</name></drug></drugs>
+            </pathway>
+        </pathways>
+        <targets>
+            <target>
+                <id>T001</id>
+                <polypeptide id="P00734" source="Swiss-Prot"><locus>11p15.5</locus></polypeptide>
+            </target>
+        </targets>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>SmallMolecule</name>
+    </drug>
+</drugbank>
+"""
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML)
+    return str(path)
+
+def test_cached_results_match(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    reference = Parser(xml_path)
+    cached = Parser(xml_path, cache_dir=cache_dir)
+    nested = {"drugs": "db:drugs/db:drug/db:name"}
+
+    for _ in range(2):  # a miss that fills the cache, then a hit
+        pd.testing.assert_frame_equal(
+            cached.extract("db:pathways/db:pathway", nested_fields=nested),
+            reference.extract("db:pathways/db:pathway", nested_fields=nested),
+        )
+        pd.testing.assert_frame_equal(cached.extract_proteins(), reference.extract_proteins())
+        pd.testing.assert_frame_equal(cached.extract_id_name_df(), reference.extract_id_name_df())
+    assert len(cached.cache.files()) == 3
+
+def test_cached_exploded_empty_lists_are_nan(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    nested = {"pathways": "db:pathways/db:pathway/db:name"}
+    expected = Parser(xml_path).extract(".", nested_fields=nested, explode="pathways")
+    assert expected["pathways"].iloc[1] != expected["pathways"].iloc[1]  # NaN, SmallMolecule has no pathways
+    for _ in range(2):
+        result = Parser(xml_path, cache_dir=cache_dir).extract(".", nested_fields=nested, explode="pathways")
+        # mismatched None and NaN only warn in assert_frame_equal
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            pd.testing.assert_frame_equal(result, expected)
+
+def test_hit_does_not_parse(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    expected = get_pathway_id_df(Parser(xml_path, cache_dir=cache_dir))
+
+    with patch("xml.etree.ElementTree.parse") as mock_parse:
+        result = get_pathway_id_df(Parser(xml_path, cache_dir=cache_dir))
+        mock_parse.assert_not_called()
+    pd.testing.assert_series_equal(result, expected)
+
+def test_invalidated_on_change(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert len(Parser(xml_path, cache_dir=cache_dir).extract_id_name_df()) == 3
+
+    with open(xml_path, "w") as f:
+        f.write(XML.replace("<drugbank-id>BTD00024</drugbank-id>", ""))
+    assert len(Parser(xml_path, cache_dir=cache_dir).extract_id_name_df()) == 2
+
+    cache = TableCache(cache_dir, xml_path)
+    assert len(cache.files()) == 2
+    assert len(cache.purge()) == 1
+    assert len(cache.purge(stale_only=False)) == 1
+    assert cache.files() == []
+
+def test_sources_sharing_cache_dir(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    (tmp_path / "other").mkdir()
+    sources = [xml_path, str(tmp_path / "drugbank-mock.xml"), str(tmp_path / "other" / "drugbank.xml")]
+    for source in sources[1:]:
+        with open(source, "w") as f:
+            f.write(XML.replace("<drugbank-id>BTD00024</drugbank-id>", ""))
+    for source in sources:
+        Parser(source, cache_dir=cache_dir).extract_id_name_df()
+
+    caches = [TableCache(cache_dir, source) for source in sources]
+    assert [len(cache.files()) for cache in caches] == [1, 1, 1]
+    assert len(set(path for cache in caches for path in cache.files())) == 3
+    assert len(caches[0].purge(stale_only=False)) == 1
+    assert [len(cache.files()) for cache in caches] == [0, 1, 1]
+
+def test_atomic_write_cleans_up_on_error(tmp_path):
+    path = tmp_path / "table.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write("half")
+            raise RuntimeError("failed mid write")
+    assert path.read_text() == "old"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["table.json"]
+
+    with atomic_write(str(path)) as f:
+        f.write("new")
+    assert path.read_text() == "new"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["table.json"]
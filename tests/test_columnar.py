@@ -0,0 +1,38 @@
+import pandas as pd
+from utils.columnar import ColumnarBuilder
+
+ROWS = [
+    ["DrugA", "US", ["x", "y"]],
+    ["DrugB", None, []],
+    ["DrugC", "US", ["z"]],
+]
+
+def make_builder():
+    builder = ColumnarBuilder(["name", "country", "values"], nested_columns=["values"])
+    for row in ROWS:
+        builder.append(row)
+    return builder
+
+def test_to_frame_matches_dict_rows():
+    expected = pd.DataFrame([dict(zip(["name", "country", "values"], row)) for row in ROWS])
+    builder = make_builder()
+    assert len(builder) == 3
+    pd.testing.assert_frame_equal(builder.to_frame(), expected)
+
+def test_explode_matches_pandas():
+    expected = pd.DataFrame([dict(zip(["name", "country", "values"], row)) for row in ROWS]).explode("values")
+    pd.testing.assert_frame_equal(make_builder().to_frame(explode="values"), expected)
+
+def test_categorical():
+    df = make_builder().to_frame(categorical=True)
+    assert isinstance(df["country"].dtype, pd.CategoricalDtype)
+    assert df["country"].cat.categories.tolist() == ["US"]
+    assert not isinstance(df["name"].dtype, pd.CategoricalDtype)
+
+    df = make_builder().to_frame(categorical=["name"])
+    assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+
+def test_empty_builder_keeps_columns():
+    df = ColumnarBuilder(["a", "b"], nested_columns=["b"]).to_frame(explode="b")
+    assert list(df.columns) == ["a", "b"]
+    assert len(df) == 0
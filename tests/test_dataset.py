@@ -0,0 +1,51 @@
+import threading
+import time
+import pandas as pd
+from utils.parser import Parser
+from utils.other import get_pathway_id_df
+from utils.dataset import DatasetHolder, load_dataset
+
+def test_pathway_counts_match_get_pathway_id_df(drugbank_xml):
+    path = drugbank_xml
+    dataset = load_dataset(str(path))
+    expected = get_pathway_id_df(Parser(str(path)))
+    pd.testing.assert_series_equal(dataset.pathway_counts.sort_index(), expected.sort_index())
+
+def test_watcher_reloads_on_change(drugbank_xml):
+    path = drugbank_xml
+    holder = DatasetHolder(str(path))
+    first = holder.load()
+    holder.start_watching(0.01)
+    try:
+        path.write_text(path.read_text().replace("Bivalirudin", "Bivalirudin2"))
+        deadline = time.time() + 5
+        while holder.current is first and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        holder.stop_watching()
+    assert holder.current is not first
+    assert holder.current.index.get("DB00006")["name"] == "Bivalirudin2"
+    assert holder.status()["reloads"] == 2
+    assert holder.status()["last_swap_seconds"] >= holder.status()["last_build_seconds"]
+
+def test_concurrent_background_reloads_start_once(drugbank_xml):
+    path = drugbank_xml
+    release = threading.Event()
+    calls = []
+    def loader(file, cache_dir):
+        calls.append(file)
+        release.wait(5)
+        return load_dataset(file, cache_dir)
+
+    holder = DatasetHolder(str(path), loader=loader)
+    assert holder.reload_in_background()
+    assert not holder.reload_in_background()
+    assert holder.status()["reloading"]
+    release.set()
+    deadline = time.time() + 5
+    while holder.current is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert holder.current is not None
+    assert len(calls) == 1
+    # the lock is free again once the reload is done
+    assert holder.load() is holder.current
@@ -0,0 +1,66 @@
+import pytest
+from io import StringIO
+from utils.parser import Parser
+from utils.other import get_pathway_id_df
+from utils.drug_index import build_drug_index
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+    <drug>
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>Lepirudin</name>
+        <groups><group>approved</group></groups>
+        <synonyms><synonym>Hirudin</synonym></synonyms>
+        <products>
+            <product><name>Refludan</name></product>
+            <product><name>Refludan</name></product>
+        </products>
+        <pathways>
+            <pathway>
+                <name>PathA</name>
+                <drugs><drug><name>Lepirudin</name></drug><drug><name>Bivalirudin</name></drug></drugs>
+            </pathway>
+        </pathways>
+        <targets>
+            <target><id>BE0000048</id><name>Prothrombin</name></target>
+            <target><id>BE0000049</id></target>
+        </targets>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00006</drugbank-id>
+        <name>Bivalirudin</name>
+    </drug>
+</drugbank>"""
+
+@pytest.fixture
+def parser():
+    return Parser(StringIO(XML))
+
+def test_build_drug_index(parser):
+    index = build_drug_index(parser)
+    assert len(index) == 2
+    assert "BTD00024" in index
+    assert index.get("BTD00024") is index.get("DB00001")
+
+    record = index.get("DB00001")
+    assert record["name"] == "Lepirudin"
+    assert record["ids"] == ["DB00001", "BTD00024"]
+    assert record["groups"] == ["approved"]
+    assert record["synonyms"] == ["Hirudin"]
+    assert record["products"] == ["Refludan"]
+    assert record["pathways"] == ["PathA"]
+    assert record["targets"] == [
+        {"id": "BE0000048", "name": "Prothrombin"},
+        {"id": "BE0000049", "name": None},
+    ]
+
+def test_pathway_counts_match_get_pathway_id_df(parser):
+    index = build_drug_index(parser)
+    counts = get_pathway_id_df(parser)
+    for drug_id, count in counts.items():
+        assert index.get(drug_id)["pathway_count"] == count
+
+def test_get_many(parser):
+    found, missing = build_drug_index(parser).get_many(["DB00006", "DB99999"])
+    assert list(found) == ["DB00006"]
+    assert missing == ["DB99999"]
@@ -0,0 +1,71 @@
+import pytest
+from io import StringIO
+import pandas as pd
+from utils.parser import Parser
+from utils.extraction_plan import resolve_path
+
+NS = {"db": "http://www.drugbank.ca"}
+
+@pytest.fixture
+def parser():
+    xml = """<drugbank xmlns="http://www.drugbank.ca">
+        <drug type="biotech">
+            <drugbank-id>BTD00024</drugbank-id>
+            <drugbank-id primary="true">DB00001</drugbank-id>
+            <name>Lepirudin</name>
+            <products>
+                <product><name>Refludan</name><country>US</country><route/></product>
+                <product><name>Refludan EU</name><country>EU</country><country>PL</country></product>
+            </products>
+            <pathways>
+                <pathway>
+                    <name>PathA</name>
+                    <drugs>
+                        <drug><name>Lepirudin</name></drug>
+                        <drug><name>Other</name></drug>
+                    </drugs>
+                </pathway>
+                <pathway><name>PathB</name></pathway>
+            </pathways>
+        </drug>
+        <drug>
+            <drugbank-id primary="true">DB00002</drugbank-id>
+        </drug>
+        <drug>
+            <drugbank-id primary="true">DB00003</drugbank-id>
+            <name>Third</name>
+        </drug>
+    </drugbank>"""
+    return Parser(StringIO(xml))
+
+def test_resolve_path():
+    assert resolve_path(".", NS) == ()
+    assert resolve_path("db:drugs/db:drug/db:name", NS) == (
+        "{http://www.drugbank.ca}drugs",
+        "{http://www.drugbank.ca}drug",
+        "{http://www.drugbank.ca}name",
+    )
+    assert resolve_path("db:drugbank-id[@primary='true']", NS) is None
+    assert resolve_path("db:a//db:b", NS) is None
+    assert resolve_path("x:name", NS) is None
+
+@pytest.mark.parametrize("spec", [
+    ("db:products/db:product", {"product": "db:name", "country": "db:country", "route": "db:route", "missing": "db:labeller"}),
+    ("db:pathways/db:pathway", {"pathway-name": "db:name"}, {"drugs": "db:drugs/db:drug/db:name"}, None, None),
+    (".", {"self": "."}, {"ids": "db:drugbank-id", "primary": "db:drugbank-id[@primary='true']"}),
+    ("db:pathways/db:pathway[db:drugs]", {"pathway-name": "db:name"}),
+])
+def test_compiled_matches_elementpath(parser, spec):
+    compiled = parser.extract(*spec)
+    reference = parser.extract(*spec, compiled=False)
+    pd.testing.assert_frame_equal(compiled, reference)
+
+def test_compiled_values(parser):
+    result = parser.extract(
+        "db:products/db:product",
+        {"country": "db:country"},
+        {"countries": "db:country"},
+    )
+    assert result["country"].tolist() == ["US", "EU"]
+    assert result["countries"].tolist() == [["US"], ["EU", "PL"]]
+    assert result["drugbank-id"].tolist() == ["DB00001", "DB00001"]
@@ -0,0 +1,69 @@
+import random
+import pickle
+import pytest
+from utils.field_pool import FieldPool, freeze
+
+def test_counts_behave_like_the_raw_list():
+    raw = ["b", "a", "b", "c", "b"]
+    pool = FieldPool()
+    for value in raw:
+        pool.append(value)
+    assert pool.values == ["b", "a", "c"]
+    assert pool.counts == [3, 1, 1]
+    assert len(pool) == 5
+    assert list(pool) == ["b", "b", "b", "a", "c"]
+    assert [pool[i] for i in range(5)] == list(pool)
+    assert pool[-1] == "c"
+    with pytest.raises(IndexError):
+        pool[5]
+    assert random.Random(0).choice(pool) in raw
+
+def test_nested_entries_are_deduplicated():
+    pool = FieldPool()
+    pool.append({"group": ["approved"]})
+    pool.append({"group": ["approved"]})
+    pool.append({"group": ["approved", "withdrawn"]})
+    assert pool.counts == [2, 1]
+    assert freeze({"a": [{"b": ["c"]}]}) == (("a", ((("b", ("c",)),),)),)
+
+def test_reservoir():
+    pool = FieldPool(reservoir_size=3, rng=random.Random(1))
+    for value in range(100):
+        pool.append(value)
+    assert len(pool) == 3
+    assert pool.seen == 100
+    assert set(pool) <= set(range(100))
+
+def test_merge_and_pickle():
+    first, second = FieldPool(), FieldPool()
+    for value in ["a", "b"]:
+        first.append(value)
+    for value in ["b", "c"]:
+        second.append(value)
+    first.merge(second)
+    assert list(first) == ["a", "b", "b", "c"]
+    assert list(pickle.loads(pickle.dumps(first))) == list(first)
+
+def test_reservoir_merge_is_weighted_by_seen():
+    rng = random.Random(0)
+    drawn = []
+    for _ in range(200):
+        few, many = FieldPool(reservoir_size=10, rng=rng), FieldPool(reservoir_size=10, rng=rng)
+        for _ in range(10):
+            few.append("a")
+        for _ in range(1000):
+            many.append("b")
+        few.merge(many)
+        assert few.seen == 1010
+        assert len(few) == 10
+        drawn.extend(few)
+    # 1000 of the 1010 values are b
+    assert 0.97 < drawn.count("b") / len(drawn) < 1
+
+    small = FieldPool(reservoir_size=10, rng=rng)
+    small.append("a")
+    other = FieldPool(reservoir_size=10, rng=rng)
+    other.append("b")
+    small.merge(other)
+    assert sorted(small) == ["a", "b"]
+    assert small.seen == 2
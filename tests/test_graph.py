@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from io import StringIO
+from utils.parser import Parser
+from utils.graph import Adjacency, build_drug_graph
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+    <drug>
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <products>
+            <product><name>Refludan</name></product>
+            <product><name>Refludan</name></product>
+            <product><name>Lepi</name></product>
+        </products>
+        <pathways><pathway><name>PathA</name></pathway></pathways>
+        <targets>
+            <target><id>BE1</id><polypeptide><gene-name>F2</gene-name></polypeptide></target>
+            <target><id>BE2</id><polypeptide><gene-name>INSR</gene-name></polypeptide></target>
+        </targets>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00006</drugbank-id>
+        <name>Bivalirudin</name>
+        <products><product><name>Angiomax</name></product></products>
+        <targets>
+            <target><id>BE1</id><polypeptide><gene-name>F2</gene-name></polypeptide></target>
+            <target><id>BE3</id></target>
+        </targets>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00007</drugbank-id>
+        <name>Leuprolide</name>
+        <targets>
+            <target><id>BE4</id><polypeptide><gene-name>GNRHR</gene-name></polypeptide></target>
+        </targets>
+    </drug>
+</drugbank>"""
+
+@pytest.fixture
+def parser():
+    return Parser(StringIO(XML))
+
+def test_adjacency_from_pairs():
+    adjacency = Adjacency.from_pairs([2, 0, 2, 0], [1, 3, 1, 0], 3, 4)
+    assert adjacency[0].tolist() == [0, 3]
+    assert adjacency[1].tolist() == []
+    assert adjacency[2].tolist() == [1]
+    assert adjacency.degrees().tolist() == [2, 0, 1]
+    assert adjacency.transpose()[1].tolist() == [2]
+
+@pytest.mark.parametrize("chunk", [1, 3, 1 << 22])
+def test_adjacency_compose(chunk):
+    rng = np.random.default_rng(0)
+    left = Adjacency.from_pairs(rng.integers(0, 20, 60), rng.integers(0, 15, 60), 20, 15)
+    right = Adjacency.from_pairs(rng.integers(0, 15, 40), rng.integers(0, 10, 40), 15, 10)
+    composed = left.compose(right, chunk=chunk)
+
+    left_dense = np.zeros((20, 15), int)
+    left_dense[left.pairs()] = 1
+    right_dense = np.zeros((15, 10), int)
+    right_dense[right.pairs()] = 1
+    expected = (left_dense @ right_dense) > 0
+    for row in range(20):
+        assert composed[row].tolist() == np.flatnonzero(expected[row]).tolist()
+
+def test_gene_queries(parser):
+    graph = build_drug_graph(parser)
+    assert graph.drugs_of_gene("F2") == ["Lepirudin", "Bivalirudin"]
+    assert sorted(graph.products_of_gene("F2")) == ["Angiomax", "Lepi", "Refludan"]
+    assert graph.products_of_gene("GNRHR") == []
+    assert graph.products_of_gene("unknown") == []
+
+    assert graph.gene_counts("drug").to_dict() == {"F2": 2, "INSR": 1, "GNRHR": 1}
+    assert graph.top_genes(1, by="product").to_dict() == {"F2": 3}
+    assert graph.degree_histogram("drug_products").to_dict() == {0: 1, 1: 1, 2: 1}
+    with pytest.raises(ValueError):
+        graph.gene_counts("pathway")
+
+def test_gene_counts_match_merge(parser):
+    # the merges the notebook used before the graph
+    products_df = parser.extract("db:products/db:product", {"product_name": "db:name"})
+    proteins_df = parser.extract("db:targets/db:target", {"gene-name": "db:polypeptide/db:gene-name"})
+    proteins_df = proteins_df.rename(columns={"name": "drug-name"})
+    product_gene_df = pd.merge(products_df, proteins_df, left_on="name", right_on="drug-name")
+    product_gene_df = product_gene_df[["drug-name", "product_name", "gene-name"]].dropna().drop_duplicates()
+
+    graph = build_drug_graph(parser)
+    for by, column in (("drug", "drug-name"), ("product", "product_name")):
+        expected = product_gene_df[["gene-name", column]].drop_duplicates().groupby("gene-name")[column].count()
+        counts = graph.gene_counts(by, with_products=True)
+        assert counts.to_dict() == expected.to_dict()
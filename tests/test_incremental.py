@@ -0,0 +1,102 @@
+import pytest
+import pandas as pd
+from unittest.mock import patch
+from utils.parser import Parser
+from utils.incremental import IncrementalExtractor, DEFAULT_SPECS
+
+pytest.importorskip("pyarrow")
+
+def drug(id, name, updated="2024-01-01", products=(), pathways=(), genes=()):
+    return f"""<drug type="small molecule" updated="{updated}">
+    <drugbank-id primary="true">{id}</drugbank-id>
+    <drugbank-id>SEC{id}</drugbank-id>
+    <name>{name}</name>
+    <products>{"".join(f"<product><name>{p}</name><country>US</country></product>" for p in products)}</products>
+    <pathways>{"".join(f"<pathway><name>{p}</name><drugs><drug><name>{name}</name></drug></drugs></pathway>" for p in pathways)}</pathways>
+    <targets>{"".join(f'<target><id>T{g}</id><polypeptide id="P{g}" source="Swiss-Prot"><gene-name>{g}</gene-name><locus>1p</locus></polypeptide></target>' for g in genes)}</targets>
+</drug>"""
+
+def write(path, *drugs):
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n<drugbank xmlns="http://www.drugbank.ca">\n' + "\n".join(drugs) + "\n</drugbank>")
+    return str(path)
+
+def assert_tables_match(extractor, path):
+    parser = Parser(path)
+    for name, spec in DEFAULT_SPECS.items():
+        pd.testing.assert_frame_equal(extractor.table(name), parser.extract(**spec))
+    pd.testing.assert_frame_equal(extractor.table("proteins"), parser.extract_proteins())
+    pd.testing.assert_frame_equal(extractor.table("id_name"), parser.extract_id_name_df())
+
+def test_refresh(tmp_path):
+    a = drug("DB1", "Alpha", products=["A1", "A2"], pathways=["P1"], genes=["G1"])
+    b = drug("DB2", "Beta", products=["B1"], genes=["G2", "G3"])
+    c = drug("DB3", "Gamma", pathways=["P2", "P3"])
+    extractor = IncrementalExtractor(str(tmp_path / "state"))
+
+    path = write(tmp_path / "v1.xml", a, b, c)
+    report = extractor.refresh(path)
+    assert report.full and report.added == ["DB1", "DB2", "DB3"]
+    assert_tables_match(extractor, path)
+
+    # Beta changes, Gamma is removed, Delta is added between Alpha and Beta
+    b2 = drug("DB2", "Beta", updated="2025-01-01", products=["B1", "B2"], genes=["G3"])
+    d = drug("DB4", "Delta", products=["D1"], pathways=["P4"], genes=["G4"])
+    path = write(tmp_path / "v2.xml", a, d, b2)
+    # a new extractor, like the next run would use, reads the state back from disk
+    extractor = IncrementalExtractor(str(tmp_path / "state"))
+    with patch.object(IncrementalExtractor, "_extract", wraps=extractor._extract) as extract:
+        report = extractor.refresh(path)
+    assert not report.full
+    assert (report.added, report.changed, report.removed, report.unchanged) == (["DB4"], ["DB2"], ["DB3"], 1)
+    assert report.changed_without_update == []
+    # only the two dirty drugs were parsed
+    parser = extract.call_args.args[0]
+    assert [id for id in parser.extract_id_name_df()["id"] if id.startswith("DB")] == ["DB4", "DB2"]
+    assert_tables_match(extractor, path)
+
+def test_changed_without_update(tmp_path):
+    extractor = IncrementalExtractor(str(tmp_path / "state"))
+    extractor.refresh(write(tmp_path / "v1.xml", drug("DB1", "Alpha", products=["A1"])))
+    path = write(tmp_path / "v2.xml", drug("DB1", "Alpha", products=["A2"]))
+    report = extractor.refresh(path)
+    assert report.changed == report.changed_without_update == ["DB1"]
+    assert_tables_match(extractor, path)
+
+    report = extractor.refresh(path)
+    assert (report.added, report.changed, report.removed, report.unchanged) == ([], [], [], 1)
+
+def test_tables_emptied_by_an_update(tmp_path):
+    extractor = IncrementalExtractor(str(tmp_path / "state"))
+    extractor.refresh(write(
+        tmp_path / "v1.xml", drug("DB1", "Alpha", products=["A1"], pathways=["P1"], genes=["G1"]), drug("DB2", "Beta")
+    ))
+    # the last products, pathways and targets are removed, the tables have the dtypes Parser gives empty ones
+    path = write(tmp_path / "v2.xml", drug("DB1", "Alpha", updated="2025-01-01"), drug("DB2", "Beta"))
+    extractor.refresh(path)
+    assert len(extractor.table("products")) == 0
+    assert_tables_match(extractor, path)
+
+    # and rows added to an empty table again
+    path = write(tmp_path / "v3.xml", drug("DB1", "Alpha", updated="2026-01-01", products=["A2"]), drug("DB2", "Beta"))
+    extractor.refresh(path)
+    assert_tables_match(extractor, path)
+
+def test_other_specs_extract_everything(tmp_path):
+    path = write(tmp_path / "v1.xml", drug("DB1", "Alpha", products=["A1"]))
+    IncrementalExtractor(str(tmp_path / "state")).refresh(path)
+    specs = {"products": dict(prefix_path="db:products/db:product", simple_fields={"name": "db:name"})}
+    extractor = IncrementalExtractor(str(tmp_path / "state"), specs=specs)
+    assert extractor.refresh(path).full
+    pd.testing.assert_frame_equal(extractor.table("products"), Parser(path).extract(**specs["products"]))
+
+def test_publish(tmp_path):
+    path = write(tmp_path / "v1.xml", drug("DB1", "Alpha", products=["A1"], pathways=["P1"], genes=["G1"]))
+    extractor = IncrementalExtractor(str(tmp_path / "state"))
+    extractor.refresh(path)
+    extractor.publish(path, str(tmp_path / "cache"))
+
+    parser = Parser(path, cache_dir=str(tmp_path / "cache"))
+    with patch.object(Parser, "iter_drugs", side_effect=AssertionError("parsed")):
+        pd.testing.assert_frame_equal(parser.extract(**DEFAULT_SPECS["products"]), extractor.table("products"))
+        pd.testing.assert_frame_equal(parser.extract_proteins(), extractor.table("proteins"))
+        pd.testing.assert_frame_equal(parser.extract_id_name_df(), extractor.table("id_name"))
@@ -0,0 +1,83 @@
+import os
+from io import StringIO
+import pstats
+import tracemalloc
+from utils import instrumentation
+from utils.instrumentation import Metrics, recording, profile_next
+from utils.parser import Parser
+from utils.other import get_pathway_id_df
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>Lepirudin</name>
+        <pathways>
+            <pathway><name>PathA</name><drugs><drug><name>Lepirudin</name></drug></drugs></pathway>
+            <pathway><name>PathB</name><drugs><drug><name>Lepirudin</name></drug></drugs></pathway>
+        </pathways>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>SmallMolecule</name>
+    </drug>
+</drugbank>"""
+
+def test_disabled_records_nothing():
+    metrics = instrumentation.get_metrics()
+    before = (dict(metrics.counters), len(metrics.histograms))
+    Parser(StringIO(XML)).extract("db:pathways/db:pathway", simple_fields={"pathway": "db:name"})
+    assert (dict(metrics.counters), len(metrics.histograms)) == before
+
+def test_recording_counts_parser_calls(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML)
+    with recording() as metrics:
+        parser = Parser(str(path), streaming=True)
+        parser.extract("db:pathways/db:pathway", simple_fields={"pathway": "db:name"})
+        get_pathway_id_df(parser)
+    summary = metrics.summary()
+
+    assert summary["Parser.__init__"]["calls"] == 1
+    extract = summary["Parser.extract"]
+    # the outer call owns the scan counters, every call reports its own rows
+    assert extract["calls"] == 2
+    assert extract["drugs_scanned"] == 2
+    assert extract["rows_emitted"] == 4
+    assert extract["bytes_read"] == os.path.getsize(path)
+    assert summary["Parser.extract_many"]["rows_emitted"] == 4
+    assert "drugs_scanned" not in summary["Parser.extract_many"]
+    # the helper's own extractions are attributed to it
+    assert summary["get_pathway_id_df"]["drugs_scanned"] == 4
+    assert summary["get_pathway_id_df"]["rows_emitted"] == 3
+    assert instrumentation.get_metrics() is not metrics
+
+def test_prometheus_format():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.observe("drugbank_call_seconds", (("function", 'a"b'),), 0.5)
+    metrics.observe("drugbank_call_seconds", (("function", 'a"b'),), 5)
+    metrics.inc("drugbank_rows_emitted_total", (("function", "f"),), 3)
+    assert metrics.to_prometheus().splitlines() == [
+        "# TYPE drugbank_rows_emitted_total counter",
+        'drugbank_rows_emitted_total{function="f"} 3',
+        "# TYPE drugbank_call_seconds histogram",
+        'drugbank_call_seconds_bucket{function="a\\"b",le="0.1"} 0',
+        'drugbank_call_seconds_bucket{function="a\\"b",le="1"} 1',
+        'drugbank_call_seconds_bucket{function="a\\"b",le="+Inf"} 2',
+        'drugbank_call_seconds_sum{function="a\\"b"} 5.5',
+        'drugbank_call_seconds_count{function="a\\"b"} 2',
+    ]
+
+def test_profile_next(tmp_path):
+    profile_next("Parser.extract_id_name_df", str(tmp_path))
+    parser = Parser(StringIO(XML))
+    parser.extract_id_name_df()
+    parser.extract_id_name_df()
+
+    # only the next call is profiled
+    dumps = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(name)[1] for name in dumps] == [".prof", ".tracemalloc"]
+    stem = os.path.join(tmp_path, os.path.splitext(dumps[0])[0])
+    pstats.Stats(f"{stem}.prof")
+    tracemalloc.Snapshot.load(f"{stem}.tracemalloc")
+    assert not instrumentation.is_active()
@@ -13,6 +13,7 @@ from utils.mock_generator import (
     generate_mock_drugs,
     write_mock_database,
     generate_mock_database,
+    _map_in_order,
 )
 
 def test_parse_xml():
@@ -92,4 +93,80 @@ def test_generate_mock_database(
     mock_add.assert_called_once()
     mock_gen.assert_called_once()
     mock_write.assert_called_once_with(returned_root, "data/test_mock_output.xml")
-    
\ No newline at end of file
+    
+SEED_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" version="5.1" xsi:schemaLocation="http://www.drugbank.ca drugbank.xsd">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <groups><group>approved</group></groups>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>SmallMolecule</name>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00003</drugbank-id>
+        <name>Third</name>
+        <pathways><pathway><name>PathA</name><drugs><drug><name>Third</name></drug></drugs></pathway></pathways>
+    </drug>
+</drugbank>
+"""
+
+def test_generate_mock_database_streaming(tmp_path):
+    input_file = tmp_path / "input.xml"
+    input_file.write_text(SEED_XML)
+    output_file = tmp_path / "output.xml"
+    generate_mock_database(str(input_file), str(output_file), 4, 2, streaming=True)
+
+    root = ET.parse(output_file).getroot()
+    ns = {"db": "http://www.drugbank.ca"}
+    assert root.tag == "{http://www.drugbank.ca}drugbank"
+    assert root.get("version") == "5.1"
+    assert root.get("{http://www.w3.org/2001/XMLSchema-instance}schemaLocation") == "http://www.drugbank.ca drugbank.xsd"
+
+    ids = [d.find("db:drugbank-id[@primary='true']", ns).text for d in root.findall("db:drug", ns)]
+    assert len(ids) == 6
+    assert set(ids[:2]) <= {"DB00001", "DB00002", "DB00003"}
+    assert ids[2:] == ["MOCK00001", "MOCK00002", "MOCK00003", "MOCK00004"]
+    # mock drugs get the nested fields of the input
+    assert root.findall("db:drug/db:pathways/db:pathway/db:drugs/db:drug/db:name", ns)
+
+def test_generate_mock_database_seed_is_worker_independent(tmp_path):
+    input_file = tmp_path / "input.xml"
+    input_file.write_text(SEED_XML)
+    outputs = []
+    for workers, seed in [(None, 7), (3, 7), (2, 8)]:
+        output_file = tmp_path / f"output_{workers}_{seed}.xml"
+        generate_mock_database(str(input_file), str(output_file), 2500, 2, seed=seed, workers=workers)
+        outputs.append(output_file.read_bytes())
+    assert outputs[0] == outputs[1]
+    assert outputs[0] != outputs[2]
+    root = ET.fromstring(outputs[0])
+    assert len(root.findall("{http://www.drugbank.ca}drug")) == 2502
+
+def test_map_in_order_bounds_pending_results():
+    from concurrent.futures import ThreadPoolExecutor
+    submitted = []
+    consumed = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        original_submit = executor.submit
+        def submit(fn, item):
+            submitted.append(item)
+            return original_submit(fn, item)
+        executor.submit = submit
+        for result in _map_in_order(executor, lambda x: x * 10, range(10), 3):
+            # never more than 3 results generated ahead of the consumer
+            assert len(submitted) - len(consumed) <= 3
+            consumed.append(result)
+    assert consumed == [x * 10 for x in range(10)]
+
+def test_generate_mock_database_keeps_lists_by_default(tmp_path):
+    input_file = tmp_path / "input.xml"
+    input_file.write_text(SEED_XML)
+    with patch.object(Parser, "extract_fields_and_types", autospec=True, side_effect=Parser.extract_fields_and_types) as spy:
+        generate_mock_database(str(input_file), str(tmp_path / "lists.xml"), 3, 1)
+        generate_mock_database(str(input_file), str(tmp_path / "pools.xml"), 3, 1, nested_cap=2)
+    assert [call.kwargs for call in spy.call_args_list] == [
+        {"compact": False, "nested_cap": None}, {"compact": True, "nested_cap": 2}
+    ]
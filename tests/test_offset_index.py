@@ -0,0 +1,75 @@
+import os
+import pytest
+from utils.parser import Parser
+from utils.offset_index import OffsetIndex, StaleIndexError
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+<drug type="biotech">
+  <drugbank-id primary="true">DB00001</drugbank-id>
+  <drugbank-id>BTD00024</drugbank-id>
+  <name>Lepirudin</name>
+  <drug-interactions>
+    <drug-interaction><drugbank-id>DB00006</drugbank-id><name>Bivalirudin</name></drug-interaction>
+  </drug-interactions>
+  <pathways>
+    <pathway><name>PathA</name><drugs><drug><drugbank-id>DB00014</drugbank-id><name>Goserelin</name></drug></drugs></pathway>
+  </pathways>
+  <targets/>
+</drug>
+<drug type="small molecule">
+  <drugbank-id>NOPRIMARY</drugbank-id>
+  <name>Skipped</name>
+</drug>
+<drug type="small molecule">
+  <drugbank-id primary="true">DB00006</drugbank-id>
+  <drugbank-id>APRD00164</drugbank-id>
+  <name>Bivalirudin &amp; co</name>
+</drug>
+</drugbank>"""
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML)
+    return str(path)
+
+def test_build(path):
+    index = OffsetIndex.build(path)
+    assert [(primary, ids) for _, _, primary, ids in index.drugs] == [
+        ("DB00001", ["DB00001", "BTD00024"]),
+        ("DB00006", ["DB00006", "APRD00164"]),
+    ]
+    # ids of interactions and pathway drugs don't point at this drug
+    assert "DB00014" not in index
+    assert "NOPRIMARY" not in index
+    assert index.read("APRD00164").startswith(b'<drug type="small molecule">')
+    assert index.read("DB99999") is None
+
+def test_get_drug(path):
+    parser = Parser(path, streaming=True)
+    drug = parser.get_drug("BTD00024")
+    assert drug.find("db:name", parser.ns).text == "Lepirudin"
+    assert parser.get_drug("DB00006").find("db:name", parser.ns).text == "Bivalirudin & co"
+    assert parser.get_drug("DB99999") is None
+    # the sidecar is reused by the next parser
+    assert os.path.exists(f"{path}.idx")
+    assert OffsetIndex.load(path, f"{path}.idx").drugs == parser.offset_index.drugs
+
+def test_stale_sidecar(path):
+    OffsetIndex.load_or_build(path)
+    with open(path, "w") as f:
+        f.write(XML.replace("Lepirudin", "Lepirudin2"))
+    os.utime(path, ns=(0, 0))
+    assert OffsetIndex.load(path, f"{path}.idx") is None
+    index = OffsetIndex.load_or_build(path)
+    assert b"Lepirudin2" in index.read("DB00001")
+
+def test_stale_reads(path):
+    index = OffsetIndex.build(path)
+    index.read("DB00001")
+    with open(path, "w") as f:
+        f.write(XML.replace("Lepirudin", "Lepirudin2"))
+    os.utime(path, ns=(0, 0))
+    with pytest.raises(StaleIndexError):
+        index.read("DB00001")
@@ -1,7 +1,9 @@
 import pandas as pd
 import pytest
 from unittest import mock
-from utils.other import get_pathway_id_df, get_id_to_synonyms_df
+from io import StringIO
+from utils.parser import Parser
+from utils.other import get_pathway_id_df, get_id_to_synonyms_df, get_id_name_map
 
 def test_get_pathway_id_df(mocker):
     # Mock the parser
@@ -123,4 +125,84 @@ def test_get_id_to_synonyms_df(mocker):
     assert len(result_df) == 5  # 2 synonyms for DrugA, 1 for DrugB, 2 for DrugC
     assert result_df.loc[result_df["name"] == "DrugA", "synonyms"].tolist() == ["Alpha", "A1"]
     assert result_df.loc[result_df["name"] == "DrugB", "synonyms"].tolist() == ["Bravo"]
-    assert result_df.loc[result_df["name"] == "DrugC", "synonyms"].tolist() == ["Charlie", "C2"]
\ No newline at end of file
+    assert result_df.loc[result_df["name"] == "DrugC", "synonyms"].tolist() == ["Charlie", "C2"]
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+    <drug>
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>DrugA</name>
+        <synonyms><synonym>A1</synonym><synonym>A2</synonym></synonyms>
+        <pathways>
+            <pathway><name>PathA</name><drugs><drug><name>DrugA</name></drug><drug><name>DrugB</name></drug></drugs></pathway>
+            <pathway><name>PathB</name><drugs><drug><name>DrugB</name></drug><drug><name>Unknown</name></drug></drugs></pathway>
+            <pathway><name>PathC</name><drugs/></pathway>
+        </pathways>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>DrugB</name>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00003</drugbank-id>
+        <name>DrugA</name>
+        <synonyms><synonym>A3</synonym></synonyms>
+    </drug>
+    <drug>
+        <drugbank-id primary="true">DB00004</drugbank-id>
+        <name>DrugC</name>
+        <synonyms><synonym>C1</synonym></synonyms>
+    </drug>
+</drugbank>"""
+
+def test_helpers_match_pandas_merges():
+    """The integer-code joins must give exactly what the name merges gave."""
+    parser = Parser(StringIO(XML))
+    pathways_df = parser.extract(
+        "db:pathways/db:pathway",
+        simple_fields={"pathway-name": "db:name"},
+        nested_fields={"drugs": "db:drugs/db:drug/db:name"},
+        drug_id=None,
+        drug_name=None,
+    ).explode("drugs")
+    id_name_df = parser.extract_id_name_df()
+    merged = pd.merge(id_name_df, pathways_df, left_on="name", right_on="drugs", how="left")
+    expected = merged.groupby("id")["pathway-name"].count()
+    expected.sort_values(ascending=False, inplace=True)
+    pd.testing.assert_series_equal(get_pathway_id_df(parser), expected)
+
+    synonyms_df = parser.extract(".", nested_fields={"synonyms": "db:synonyms/db:synonym"}, drug_id=None)
+    expected = pd.merge(id_name_df, synonyms_df, on="name", how="inner")
+    pd.testing.assert_frame_equal(get_id_to_synonyms_df(parser), expected)
+
+def test_id_name_map_is_shared(mocker):
+    mock_parser = mocker.Mock()
+    mock_parser.extract_id_name_df.return_value = pd.DataFrame({"id": ["ID1"], "name": ["DrugA"]})
+    mock_parser.extract.return_value = pd.DataFrame({"name": ["DrugA"], "synonyms": ["A"]})
+    first = get_id_name_map(mock_parser)
+    get_id_to_synonyms_df(mock_parser)
+    assert get_id_name_map(mock_parser) is first
+    mock_parser.extract_id_name_df.assert_called_once()
+    assert first.codes_of(["DrugA", "Other"]).tolist() == [0, -1]
+
+def test_id_name_map_follows_file_changes(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    xml = """<drugbank xmlns="http://www.drugbank.ca"><drug>
+        <drugbank-id primary="true">DB00001</drugbank-id><name>{name}</name>
+    </drug></drugbank>"""
+    path.write_text(xml.format(name="Lepirudin"))
+    parser = Parser(str(path), streaming=True)
+    first = get_id_name_map(parser)
+    assert get_id_name_map(parser) is first
+    path.write_text(xml.format(name="Lepirudin2"))
+    assert get_id_name_map(parser).names.tolist() == ["Lepirudin2"]
+
+def test_missing_names_match_like_pandas_merges(mocker):
+    mock_parser = mocker.Mock()
+    id_name_df = pd.DataFrame({"id": ["ID1", "ID2", "ID3"], "name": ["DrugA", None, float("nan")]})
+    synonyms_df = pd.DataFrame({"name": [None, "DrugA", float("nan")], "synonyms": ["X", "A", "Y"]})
+    mock_parser.extract_id_name_df.return_value = id_name_df
+    mock_parser.extract.return_value = synonyms_df
+    expected = pd.merge(id_name_df, synonyms_df, on="name", how="inner")
+    pd.testing.assert_frame_equal(get_id_to_synonyms_df(mock_parser), expected)
+    assert get_id_name_map(mock_parser).codes_of(["DrugA", None, float("nan"), "Other"]).tolist() == [0, 1, 1, -1]
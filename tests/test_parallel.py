@@ -0,0 +1,145 @@
+import io
+import warnings
+import pytest
+import pandas as pd
+from utils.parser import Parser
+from utils.parallel import find_drug_ranges, split_ranges
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<!-- exported <drug> list -->
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+{drugs}
+</drugbank>
+"""
+
+DRUG = """<drug type="{type}">
+    <drugbank-id primary="true">DB{i:05d}</drugbank-id>
+    <drugbank-id>ALT{alt:05d}</drugbank-id>
+    <name>Drug{i}</name>
+    <products>
+        <product><name>Product{i}</name><country>{country}</country></product>
+        <product><name>Generic{i}</name><country>US</country></product>
+    </products>
+    <pathways>
+        <pathway><name>Path{i}</name><drugs><drug><name>Drug{i}</name></drug><drug><name>Other</name></drug></drugs></pathway>
+    </pathways>
+    <targets>
+        <target><id>T{i}</id><polypeptide id="P{i}" source="{source}"><locus>{i}p11</locus></polypeptide></target>
+    </targets>
+    <drug-interactions><drug-interaction><drugbank-id>DB00001</drugbank-id></drug-interaction></drug-interactions>
+</drug>"""
+
+@pytest.fixture
+def xml_path(tmp_path):
+    drugs = [
+        DRUG.format(
+            i=i,
+            alt=i % 5,  # shared secondary ids, later drugs overwrite them
+            type="biotech" if i % 2 else "small molecule",
+            country="EU" if i % 3 else "Canada",
+            source="Swiss-Prot" if i % 4 else "TrEMBL",
+        )
+        for i in range(1, 30)
+    ]
+    drugs.append('<drug type="empty"/>')
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML.format(drugs="\n".join(drugs)))
+    return str(path)
+
+def test_find_drug_ranges(xml_path):
+    header, footer, ranges = find_drug_ranges(xml_path)
+    assert header.endswith(b'<drugbank xmlns="http://www.drugbank.ca" version="5.1">')
+    assert footer == b"</drugbank>"
+    assert len(ranges) == 30
+    with open(xml_path, "rb") as f:
+        data = f.read()
+    assert all(data[start:end].startswith(b"<drug ") for start, end in ranges)
+    assert all(data[start:end].endswith(b"</drug>") for start, end in ranges[:-1])
+    assert data[slice(*ranges[-1])] == b'<drug type="empty"/>'
+
+def test_split_ranges():
+    ranges = [(0, 10), (10, 20), (20, 30)]
+    assert split_ranges(ranges, workers=1, chunk_size=2) == [(0, 20), (20, 30)]
+    assert split_ranges([], workers=4) == []
+
+def test_workers_must_be_positive(xml_path):
+    for workers in (0, -1):
+        with pytest.raises(ValueError):
+            Parser(xml_path, workers=workers)
+    # the workers read their chunks from the file, a stream can't be shared with them
+    with pytest.raises(ValueError):
+        Parser(io.BytesIO(b"<drugbank/>"), workers=2)
+
+def test_parallel_empty_file(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text('<drugbank xmlns="http://www.drugbank.ca"></drugbank>')
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = Parser(str(path), workers=2).extract_proteins(categorical=True)
+    pd.testing.assert_frame_equal(result, Parser(str(path)).extract_proteins(categorical=True))
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100])
+def test_parallel_matches_serial(xml_path, chunk_size):
+    serial = Parser(xml_path)
+    parallel = Parser(xml_path, workers=2, chunk_size=chunk_size)
+    specs = [
+        ("db:products/db:product", {"product": "db:name", "country": "db:country"}),
+        dict(prefix_path="db:pathways/db:pathway", simple_fields={"pathway-name": "db:name"},
+             nested_fields={"drugs": "db:drugs/db:drug/db:name"}, explode="drugs"),
+        dict(prefix_path="db:products/db:product", simple_fields={"country": "db:country"}, categorical=True),
+    ]
+    for result, expected in zip(parallel.extract_many(specs), serial.extract_many(specs)):
+        pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(parallel.extract_proteins(), serial.extract_proteins())
+    pd.testing.assert_frame_equal(
+        parallel.extract_proteins(categorical=True), serial.extract_proteins(categorical=True)
+    )
+    pd.testing.assert_frame_equal(parallel.extract_id_name_df(), serial.extract_id_name_df())
+
+    fields, nested, types = parallel.extract_fields_and_types()
+    serial_fields, serial_nested, serial_types = serial.extract_fields_and_types()
+    assert fields == serial_fields
+    assert nested == serial_nested
+    assert sorted(types) == sorted(serial_types)
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_parallel_proteins_with_missing_locus_and_location(tmp_path):
+    # only the first drug has a locus, no drug has a location
+    drugs = [DRUG.format(i=i, alt=i, type="biotech", country="US", source="Swiss-Prot") for i in range(1, 6)]
+    drugs[0] = drugs[0].replace("<locus>1p11</locus>", "<locus>Xp11</locus>")
+    for i in range(1, 5):
+        drugs[i] = drugs[i].replace(f"<locus>{i + 1}p11</locus>", "")
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML.format(drugs="\n".join(drugs)))
+
+    serial = Parser(str(path))
+    parallel = Parser(str(path), workers=2, chunk_size=1)
+    for categorical in (None, True):
+        pd.testing.assert_frame_equal(
+            parallel.extract_proteins(categorical=categorical), serial.extract_proteins(categorical=categorical)
+        )
+    assert serial.extract_proteins()["chromosome"].tolist() == ["X", None, None, None, None]
+
+def test_pool_and_ranges_are_reused(xml_path, monkeypatch):
+    from utils import parser as parser_module
+    scans = []
+    def counting_find_drug_ranges(path):
+        scans.append(path)
+        return find_drug_ranges(path)
+    monkeypatch.setattr(parser_module, "find_drug_ranges", counting_find_drug_ranges)
+
+    with Parser(xml_path, workers=2) as parser:
+        parser.extract_many([("db:products/db:product", {"product": "db:name"})])
+        pool = parser._pool
+        parser.extract_proteins()
+        parser.extract_id_name_df()
+        assert parser._pool is pool
+        assert len(scans) == 1
+
+        # a changed file is scanned again, the pool stays
+        with open(xml_path, "a") as f:
+            f.write("\n")
+        parser.extract_id_name_df()
+        assert len(scans) == 2
+        assert parser._pool is pool
+    assert parser._pool is None
@@ -120,3 +120,126 @@ def test_extract_fields_and_types(parser):
 
     # Check nested field extraction (e.g., targets)
     assert "targets" in nested_field_data, "Missing 'targets' in nested field extraction"
+
+
+@pytest.fixture
+def streaming_parser(mock_xml_file):
+    return Parser(mock_xml_file, streaming=True)
+
+def test_streaming_matches_tree(parser, streaming_parser):
+    """Streaming mode should produce the same results as the fully parsed tree."""
+    assert streaming_parser.et_root is None
+    prefix = "db:targets/db:target"
+    simple = {"target-name": "db:name"}
+    pd.testing.assert_frame_equal(
+        streaming_parser.extract(prefix, simple_fields=simple),
+        parser.extract(prefix, simple_fields=simple),
+    )
+    pd.testing.assert_frame_equal(streaming_parser.extract_proteins(), parser.extract_proteins())
+    pd.testing.assert_frame_equal(streaming_parser.extract_id_name_df(), parser.extract_id_name_df())
+    assert streaming_parser.extract_fields_and_types() == parser.extract_fields_and_types()
+
+def test_streaming_skips_nested_drugs():
+    """Only top-level drugs are yielded, not the ones referenced inside pathways."""
+    xml = StringIO("""<drugbank xmlns="http://www.drugbank.ca">
+        <drug>
+            <drugbank-id primary="true">DB00001</drugbank-id>
+            <name>Lepirudin</name>
+            <pathways>
+                <pathway>
+                    <name>PathA</name>
+                    <drugs>
+                        <drug><drugbank-id>DB00002</drugbank-id><name>Other</name></drug>
+                    </drugs>
+                </pathway>
+            </pathways>
+        </drug>
+    </drugbank>""")
+    parser = Parser(xml, streaming=True)
+    drugs = [drug.find("db:name", parser.ns).text for drug in parser.iter_drugs()]
+    assert drugs == ["Lepirudin"]
+    result = parser.extract(
+        "db:pathways/db:pathway",
+        simple_fields={"pathway-name": "db:name"},
+        nested_fields={"drugs": "db:drugs/db:drug/db:name"},
+    )
+    assert result["drugs"].tolist() == [["Other"]]
+
+def test_extract_many(parser):
+    """A single pass should return the same frames as separate extract calls."""
+    targets = ("db:targets/db:target", {"target-name": "db:name"})
+    groups = {"prefix_path": ".", "nested_fields": {"ids": "db:drugbank-id"}, "drug_id": None}
+    targets_df, groups_df = parser.extract_many([targets, groups])
+    pd.testing.assert_frame_equal(targets_df, parser.extract(*targets))
+    pd.testing.assert_frame_equal(groups_df, parser.extract(**groups))
+    assert groups_df["ids"].tolist() == [["DB00001", "BTD00024"], ["DB00002"]]
+
+def test_extract_explode_and_categorical(parser):
+    nested = {"ids": "db:drugbank-id"}
+    result = parser.extract(".", nested_fields=nested, explode="ids")
+    pd.testing.assert_frame_equal(result, parser.extract(".", nested_fields=nested).explode("ids"))
+
+    proteins = parser.extract_proteins(categorical=True)
+    assert isinstance(proteins["source"].dtype, pd.CategoricalDtype)
+
+def test_extract_fields_and_types_compact(parser):
+    field_data, nested_field_data, drug_types = parser.extract_fields_and_types()
+    pools, nested_pools, compact_types = parser.extract_fields_and_types(compact=True)
+    assert sorted(compact_types) == sorted(drug_types)
+    assert {tag: sorted(pool) for tag, pool in pools.items()} == {
+        tag: sorted(values) for tag, values in field_data.items()
+    }
+    assert {tag: list(pool) for tag, pool in nested_pools.items()} == nested_field_data
+
+    _, capped, _ = parser.extract_fields_and_types(compact=True, nested_cap=1)
+    assert all(len(pool) <= 1 for pool in capped.values())
+
+def test_extract_proteins_chromosomes():
+    loci = [
+        "11p15.5", "Xp22.32 and Yp11.3", "Yq11.221", "MT", "1cen-q12", None, "unknown",
+        "Xcen-q13", "Ycen", "Xp22.3 and Xq28", "MTHFR",
+    ]
+    targets = "".join(
+        f'<target><id>T{i}</id><polypeptide id="P{i}" source="Swiss-Prot">'
+        + (f"<locus>{locus}</locus>" if locus is not None else "")
+        + "</polypeptide></target>"
+        for i, locus in enumerate(loci)
+    )
+    xml = f"""<drugbank xmlns="http://www.drugbank.ca"><drug>
+        <drugbank-id primary="true">DB00001</drugbank-id><name>Lepirudin</name>
+        <targets>{targets}</targets>
+    </drug></drugbank>"""
+    result = Parser(StringIO(xml)).extract_proteins()
+    assert result["chromosome"].tolist() == ["11", "X,Y", "Y", "MT", "1", None, None, "X", "Y", "X", None]
+
+def test_extract_proteins_columns(parser):
+    full = parser.extract_proteins()
+    result = parser.extract_proteins(columns=["gene-name", "chromosome", "polypeptide-id"])
+    # columns keep the PROTEIN_COLUMNS order
+    pd.testing.assert_frame_equal(result, full[["polypeptide-id", "gene-name", "chromosome"]])
+    with pytest.raises(ValueError):
+        parser.extract_proteins(columns=["unknown"])
+
+    # an identifier without a resource has no GenAtlas id
+    xml = """<drugbank xmlns="http://www.drugbank.ca"><drug>
+        <drugbank-id primary="true">DB00001</drugbank-id><name>Lepirudin</name>
+        <targets><target><id>T1</id><polypeptide id="P1" source="Swiss-Prot"><gene-name>F2</gene-name>
+            <external-identifiers><external-identifier><identifier>F2</identifier></external-identifier></external-identifiers>
+        </polypeptide></target></targets>
+    </drug></drugbank>"""
+    result = Parser(StringIO(xml)).extract_proteins(columns=["gene-name"])
+    assert result.to_dict("list") == {"gene-name": ["F2"]}
+    result = Parser(StringIO(xml)).extract_proteins()
+    assert result["gene-name"].tolist() == ["F2"]
+    assert result["genatlas-id"].tolist() == [None]
+
+    # a polypeptide without attributes has no id and source
+    result = Parser(StringIO(xml.replace(' id="P1" source="Swiss-Prot"', ""))).extract_proteins()
+    assert result[["polypeptide-id", "source", "gene-name"]].values.tolist() == [[None, None, "F2"]]
+
+def test_extract_proteins_categorical(parser):
+    result = parser.extract_proteins(categorical=True)
+    for column in ("source", "chromosome", "location"):
+        assert isinstance(result[column].dtype, pd.CategoricalDtype)
+    assert result["gene-name"].dtype == object
+    pd.testing.assert_frame_equal(result.astype(object), parser.extract_proteins().astype(object))
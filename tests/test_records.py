@@ -0,0 +1,94 @@
+import pytest
+from unittest.mock import patch
+from utils.parser import Parser
+from utils.records import RecordSchema, load_records
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <drugbank-id>BTD00024</drugbank-id>
+        <name>Lepirudin</name>
+        <description>A long description that is not kept.</description>
+        <groups><group>approved</group><group>withdrawn</group></groups>
+        <pathways>
+            <pathway><name>PathA</name><drugs><drug><drugbank-id>DB00006</drugbank-id><name>Bivalirudin</name></drug></drugs></pathway>
+        </pathways>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id>NOPRIMARY</drugbank-id>
+        <name>Skipped</name>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00006</drugbank-id>
+        <name>Bivalirudin</name>
+        <groups><group>approved</group></groups>
+    </drug>
+</drugbank>"""
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML)
+    return str(path)
+
+def test_load_records(path):
+    store = load_records(path)
+    assert [record.drugbank_id for record in store] == ["DB00001", "DB00006"]
+    first, second = store.records
+    assert first.as_dict() == {
+        "drugbank_id": "DB00001",
+        "name": "Lepirudin",
+        "ids": ("DB00001", "BTD00024"),
+        "groups": ("approved", "withdrawn"),
+        "pathways": ("PathA",),
+    }
+    assert second.pathways == ()
+    # repeated values are shared between records
+    assert first.groups[0] is second.groups[0]
+    # records have no __dict__, only the schema fields
+    assert not hasattr(first, "__dict__")
+    with pytest.raises(AttributeError):
+        first.description = "x"
+
+    assert store.get("BTD00024") is first
+    assert "NOPRIMARY" not in store
+    assert store.get("DB99999") is None
+
+def test_lazy_fields(path):
+    store = Parser(path, streaming=True).extract_records()
+    record = store.get("DB00001")
+    assert store.raw(record).startswith(b"<drug type=\"biotech\">")
+    assert store.read_field(record, "db:description") == "A long description that is not kept."
+    assert store.read_field(record, "db:groups/db:group", all=True) == ["approved", "withdrawn"]
+    # nested <drug> tags of the pathways don't split the ranges
+    assert store.read_field(store.get("DB00006"), "db:name") == "Bivalirudin"
+
+def test_custom_schema(path):
+    schema = RecordSchema(simple_fields={"description": "db:description"})
+    store = load_records(path, schema)
+    assert store.get("DB00001").description == "A long description that is not kept."
+    assert store.get("DB00006").description is None
+    assert store.get("DB00001").as_dict() == {
+        "drugbank_id": "DB00001", "description": "A long description that is not kept."
+    }
+
+def test_fields_are_read_without_building_drugs(path, tmp_path):
+    with patch("xml.etree.ElementTree.iterparse", side_effect=AssertionError("iterparse")):
+        store = load_records(path)
+    assert store.get("DB00001").name == "Lepirudin"
+
+    # like element.text, only the text before the first child is kept, entities are decoded
+    mixed = tmp_path / "mixed.xml"
+    mixed.write_text(XML.replace(
+        "<name>Lepirudin</name>", "<name>Lep&amp;<b>bold</b>irudin</name>"
+    ))
+    assert load_records(str(mixed)).get("DB00001").name == "Lep&"
+
+def test_schema_rejects_bad_fields():
+    with pytest.raises(ValueError):
+        RecordSchema(simple_fields={"drugbank_id": "db:name"})
+    with pytest.raises(ValueError):
+        RecordSchema(simple_fields={"mechanism-of-action": "db:mechanism-of-action"})
+    with pytest.raises(ValueError):
+        RecordSchema(list_fields={"ids": "db:drugbank-id[@primary='true']"})
@@ -0,0 +1,38 @@
+from utils.response_cache import LRUResponseCache
+
+def test_lru_eviction():
+    cache = LRUResponseCache(maxsize=2)
+    cache.put("v1", "a", b"A")
+    cache.put("v1", "b", b"B")
+    assert cache.get("v1", "a") == b"A"
+    # b is the least recently used now
+    cache.put("v1", "c", b"C")
+    assert cache.get("v1", "b") is None
+    assert cache.get("v1", "a") == b"A"
+    assert cache.get("v1", "c") == b"C"
+    assert cache.stats()["evictions"] == 1
+
+def test_new_version_invalidates():
+    cache = LRUResponseCache()
+    cache.put("v1", "a", b"A")
+    assert cache.get("v2", "a") is None
+    assert len(cache) == 0
+    cache.put("v2", "a", b"A2")
+    assert cache.get("v2", "a") == b"A2"
+    assert cache.stats()["invalidations"] == 1
+
+def test_stats():
+    cache = LRUResponseCache(maxsize=10)
+    cache.get("v1", "a")
+    cache.put("v1", "a", b"12345")
+    cache.get("v1", "a")
+    cache.get("v1", "a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["size_bytes"]) == (2, 1, 1, 5)
+    assert stats["hit_ratio"] == 2 / 3
+    assert "drugbank_response_cache_hits_total 2" in cache.to_prometheus()
+
+def test_disabled():
+    cache = LRUResponseCache(maxsize=0)
+    cache.put("v1", "a", b"A")
+    assert cache.get("v1", "a") is None
@@ -0,0 +1,42 @@
+from utils.search import tokenize, build_search_index, SearchIndex
+
+ENTRIES = [
+    ("DB00001", "Lepirudin", ["Hirudin variant-1", "Refludan"]),
+    ("DB00006", "Bivalirudin", ["Bivalirudina", "Hirulog", "Angiomax", "Angiox", None]),
+    ("DB00014", "Goserelin", ["Zoladex"]),
+]
+
+def test_tokenize():
+    assert tokenize("Hirudin variant-1") == ["hirudin", "variant", "1"]
+    assert tokenize("Bivalirudína®") == ["bivalirudina"]
+    assert tokenize("  ") == []
+
+def test_exact_and_prefix():
+    index = build_search_index(ENTRIES)
+    assert index.search("angiomax") == [("DB00006", "Bivalirudin", 1.0)]
+    assert index.search("ANGIO") == []
+    assert [drug_id for drug_id, _, _ in index.search("angio", mode="prefix")] == ["DB00006"]
+    assert [drug_id for drug_id, _, _ in index.search("hiru", mode="prefix")] == ["DB00001", "DB00006"]
+    # every token has to match
+    assert [drug_id for drug_id, _, _ in index.search("hirudin variant")] == ["DB00001"]
+    assert index.search("hirudin zoladex") == []
+    assert index.search("hiru", mode="prefix", limit=1) == [("DB00001", "Lepirudin", 1.0)]
+
+def test_fuzzy():
+    index = build_search_index(ENTRIES)
+    results = index.search("goserlin", mode="fuzzy")
+    assert results[0][:2] == ("DB00014", "Goserelin")
+    assert 0 < results[0][2] < 1
+    assert index.search("refludan", mode="fuzzy")[0] == ("DB00001", "Lepirudin", 1.0)
+    assert index.search("xyzzy", mode="fuzzy") == []
+
+def test_save_and_load(tmp_path):
+    index = build_search_index(ENTRIES)
+    path = tmp_path / "search.json"
+    index.save(str(path))
+    loaded = SearchIndex.load(str(path))
+    assert (loaded.drug_ids, loaded.names) == (index.drug_ids, index.names)
+    assert (loaded.postings, loaded.term_trigrams) == (index.postings, index.term_trigrams)
+    assert loaded.search("hiru", mode="prefix") == index.search("hiru", mode="prefix")
+    assert loaded.search("zoladx", mode="fuzzy") == index.search("zoladx", mode="fuzzy")
+    assert SearchIndex.load(str(tmp_path / "missing.json")) is None
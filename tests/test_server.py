@@ -0,0 +1,134 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+from utils.dataset import DatasetHolder
+from utils.response_cache import LRUResponseCache
+from utils import instrumentation
+import server
+
+@pytest.fixture
+def client(drugbank_xml, monkeypatch):
+    monkeypatch.setattr(server, "holder", DatasetHolder(str(drugbank_xml)))
+    monkeypatch.setattr(server, "response_cache", LRUResponseCache(16))
+    with TestClient(server.app) as client:
+        yield client
+
+def test_pathways(client):
+    response = client.post("/pathways/", json={"id": "DB00001"})
+    assert response.status_code == 200
+    assert response.json() == {"drug_id": "DB00001", "pathway_count": 2}
+    assert client.post("/pathways/", json={"id": "DB99999"}).status_code == 404
+
+def test_drug_endpoints(client):
+    record = client.get("/drugs/BTD00024").json()
+    assert record["drugbank_id"] == "DB00001"
+    assert record["pathway_count"] == 2
+    assert client.get("/drugs/DB00001/targets").json() == {
+        "drug_id": "DB00001", "targets": [{"id": "BE0000048", "name": "Prothrombin"}]
+    }
+    assert client.get("/drugs/DB00001/groups").json()["groups"] == ["approved"]
+    assert client.get("/drugs/DB00001/unknown").status_code == 404
+    assert client.get("/drugs/DB99999").status_code == 404
+
+    response = client.post("/drugs/batch", json={"ids": ["DB00006", "DB99999"]}).json()
+    assert list(response["drugs"]) == ["DB00006"]
+    assert response["missing"] == ["DB99999"]
+
+def test_pathways_batch(client):
+    expected = [
+        {"drug_id": "DB00001", "found": True, "pathway_count": 2},
+        {"drug_id": "DB99999", "found": False, "pathway_count": None},
+        {"drug_id": "DB00006", "found": True, "pathway_count": 0},
+    ]
+    ids = {"ids": ["DB00001", "DB99999", "DB00006"]}
+    assert client.post("/pathways/batch", json=ids).json() == {"results": expected}
+
+    response = client.post("/pathways/batch?stream=true", json=ids)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+def test_reload_needs_token(client, monkeypatch):
+    assert client.post("/admin/reload").status_code == 403
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/reload").status_code == 401
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+def test_reload_in_shared_mode(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server, "SHARED_SNAPSHOT", "snapshots/current.json")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 409
+
+def test_reload(client, drugbank_xml, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    version = client.get("/version").json()
+    assert version["drugs"] == 2
+    assert version["reloads"] == 1
+
+    path = drugbank_xml
+    path.write_text(path.read_text().replace("<name>PathB</name>", "<name>PathB</name></pathway><pathway><name>PathC</name><drugs><drug><name>Lepirudin</name></drug></drugs>"))
+    old_dataset = server.holder.current
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 202
+    while server.holder.current is old_dataset:
+        assert server.holder.last_error is None
+        time.sleep(0.01)
+    assert client.post("/pathways/", json={"id": "DB00001"}).json()["pathway_count"] == 3
+    # the old dataset is untouched, requests that still hold it see consistent data
+    assert old_dataset.pathway_counts["DB00001"] == 2
+
+    new_version = client.get("/version").json()
+    assert new_version["version"] != version["version"]
+    assert new_version["reloads"] == 2
+    # measured from the reload request, so it covers the build
+    assert new_version["last_swap_seconds"] >= new_version["last_build_seconds"]
+
+def test_metrics(client):
+    with instrumentation.recording():
+        client.post("/pathways/", json={"id": "DB00001"})
+        client.get("/drugs/DB00001")
+        client.get("/drugs/DB99999")
+        text = client.get("/metrics").text
+    assert 'drugbank_request_seconds_count{method="POST",path="/pathways/",status="200"} 1' in text
+    assert 'drugbank_request_seconds_count{method="GET",path="/drugs/{drug_id}",status="200"} 1' in text
+    assert 'drugbank_request_seconds_count{method="GET",path="/drugs/{drug_id}",status="404"} 1' in text
+
+def test_search(client):
+    response = client.get("/search", params={"q": "lepir", "mode": "prefix"}).json()
+    assert response["results"] == [{"drug_id": "DB00001", "name": "Lepirudin", "score": 1.0}]
+    assert client.get("/search", params={"q": "lepirudin"}).json()["results"][0]["drug_id"] == "DB00001"
+    assert client.get("/search", params={"q": "bivalirudn", "mode": "fuzzy"}).json()["results"][0]["drug_id"] == "DB00006"
+    assert client.get("/search", params={"q": "x", "mode": "regex"}).status_code == 422
+
+def test_drug_xml(client):
+    response = client.get("/drugs/BTD00024/xml")
+    assert response.headers["content-type"].startswith("application/xml")
+    assert response.text.startswith("<drug>")
+    assert "<name>Lepirudin</name>" in response.text
+    assert client.get("/drugs/DB99999/xml").status_code == 404
+
+def test_response_cache(client):
+    for _ in range(3):
+        assert client.post("/pathways/", json={"id": "DB00001"}).json() == {"drug_id": "DB00001", "pathway_count": 2}
+    assert client.post("/pathways/", json={"id": "DB99999"}).status_code == 404
+    stats = client.get("/version").json()["response_cache"]
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 1)
+    assert "drugbank_response_cache_hits_total 2" in client.get("/metrics").text
+
+def test_conditional_requests(client):
+    response = client.get("/drugs/DB00001")
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert etag == f'"{client.get("/version").json()["version"]}"'
+
+    assert client.get("/drugs/DB00001", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/drugs/DB00001/groups", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert client.get("/drugs/DB00001", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get("/drugs/DB00001", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/drugs/DB00001", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+    assert client.get("/drugs/BTD00024/xml", headers={"If-None-Match": etag}).status_code == 304
+    # unknown drugs are still 404, whatever the validators say
+    for path in ("/drugs/DB99999", "/drugs/DB99999/groups", "/drugs/DB99999/xml"):
+        assert client.get(path, headers={"If-None-Match": "*"}).status_code == 404
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 404
+    # conditional headers only apply to GET
+    assert client.post("/pathways/", json={"id": "DB00001"}, headers={"If-None-Match": etag}).status_code == 200
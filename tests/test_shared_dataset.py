@@ -0,0 +1,83 @@
+import os
+import time
+import pandas as pd
+from utils.dataset import DatasetHolder, load_dataset
+from utils.shared_dataset import attach_dataset, attach_snapshot, publish_snapshot, publishing_loader, POINTER_NAME
+
+def test_attached_dataset_matches_loaded(tmp_path, drugbank_xml):
+    path = drugbank_xml
+    dataset = load_dataset(str(path))
+    pointer = publish_snapshot(dataset, str(tmp_path / "snapshots"))
+    attached = attach_dataset(pointer)
+
+    assert attached.version == dataset.version
+    assert attached.built_at == dataset.built_at
+    assert len(attached.index) == len(dataset.index)
+    for drug_id in ("DB00001", "BTD00024", "DB00006"):
+        assert drug_id in attached.index
+        assert attached.index.get(drug_id) == dataset.index.get(drug_id)
+    assert attached.index.get("DB99999") is None
+    assert attached.index.get_many(["BTD00024", "missing"]) == ({"BTD00024": dataset.index.get("DB00001")}, ["missing"])
+    counts = attached.pathway_counts
+    pd.testing.assert_series_equal(counts.to_series(), dataset.pathway_counts)
+    assert list(counts.index) == list(dataset.pathway_counts.index)
+    assert counts.index[:2] == list(dataset.pathway_counts.index[:2])
+    assert "BTD00024" in counts.index and "DB99999" not in counts.index
+    assert counts["BTD00024"] == dataset.pathway_counts["BTD00024"]
+    for drug_ids in (["DB00006", "DB00001"], ["DB00006", "DB99999"], []):
+        pd.testing.assert_series_equal(
+            counts.reindex(drug_ids), dataset.pathway_counts.reindex(drug_ids), check_index_type=False
+        )
+    for query, mode in (("hirudin", "exact"), ("hiru", "prefix"), ("bivalirudn", "fuzzy"), ("xyzzy", "exact")):
+        assert attached.search.search(query, mode=mode) == dataset.search.search(query, mode=mode)
+    assert attached.offsets.read("DB00006") == dataset.offsets.read("DB00006")
+
+def test_stale_offsets_are_not_written_to_the_snapshot(tmp_path, drugbank_xml):
+    path = drugbank_xml
+    pointer = publish_snapshot(load_dataset(str(path)), str(tmp_path / "snapshots"))
+    [sidecar] = (tmp_path / "snapshots").glob("*/offsets.idx")
+    saved = sidecar.read_bytes()
+
+    path.write_text(path.read_text().replace("Bivalirudin", "Bivalirudin2"))
+    attached = attach_dataset(pointer)
+    assert b"Bivalirudin2" in attached.offsets.read("DB00006")
+    assert sidecar.read_bytes() == saved
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text('<drugbank xmlns="http://www.drugbank.ca"></drugbank>')
+    pointer = publish_snapshot(load_dataset(str(path)), str(tmp_path / "snapshots"))
+    attached = attach_dataset(pointer)
+    assert len(attached.index) == 0
+    assert attached.index.get("DB00001") is None
+
+def test_old_snapshots_are_removed(tmp_path, drugbank_xml):
+    path = drugbank_xml
+    dataset = load_dataset(str(path))
+    snapshot_dir = tmp_path / "snapshots"
+    for _ in range(4):
+        publish_snapshot(dataset, str(snapshot_dir), keep=2)
+    snapshots = [entry for entry in os.listdir(snapshot_dir) if entry != POINTER_NAME]
+    assert len(snapshots) == 2
+    for snapshot in snapshots:
+        assert len(attach_snapshot(str(snapshot_dir / snapshot)).index) == 2
+
+def test_workers_follow_published_snapshots(tmp_path, drugbank_xml):
+    path = drugbank_xml
+    snapshot_dir = tmp_path / "snapshots"
+    loader = DatasetHolder(str(path), loader=publishing_loader(str(snapshot_dir)))
+    loader.load()
+    worker = DatasetHolder(str(snapshot_dir / POINTER_NAME), loader=attach_dataset)
+    first = worker.load()
+    assert first.index.get("DB00006")["name"] == "Bivalirudin"
+
+    worker.start_watching(0.01)
+    try:
+        path.write_text(path.read_text().replace("Bivalirudin", "Bivalirudin2"))
+        loader.load()
+        deadline = time.time() + 5
+        while worker.current is first and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop_watching()
+    assert worker.current.index.get("DB00006")["name"] == "Bivalirudin2"
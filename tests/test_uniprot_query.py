@@ -0,0 +1,127 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+import pytest
+from utils import uniprot_query
+from utils.uniprot_query import fetch_uniprot, build_query
+
+# responses of the stand-in server keyed by query
+RESPONSES = {
+    "protein_name=Prothrombin": {"results": [
+        {"entryAudit": {"firstPublicDate": "1986-07-21"}, "comments": [
+            {"commentType": "SIMILARITY", "texts": [{"value": "Belongs to the peptidase S1 family."}]},
+        ]},
+    ]},
+    "protein_name=Plasminogen": {"results": [
+        {"entryAudit": {"firstPublicDate": "1988-01-01"}, "comments": [
+            {"commentType": "FUNCTION", "texts": [{"value": "Not a family."}]},
+        ]},
+        {"entryAudit": {"firstPublicDate": "2001-05-30"}},
+    ]},
+}
+RESPONSES["(protein_name=Prothrombin) OR (protein_name=Plasminogen)"] = {
+    "results": RESPONSES["protein_name=Prothrombin"]["results"] + RESPONSES["protein_name=Plasminogen"]["results"],
+}
+# answered with a 200 whose body isn't JSON
+GARBAGE = "protein_name=Garbage"
+
+class UniProtStandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        with server.lock:
+            server.queries.append(query)
+            fail = server.failures.get(query, 0)
+            if fail:
+                server.failures[query] = fail - 1
+        if fail:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if query == GARBAGE:
+            self.send_response(200)
+            self.send_header("Content-Length", "8")
+            self.end_headers()
+            self.wfile.write(b"not json")
+            return
+        if query not in RESPONSES:
+            self.send_response(400)
+            self.end_headers()
+            return
+        params = parse_qs(urlparse(self.path).query)
+        results = RESPONSES[query]["results"]
+        next_link = None
+        if "size" in params:
+            # paged like UniProt, the cursor is the offset of the page
+            size = int(params["size"][0])
+            cursor = int(params.get("cursor", ["0"])[0])
+            if cursor + size < len(results):
+                next_url = f"http://127.0.0.1:{server.server_address[1]}{urlparse(self.path).path}?" + urlencode(
+                    {"query": query, "size": size, "cursor": cursor + size}
+                )
+                next_link = f'<{next_url}>; rel="next"'
+            results = results[cursor:cursor + size]
+        body = json.dumps({"results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if next_link is not None:
+            self.send_header("Link", next_link)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UniProtStandIn)
+    server.lock = threading.Lock()
+    server.queries = []
+    server.failures = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/uniprotkb/search"
+
+def test_build_query():
+    assert build_query(["A"]) == "protein_name=A"
+    assert build_query(["A", "B"]) == "(protein_name=A) OR (protein_name=B)"
+
+def test_fetch_uniprot(stand_in):
+    years, families = fetch_uniprot(["Prothrombin", "Plasminogen"], url=url(stand_in))
+    assert years == [1986, 1988, 2001]
+    assert families == {"Belongs to the peptidase S1 family."}
+
+def test_retries_and_errors(stand_in, capsys):
+    stand_in.failures["protein_name=Prothrombin"] = 2
+    years, _ = fetch_uniprot(["Prothrombin", "Unknown"], url=url(stand_in))
+    assert years == [1986]
+    assert stand_in.queries.count("protein_name=Prothrombin") == 3
+    assert "Error fetching data for Unknown:" in capsys.readouterr().out
+
+def test_invalid_json_is_an_error(stand_in, capsys):
+    years, _ = fetch_uniprot(["Garbage", "Prothrombin"], url=url(stand_in))
+    assert years == [1986]
+    assert "Error fetching data for Garbage:" in capsys.readouterr().out
+
+def test_batches_follow_pages(stand_in, monkeypatch):
+    monkeypatch.setattr(uniprot_query, "MAX_PAGE_SIZE", 1)
+    years, families = fetch_uniprot(["Prothrombin", "Plasminogen"], url=url(stand_in), batch_size=2)
+    assert sorted(years) == [1986, 1988, 2001]
+    assert families == {"Belongs to the peptidase S1 family."}
+    # one request per page of a single entry
+    assert len(stand_in.queries) == 3
+
+def test_cache_avoids_network(stand_in, tmp_path):
+    names = ["Prothrombin", "Plasminogen"]
+    first = fetch_uniprot(names, url=url(stand_in), cache_dir=str(tmp_path))
+    requests_made = len(stand_in.queries)
+    assert fetch_uniprot(names, url=url(stand_in), cache_dir=str(tmp_path)) == first
+    assert len(stand_in.queries) == requests_made
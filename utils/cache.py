@@ -0,0 +1,182 @@
+import contextlib
+import hashlib
+import json
+import os
+import pandas as pd
+
+# bump whenever the layout of the cached tables changes
+CACHE_VERSION = 3
+
+# schema metadata key of the rows holding NaN instead of None in object columns, arrow stores both as null
+NAN_ROWS_KEY = b"drugbank_nan_rows"
+
+# file hashes are memoized per (path, mtime, size) so repeated lookups don't re-read the file
+_hash_memo = {}
+
+def file_key(path, mode="hash"):
+    """
+        Identifies the contents of the source file.
+        mode="hash" uses a sha256 of the contents, mode="mtime" the modification time and size (cheaper, less strict).
+    """
+    stat = os.stat(path)
+    if mode == "mtime":
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _hash_memo:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hash_memo[memo_key] = digest.hexdigest()[:32]
+    return _hash_memo[memo_key]
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+        Opens a temporary file next to path, renamed over path when the block exits,
+        so concurrent readers never see half a file. The temporary file is removed if the block raises.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("The table cache needs pyarrow, install it with `pip install pyarrow`.") from e
+    return pa
+
+class TableCache():
+    """
+        On-disk cache of the DataFrames extracted from a single DrugBank file.
+        Tables are stored as Arrow IPC files named after the source file key,
+        so they are invalidated as soon as the XML changes, and read back with mmap.
+        File names also carry a digest of the absolute source path, so sources sharing a cache_dir
+        (drugbank.xml and drugbank-mock.xml, or one basename in two directories) never see each other's files.
+    """
+    def __init__(self, cache_dir, source, key_mode="hash"):
+        self.cache_dir = cache_dir
+        self.source = source
+        self.key_mode = key_mode
+        self._source_key = None
+        self._source_stat = None
+
+    @property
+    def source_key(self):
+        stat = os.stat(self.source)
+        stat = (stat.st_mtime_ns, stat.st_size)
+        if self._source_key is None or stat != self._source_stat:
+            self._source_key = file_key(self.source, self.key_mode)
+            self._source_stat = stat
+        return self._source_key
+
+    @property
+    def prefix(self):
+        """Start of the names of every cache file of the source, current or stale."""
+        base = os.path.splitext(os.path.basename(self.source))[0]
+        path_key = hashlib.sha1(os.path.abspath(self.source).encode()).hexdigest()[:8]
+        return f"{base}-{path_key}-"
+
+    def path_for(self, method, args):
+        """Path of the cache file for the result of method called with args (anything json serializable)."""
+        payload = json.dumps([CACHE_VERSION, method, args], sort_keys=True, default=str)
+        args_key = hashlib.sha1(payload.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self.prefix}{self.source_key}-{method}-{args_key}.arrow")
+
+    def load(self, method, args):
+        """Returns the cached DataFrame or None on a miss."""
+        path = self.path_for(method, args)
+        if not os.path.exists(path):
+            return None
+        return read_frame(path)
+
+    def store(self, method, args, df):
+        """Writes df to the cache."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_frame(self.path_for(method, args), df)
+
+    def get_or_compute(self, method, args, compute):
+        df = self.load(method, args)
+        if df is None:
+            df = compute()
+            self.store(method, args, df)
+        return df
+
+    def files(self):
+        """All cache files belonging to the source file, current or stale."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        prefix = self.prefix
+        return sorted(
+            os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+            if name.startswith(prefix) and name.endswith(".arrow")
+        )
+
+    def purge(self, stale_only=True):
+        """Removes the cache files of the source, by default only those of older file versions."""
+        current = f"{self.prefix}{self.source_key}-" if os.path.exists(self.source) else None
+        removed = []
+        for path in self.files():
+            if stale_only and current is not None and os.path.basename(path).startswith(current):
+                continue
+            os.remove(path)
+            removed.append(path)
+        return removed
+
+def write_frame(path, df, preserve_index=None):
+    """Writes df to path as an Arrow IPC file, with atomic_write."""
+    pa = _import_pyarrow()
+    table = frame_to_table(df, preserve_index)
+    with atomic_write(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_frame(path):
+    """Reads back a DataFrame written by write_frame, through a memory map."""
+    pa = _import_pyarrow()
+    with pa.memory_map(path, "r") as source:
+        return table_to_frame(pa.ipc.open_file(source).read_all())
+
+def frame_to_table(df, preserve_index=None):
+    """
+        Converts df to an Arrow table for table_to_frame.
+        The rows of object columns holding NaN (e.g. exploded empty lists) are kept in the schema metadata.
+    """
+    pa = _import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    nan_rows = {}
+    for position, column in enumerate(df.columns):
+        values = df.iloc[:, position]
+        if values.dtype != object:
+            continue
+        rows = [row for row, value in enumerate(values) if isinstance(value, float) and value != value]
+        if rows:
+            nan_rows[str(column)] = rows
+    if nan_rows:
+        metadata = dict(table.schema.metadata or {})
+        metadata[NAN_ROWS_KEY] = json.dumps(nan_rows).encode()
+        table = table.replace_schema_metadata(metadata)
+    return table
+
+def table_to_frame(table):
+    """Converts an Arrow table back to the DataFrame it was written from."""
+    pa = _import_pyarrow()
+    df = table.to_pandas()
+    nan_rows = json.loads((table.schema.metadata or {}).get(NAN_ROWS_KEY, b"{}"))
+    for name, rows in nan_rows.items():
+        values = df[name].to_numpy(dtype=object, copy=True)
+        values[rows] = float("nan")
+        df[name] = pd.Series(values, index=df.index, dtype=object)
+    # arrow gives back numpy arrays for list columns, extract returns python lists
+    for field in table.schema:
+        if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            if field.name in df.columns:
+                df[field.name] = pd.Series(table.column(field.name).to_pylist(), index=df.index, dtype=object)
+    return df
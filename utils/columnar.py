@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# low-cardinality columns that are worth storing as pandas Categorical
+CATEGORICAL_COLUMNS = ("source", "country", "route", "state")
+
+class ColumnarBuilder():
+    """
+        Collects rows straight into per-column lists instead of a list of dicts.
+        Nested (list) columns are kept as a flat values list plus row offsets,
+        so exploding them is a reshape rather than a per-row Python loop.
+    """
+    def __init__(self, columns, nested_columns=()):
+        self.columns = list(columns)
+        self.nested_columns = set(nested_columns)
+        self.data = {name: [] for name in self.columns}
+        self.offsets = {name: [0] for name in self.columns if name in self.nested_columns}
+        self.length = 0
+
+    def append(self, row):
+        """Appends a row given as a list of values ordered like the columns."""
+        for name, value in zip(self.columns, row):
+            if name in self.offsets:
+                values = self.data[name]
+                values.extend(value)
+                self.offsets[name].append(len(values))
+            else:
+                self.data[name].append(value)
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def nested_lists(self, name):
+        """Returns the nested column as a list of per-row lists."""
+        values = self.data[name]
+        offsets = self.offsets[name]
+        return [values[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def to_frame(self, explode=None, categorical=None):
+        """
+            Builds the DataFrame, equivalent to pd.DataFrame(list_of_row_dicts).
+            explode: name of a nested column to explode, same as calling .explode(explode) afterwards.
+            categorical: True for the default CATEGORICAL_COLUMNS or a list of column names.
+        """
+        frame_data = {}
+        for name in self.columns:
+            if name == explode:
+                continue
+            if name in self.offsets:
+                frame_data[name] = self.nested_lists(name)
+            else:
+                frame_data[name] = self.data[name]
+        df = pd.DataFrame(frame_data, columns=[c for c in self.columns if c != explode])
+
+        if explode is not None:
+            df = self._explode(df, explode)
+        return to_categorical(df, categorical)
+
+    def _explode(self, df, name):
+        values = self.data[name]
+        offsets = np.asarray(self.offsets[name], dtype=np.int64)
+        lengths = np.diff(offsets)
+        # rows with an empty list still produce a single row with NaN, like DataFrame.explode
+        counts = np.maximum(lengths, 1)
+        positions = np.repeat(np.arange(self.length), counts)
+
+        exploded = np.empty(int(counts.sum()), dtype=object)
+        starts = np.cumsum(counts) - counts
+        has_values = np.ones(len(exploded), dtype=bool)
+        has_values[starts[lengths == 0]] = False
+        exploded[has_values] = values
+        exploded[~has_values] = np.nan
+
+        df = df.take(positions)
+        df.insert(self.columns.index(name), name, pd.Series(list(exploded), index=df.index))
+        return df
+
+def to_categorical(df, categorical):
+    """Converts the requested columns of df to Categorical, see ColumnarBuilder.to_frame."""
+    if not categorical:
+        return df
+    names = CATEGORICAL_COLUMNS if categorical is True else categorical
+    for name in names:
+        if name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
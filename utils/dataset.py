@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import pandas as pd
+from utils.parser import Parser
+from utils.cache import file_key
+from utils.drug_index import build_drug_index
+from utils.offset_index import OffsetIndex
+from utils.search import SearchIndex, search_index_from_drug_index
+
+class Dataset():
+    """
+        Everything the server needs for one version of the data file.
+        A Dataset is never modified after it's built, reloads build a new one and swap it in.
+    """
+    def __init__(self, file, version, index, pathway_counts, build_seconds, search=None, offsets=None, modified_at=None):
+        self.file = file
+        self.version = version
+        self.index = index
+        self.pathway_counts = pathway_counts
+        self.search = search
+        self.offsets = offsets
+        self.build_seconds = build_seconds
+        self.built_at = datetime.now(timezone.utc)
+        # modification time of the file, sent as Last-Modified
+        self.modified_at = modified_at if modified_at is not None else self.built_at
+
+def pathway_counts_from_index(index):
+    """
+        Pathway count of every primary and secondary id, sorted like get_pathway_id_df.
+    """
+    counts = pd.Series(
+        {drug_id: index.records[primary]["pathway_count"] for drug_id, primary in index.aliases.items()},
+        dtype="int64",
+    )
+    counts.index.name = "id"
+    counts.name = "pathway-name"
+    return counts.sort_values(ascending=False)
+
+def load_search_index(file, version, index, cache_dir=None):
+    """
+        Returns the SearchIndex of index. With a cache_dir it's saved next to the cached tables,
+        keyed by the file version, so other workers load it instead of building it again.
+    """
+    if cache_dir is None:
+        return search_index_from_drug_index(index)
+    base = os.path.splitext(os.path.basename(file))[0]
+    path = os.path.join(cache_dir, f"{base}-{version}-search.json")
+    search = SearchIndex.load(path)
+    if search is None:
+        search = search_index_from_drug_index(index)
+        os.makedirs(cache_dir, exist_ok=True)
+        search.save(path)
+    return search
+
+def load_offset_index(file, cache_dir=None):
+    """Returns the OffsetIndex of file, with a cache_dir its sidecar is kept there instead of next to file."""
+    if cache_dir is None:
+        return OffsetIndex.build(file)
+    base = os.path.splitext(os.path.basename(file))[0]
+    os.makedirs(cache_dir, exist_ok=True)
+    return OffsetIndex.load_or_build(file, os.path.join(cache_dir, f"{base}-offsets.idx"))
+
+def load_dataset(file, cache_dir=None):
+    """Parses file and builds a Dataset."""
+    start = time.perf_counter()
+    modified_at = datetime.fromtimestamp(os.stat(file).st_mtime, timezone.utc)
+    version = file_key(file)
+    parser = Parser(file, streaming=True, cache_dir=cache_dir)
+    index = build_drug_index(parser)
+    pathway_counts = pathway_counts_from_index(index)
+    search = load_search_index(file, version, index, cache_dir)
+    offsets = load_offset_index(file, cache_dir)
+    return Dataset(file, version, index, pathway_counts, time.perf_counter() - start, search, offsets, modified_at)
+
+class DatasetHolder():
+    """
+        Holds the current Dataset and replaces it when the data file changes.
+        The new dataset is built on the side and swapped in with a single reference assignment,
+        so a request that already took `current` keeps a consistent view until it finishes.
+    """
+    def __init__(self, file, cache_dir=None, loader=load_dataset):
+        self.file = file
+        self.cache_dir = cache_dir
+        self.loader = loader
+        self.current = None
+        self.reloading = False
+        self.last_error = None
+        self.metrics = {
+            "reloads": 0,
+            "reload_failures": 0,
+            "last_build_seconds": None,
+            # from noticing the change (watcher or reload request) to the new dataset being served
+            "last_swap_seconds": None,
+        }
+        # (mtime, size) of the file when the current dataset was loaded
+        self.loaded_stat = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def load(self, detected_at=None):
+        """
+            Builds a dataset from the file and swaps it in. Returns the new dataset.
+            detected_at is the time.perf_counter() at which the change was noticed, the call by default.
+        """
+        if detected_at is None:
+            detected_at = time.perf_counter()
+        with self._lock:
+            return self._load_locked(detected_at)
+
+    def _load_locked(self, detected_at):
+        self.reloading = True
+        stat = self._stat()
+        try:
+            dataset = self.loader(self.file, self.cache_dir)
+        except Exception as e:
+            self.metrics["reload_failures"] += 1
+            self.last_error = repr(e)
+            raise
+        finally:
+            self.reloading = False
+
+        self.current = dataset
+        self.loaded_stat = stat
+        self.metrics["last_swap_seconds"] = time.perf_counter() - detected_at
+        self.metrics["last_build_seconds"] = dataset.build_seconds
+        self.metrics["reloads"] += 1
+        self.last_error = None
+        return dataset
+
+    def reload_in_background(self):
+        """Starts a reload in a thread. Returns False if a reload is already running."""
+        detected_at = time.perf_counter()
+        # the lock is taken here and released by the thread, so two calls can't both start one
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+        threading.Thread(target=self._reload_locked_quietly, args=(detected_at,), daemon=True).start()
+        return True
+
+    def _reload_locked_quietly(self, detected_at):
+        # like _reload_quietly, with the lock already taken by reload_in_background
+        try:
+            self._load_locked(detected_at)
+        except Exception:
+            pass
+        finally:
+            self._lock.release()
+
+    def _reload_quietly(self, detected_at=None):
+        # failures are kept in last_error and the metrics, the old dataset keeps being served
+        try:
+            self.load(detected_at)
+        except Exception:
+            pass
+
+    def start_watching(self, interval):
+        """Polls the file every interval seconds and reloads when its mtime or size changes."""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch(self, interval):
+        failed_stat = None
+        while not self._stop_watching.wait(interval):
+            seen = self._stat()
+            # a version that failed to load is not retried until the file changes again
+            if seen is None or seen == self.loaded_stat or seen == failed_stat:
+                continue
+            self._reload_quietly(time.perf_counter())
+            if self.loaded_stat != seen:
+                failed_stat = seen
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def status(self):
+        """Version and build information of the current dataset, plus reload metrics."""
+        dataset = self.current
+        return {
+            "file": self.file,
+            "version": dataset.version if dataset is not None else None,
+            "built_at": dataset.built_at.isoformat() if dataset is not None else None,
+            "drugs": len(dataset.index) if dataset is not None else 0,
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+            **self.metrics,
+        }
@@ -0,0 +1,107 @@
+from collections import Counter
+from utils.parser import PATHWAYS_SPEC
+
+# extractions needed to build the index, done in a single pass with Parser.extract_many
+INDEX_SPECS = [
+    dict(prefix_path=".", nested_fields={
+        "ids": "db:drugbank-id",
+        "synonyms": "db:synonyms/db:synonym",
+        "groups": "db:groups/db:group",
+    }),
+    dict(prefix_path="db:targets/db:target", simple_fields={"target-id": "db:id", "target-name": "db:name"}),
+    dict(prefix_path="db:products/db:product", simple_fields={"product-name": "db:name"}),
+    dict(prefix_path="db:pathways/db:pathway", simple_fields={"pathway-name": "db:name"}),
+    # same extraction as utils.other.get_pathway_id_df, pathways are counted by drug name
+    PATHWAYS_SPEC,
+]
+
+# fields of a record that can be served on their own
+RECORD_FIELDS = ("ids", "synonyms", "groups", "targets", "products", "pathways", "pathway_count")
+
+def _text(value):
+    """Missing values come back from pandas as NaN, the index stores None so records stay JSON friendly."""
+    return value if isinstance(value, str) else None
+
+class DrugIndex():
+    """
+        Read-only in-memory index of drugs for the server.
+        Records are plain dicts keyed by the primary drugbank-id,
+        aliases map every primary and secondary id to its primary one.
+    """
+    def __init__(self, records, aliases):
+        self.records = records
+        self.aliases = aliases
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, drug_id):
+        return drug_id in self.aliases
+
+    def get(self, drug_id):
+        """Returns the record of the drug with the given (primary or secondary) id, or None."""
+        primary = self.aliases.get(drug_id)
+        if primary is None:
+            return None
+        return self.records[primary]
+
+    def get_many(self, drug_ids):
+        """Returns a dict of the found records and a list of the missing ids."""
+        found = {}
+        missing = []
+        for drug_id in drug_ids:
+            record = self.get(drug_id)
+            if record is None:
+                missing.append(drug_id)
+            else:
+                found[drug_id] = record
+        return found, missing
+
+def build_drug_index(parser):
+    """Builds a DrugIndex with one pass over the drugs of parser."""
+    drugs_df, targets_df, products_df, pathways_df, pathway_drugs_df = parser.extract_many(INDEX_SPECS)
+
+    # pathway counts by name, matching get_pathway_id_df
+    pathway_counts = Counter()
+    for pathway_name, names in zip(pathway_drugs_df.get("pathway-name", []), pathway_drugs_df.get("drugs", [])):
+        if isinstance(pathway_name, str):
+            pathway_counts.update(names)
+
+    records = {}
+    aliases = {}
+    for primary, name, ids, synonyms, groups in zip(
+        drugs_df.get("drugbank-id", []),
+        drugs_df.get("name", []),
+        drugs_df.get("ids", []),
+        drugs_df.get("synonyms", []),
+        drugs_df.get("groups", []),
+    ):
+        records[primary] = {
+            "drugbank_id": primary,
+            "name": name,
+            "ids": ids,
+            "synonyms": synonyms,
+            "groups": groups,
+            "targets": [],
+            "products": [],
+            "pathways": [],
+            "pathway_count": pathway_counts.get(name, 0),
+        }
+        # later drugs overwrite shared secondary ids, like extract_id_name_df
+        for drug_id in ids:
+            aliases[drug_id] = primary
+
+    for primary, target_id, target_name in zip(
+        targets_df.get("drugbank-id", []), targets_df.get("target-id", []), targets_df.get("target-name", [])
+    ):
+        records[primary]["targets"].append({"id": _text(target_id), "name": _text(target_name)})
+    # distinct product names in order of appearance, dict keys keep the membership checks O(1)
+    products = {}
+    for primary, product_name in zip(products_df.get("drugbank-id", []), products_df.get("product-name", [])):
+        products.setdefault(primary, {})[_text(product_name)] = None
+    for primary, names in products.items():
+        records[primary]["products"] = list(names)
+    for primary, pathway_name in zip(pathways_df.get("drugbank-id", []), pathways_df.get("pathway-name", [])):
+        records[primary]["pathways"].append(_text(pathway_name))
+
+    return DrugIndex(records, aliases)
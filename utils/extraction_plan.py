@@ -0,0 +1,181 @@
+import re
+
+# a plain child step like "db:name" or "name", anything else (predicates, wildcards, //) is left to ElementPath
+_STEP_PATTERN = re.compile(r"(?:([\w.-]+):)?([\w.-]+)")
+
+# marks a simple field that has not been found yet (its text may legitimately be None)
+_MISSING = object()
+
+def resolve_path(path, ns):
+    """
+        Resolves a path like "db:drugs/db:drug/db:name" into a tuple of namespaced tags.
+        Returns None if the path uses anything beyond plain child steps.
+    """
+    tags = []
+    for step in path.split("/"):
+        if step in (".", ""):
+            if step == "" and path != "":
+                return None  # "//" or a leading/trailing slash
+            continue
+        match = _STEP_PATTERN.fullmatch(step)
+        if match is None:
+            return None
+        prefix, local = match.groups()
+        if prefix is not None:
+            if prefix not in ns:
+                return None
+            tags.append(f"{{{ns[prefix]}}}{local}")
+        elif "" in ns:
+            tags.append(f"{{{ns['']}}}{local}")
+        else:
+            tags.append(local)
+    return tuple(tags)
+
+def iter_path(element, tags):
+    """Yields the elements reached from element by following tags, in document order."""
+    if not tags:
+        yield element
+        return
+    head, rest = tags[0], tags[1:]
+    for child in element:
+        if child.tag == head:
+            yield from iter_path(child, rest)
+
+def find_id_and_name(drug, id_tag, name_tag):
+    """
+        Single pass over the drug children returning the primary drugbank-id and name texts.
+        Same as find("db:drugbank-id[@primary='true']") and find("db:name") with text_or_none.
+    """
+    id = name = None
+    id_found = name_found = False
+    for child in drug:
+        tag = child.tag
+        if not id_found and tag == id_tag and child.get("primary") == "true":
+            id = child.text
+            id_found = True
+        elif not name_found and tag == name_tag:
+            name = child.text
+            name_found = True
+        if id_found and name_found:
+            break
+    return id, name
+
+class _PlanNode():
+    """A node of the tag trie, stores which fields end at this tag."""
+    __slots__ = ("children", "simple", "nested")
+
+    def __init__(self):
+        self.children = {}
+        self.simple = []
+        self.nested = []
+
+    def child(self, tag):
+        node = self.children.get(tag)
+        if node is None:
+            node = self.children[tag] = _PlanNode()
+        return node
+
+class ExtractionPlan():
+    """
+        A compiled extraction spec (see `make_spec` in utils.parser).
+        Field paths are resolved once into namespaced tags and merged into a trie,
+        dispatched by child tag, so every element below a prefix is visited at most once.
+        Paths that can't be compiled fall back to ElementPath.
+    """
+    def __init__(self, spec, ns):
+        self.ns = ns
+        self.drug_name = spec["drug_name"]
+        self.drug_id = spec["drug_id"]
+        self.prefix_path = spec["prefix_path"]
+        self.prefix_tags = resolve_path(self.prefix_path, ns)
+
+        self.root = _PlanNode()
+        self.fallback = []  # (index, path, nested) evaluated with find/findall
+        self.field_names = []
+        self.nested = []
+        fields = [(name, path, False) for name, path in spec["simple_fields"].items()]
+        fields += [(name, path, True) for name, path in spec["nested_fields"].items()]
+        for index, (field_name, field_path, nested) in enumerate(fields):
+            self.field_names.append(field_name)
+            self.nested.append(nested)
+            tags = resolve_path(field_path, ns)
+            if tags is None:
+                self.fallback.append((index, field_path, nested))
+                continue
+            node = self.root
+            for tag in tags:
+                node = node.child(tag)
+            (node.nested if nested else node.simple).append(index)
+
+        names = []
+        if self.drug_name is not None:
+            names.append(self.drug_name)
+        if self.drug_id is not None:
+            names.append(self.drug_id)
+        names += self.field_names
+        # same semantics as filling a dict: a repeated name keeps its first position and the last value
+        self.columns = list(dict.fromkeys(names))
+        self.slots = None
+        if len(self.columns) != len(names):
+            self.slots = [self.columns.index(name) for name in names]
+        field_offset = len(names) - len(self.field_names)
+        last_writer = {name: position for position, name in enumerate(names)}
+        self.nested_columns = [
+            name for name in self.columns
+            if last_writer[name] >= field_offset and self.nested[last_writer[name] - field_offset]
+        ]
+
+    def iter_prefixes(self, drug):
+        """Yields the elements matched by the prefix path."""
+        if self.prefix_tags is None:
+            return iter(drug.findall(self.prefix_path, self.ns))
+        return iter_path(drug, self.prefix_tags)
+
+    def extract_fields(self, element):
+        """Returns the list of field values (text or list of texts) for a single prefix element."""
+        values = [[] if nested else _MISSING for nested in self.nested]
+        self._apply(element, self.root, values)
+        if self.root.children:
+            self._walk(element, self.root, values)
+
+        for index, field_path, nested in self.fallback:
+            if nested:
+                values[index] = [e.text for e in element.findall(field_path, self.ns)]
+            else:
+                found = element.find(field_path, self.ns)
+                values[index] = found.text if found is not None else None
+
+        return [None if value is _MISSING else value for value in values]
+
+    def extract_rows(self, drug, id, name, builder):
+        """Appends a row to the ColumnarBuilder for every prefix element of the drug."""
+        for prefix in self.iter_prefixes(drug):
+            row = []
+            if self.drug_name is not None:
+                row.append(name)
+            if self.drug_id is not None:
+                row.append(id)
+            row += self.extract_fields(prefix)
+            if self.slots is not None:
+                deduplicated = [None] * len(self.columns)
+                for slot, value in zip(self.slots, row):
+                    deduplicated[slot] = value
+                row = deduplicated
+            builder.append(row)
+
+    def _apply(self, element, node, values):
+        for index in node.simple:
+            if values[index] is _MISSING:
+                values[index] = element.text
+        for index in node.nested:
+            values[index].append(element.text)
+
+    def _walk(self, element, node, values):
+        children = node.children
+        for child in element:
+            sub = children.get(child.tag)
+            if sub is None:
+                continue
+            self._apply(child, sub, values)
+            if sub.children:
+                self._walk(child, sub, values)
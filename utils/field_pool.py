@@ -0,0 +1,112 @@
+import random
+import sys
+from bisect import bisect_right
+from itertools import accumulate
+
+def freeze(value):
+    """Hashable key of a value from Parser._extract_nested_field (text, or dict of lists of those)."""
+    if isinstance(value, dict):
+        return tuple((key, tuple(freeze(v) for v in values)) for key, values in value.items())
+    return value
+
+class FieldPool():
+    """
+        Compact stand-in for the list of every value of a field.
+        By default keeps each distinct value once (strings interned) with its count,
+        with reservoir_size set keeps a uniform sample of that many values instead.
+        Behaves like a read-only sequence of the values it represents, grouped by value,
+        so random.choice(pool) draws with the same distribution as from the raw list.
+    """
+    def __init__(self, reservoir_size=None, rng=None):
+        self.reservoir_size = reservoir_size
+        self.rng = rng  # None for the global random module, which can't be pickled into workers
+        self.values = []  # distinct values (or the reservoir) in first-seen order
+        self.counts = []
+        self.seen = 0  # number of values added, duplicates included
+        self._positions = {}
+        self._cumulative = None
+
+    def append(self, value):
+        self.seen += 1
+        self._cumulative = None
+        if isinstance(value, str):
+            value = sys.intern(value)
+
+        if self.reservoir_size is not None:
+            if len(self.values) < self.reservoir_size:
+                self.values.append(value)
+                self.counts.append(1)
+            else:
+                j = (self.rng or random).randrange(self.seen)
+                if j < self.reservoir_size:
+                    self.values[j] = value
+            return
+
+        key = freeze(value)
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self.values)
+            self.values.append(value)
+            self.counts.append(1)
+        else:
+            self.counts[position] += 1
+
+    def merge(self, other):
+        """Adds the values of another pool, e.g. from another chunk of the file."""
+        if self.reservoir_size is not None:
+            self._merge_reservoir(other)
+            return
+        self._cumulative = None
+        for value, count in zip(other.values, other.counts):
+            self.seen += count
+            key = freeze(value)
+            position = self._positions.get(key)
+            if position is None:
+                self._positions[key] = len(self.values)
+                self.values.append(value)
+                self.counts.append(count)
+            else:
+                self.counts[position] += count
+
+    def _merge_reservoir(self, other):
+        # each reservoir stands for its seen values, so the merged one draws its slots
+        # from both populations without replacement, then takes that many values of each sample
+        rng = self.rng or random
+        left, right = self.seen, other.seen
+        size = min(self.reservoir_size, left + right)
+        from_self = 0
+        for _ in range(size):
+            if rng.randrange(left + right) < left:
+                left -= 1
+                from_self += 1
+            else:
+                right -= 1
+        self.values = rng.sample(self.values, from_self) + rng.sample(other.values, size - from_self)
+        self.counts = [1] * size
+        self.seen += other.seen
+        self._cumulative = None
+
+    def _cumulative_counts(self):
+        if self._cumulative is None:
+            self._cumulative = list(accumulate(self.counts))
+        return self._cumulative
+
+    def __len__(self):
+        cumulative = self._cumulative_counts()
+        return cumulative[-1] if cumulative else 0
+
+    def __getitem__(self, index):
+        cumulative = self._cumulative_counts()
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("FieldPool index out of range")
+        return self.values[bisect_right(cumulative, index)]
+
+    def __iter__(self):
+        for value, count in zip(self.values, self.counts):
+            for _ in range(count):
+                yield value
+
+    def __repr__(self):
+        return f"FieldPool(distinct={len(self.values)}, seen={self.seen})"
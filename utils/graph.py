@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+# extractions needed to build the graph, done in a single pass with Parser.extract_many
+GRAPH_SPECS = [
+    # same targets and genes as Parser.extract_proteins, which only reads the first polypeptide of a target
+    dict(prefix_path="db:targets/db:target", simple_fields={
+        "target-id": "db:id",
+        "gene-name": "db:polypeptide/db:gene-name",
+    }),
+    dict(prefix_path="db:products/db:product", simple_fields={"product_name": "db:name"}),
+    dict(prefix_path="db:pathways/db:pathway", simple_fields={"pathway-name": "db:name"}),
+]
+
+# relations of a DrugGraph, each one is an Adjacency from the first node kind to the second
+RELATIONS = (
+    "drug_targets", "target_genes", "drug_genes", "drug_products", "drug_pathways",
+    "gene_drugs", "product_drugs", "pathway_drugs",
+)
+
+# upper bound on the (row, neighbour) pairs materialized at once by Adjacency.compose
+COMPOSE_CHUNK = 1 << 22
+
+def _expand(indptr, rows):
+    """
+        For every neighbour of rows returns the index into rows it belongs to
+        and its position in the indices array.
+    """
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    within = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, starts[owner] + within
+
+class Adjacency():
+    """
+        Compressed sparse row adjacency between two kinds of integer coded nodes.
+        The neighbours of row i are indices[indptr[i]:indptr[i + 1]], sorted and without duplicates.
+    """
+    def __init__(self, indptr, indices, num_cols):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_cols = num_cols
+
+    @classmethod
+    def from_pairs(cls, rows, cols, num_rows, num_cols):
+        """Builds the adjacency of the (rows[i], cols[i]) edges, duplicate edges are kept once."""
+        keys = np.unique(np.asarray(rows, dtype=np.int64) * num_cols + np.asarray(cols, dtype=np.int64))
+        rows, cols = np.divmod(keys, num_cols) if num_cols else (keys, keys)
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_rows), out=indptr[1:])
+        return cls(indptr, cols, num_cols)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, row):
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def pairs(self):
+        """Returns the edges as two arrays of row and column codes."""
+        return np.repeat(np.arange(len(self)), self.degrees()), self.indices
+
+    def transpose(self):
+        rows, cols = self.pairs()
+        return Adjacency.from_pairs(cols, rows, self.num_cols, len(self))
+
+    def compose(self, other, chunk=COMPOSE_CHUNK):
+        """
+            Adjacency from the rows of self to the columns of other through the shared middle nodes.
+            Rows are processed in blocks of about chunk paths so the path pairs never all exist at once.
+        """
+        other_degrees = other.degrees()
+        # number of paths starting at rows before i
+        paths_before = np.zeros(len(self.indices) + 1, dtype=np.int64)
+        np.cumsum(other_degrees[self.indices], out=paths_before[1:])
+        paths_before = paths_before[self.indptr]
+
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        blocks = []
+        start = 0
+        while start < len(self):
+            stop = np.searchsorted(paths_before, paths_before[start] + chunk, side="right") - 1
+            stop = min(max(stop, start + 1), len(self))
+            middle_owner, middle_positions = _expand(self.indptr, np.arange(start, stop))
+            owner, positions = _expand(other.indptr, self.indices[middle_positions])
+            block = Adjacency.from_pairs(
+                middle_owner[owner], other.indices[positions], stop - start, other.num_cols
+            )
+            indptr[start + 1:stop + 1] = indptr[start] + block.indptr[1:]
+            blocks.append(block.indices)
+            start = stop
+        indices = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int64)
+        return Adjacency(indptr, indices, other.num_cols)
+
+class DrugGraph():
+    """
+        Drug, target, gene, product and pathway nodes with the edges between them.
+        Nodes are integer codes into the label indexes, drugs are labelled by name
+        like the frames the notebook merges on.
+    """
+    def __init__(self, drugs, targets, genes, products, pathways,
+                 drug_targets, target_genes, drug_products, drug_pathways):
+        self.drugs = drugs
+        self.targets = targets
+        self.genes = genes
+        self.products = products
+        self.pathways = pathways
+
+        self.drug_targets = drug_targets
+        self.target_genes = target_genes
+        self.drug_products = drug_products
+        self.drug_pathways = drug_pathways
+        # derived relations
+        self.drug_genes = drug_targets.compose(target_genes)
+        self.gene_drugs = self.drug_genes.transpose()
+        self.product_drugs = drug_products.transpose()
+        self.pathway_drugs = drug_pathways.transpose()
+
+    def drugs_of_gene(self, gene):
+        """Names of the drugs targeting a polypeptide of gene."""
+        code = self.genes.get_indexer([gene])[0]
+        if code < 0:
+            return []
+        return self.drugs[self.gene_drugs[code]].tolist()
+
+    def products_of_gene(self, gene):
+        """Names of the products whose drug targets a polypeptide of gene."""
+        code = self.genes.get_indexer([gene])[0]
+        if code < 0:
+            return []
+        _, positions = _expand(self.drug_products.indptr, self.gene_drugs[code])
+        return self.products[np.unique(self.drug_products.indices[positions])].tolist()
+
+    def gene_counts(self, by="drug", with_products=False):
+        """
+            Series with the number of distinct drugs (by="drug") or products (by="product")
+            interacting with every gene, sorted descending.
+            with_products: only count drugs that have products, like merging the products and proteins frames.
+        """
+        if by == "product":
+            counts = self.gene_drugs.compose(self.drug_products).degrees()
+        elif by == "drug":
+            if with_products:
+                has_products = self.drug_products.degrees() > 0
+                owner, _ = self.gene_drugs.pairs()
+                counts = np.bincount(
+                    owner[has_products[self.gene_drugs.indices]], minlength=len(self.genes)
+                )
+            else:
+                counts = self.gene_drugs.degrees()
+        else:
+            raise ValueError(f"Unknown count {by!r}, expected 'drug' or 'product'")
+
+        counts = pd.Series(counts.astype("int64"), index=pd.Index(self.genes, name="gene-name"), name=f"{by}s")
+        counts = counts[counts > 0] if with_products or by == "product" else counts
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def top_genes(self, n=20, by="drug", with_products=False):
+        return self.gene_counts(by, with_products).head(n)
+
+    def degree_histogram(self, relation):
+        """Series mapping a degree to the number of nodes with it, for one of RELATIONS."""
+        if relation not in RELATIONS:
+            raise ValueError(f"Unknown relation {relation!r}, expected one of {RELATIONS}")
+        histogram = np.bincount(getattr(self, relation).degrees())
+        histogram = pd.Series(histogram, index=pd.RangeIndex(len(histogram), name="degree"), name="nodes")
+        return histogram[histogram > 0]
+
+def _edges(df, left, right):
+    """The rows of df where both columns are present."""
+    if df.empty or left not in df or right not in df:
+        return pd.DataFrame({left: pd.Series(dtype=object), right: pd.Series(dtype=object)})
+    return df.loc[df[left].notna() & df[right].notna(), [left, right]]
+
+def build_drug_graph(parser):
+    """Builds a DrugGraph with one pass over the drugs of parser."""
+    targets_df, products_df, pathways_df = parser.extract_many(GRAPH_SPECS)
+
+    drug_targets = _edges(targets_df, "name", "target-id")
+    target_genes = _edges(targets_df, "target-id", "gene-name")
+    drug_products = _edges(products_df, "name", "product_name")
+    drug_pathways = _edges(pathways_df, "name", "pathway-name")
+
+    drug_codes, drugs = pd.factorize(np.concatenate([
+        drug_targets["name"].to_numpy(dtype=object),
+        drug_products["name"].to_numpy(dtype=object),
+        drug_pathways["name"].to_numpy(dtype=object),
+    ]))
+    target_drug_codes, product_drug_codes, pathway_drug_codes = np.split(
+        drug_codes, np.cumsum([len(drug_targets), len(drug_products)])
+    )
+    target_codes, targets = pd.factorize(drug_targets["target-id"])
+    gene_target_codes = pd.Index(targets).get_indexer(target_genes["target-id"])
+    gene_codes, genes = pd.factorize(target_genes["gene-name"])
+    product_codes, products = pd.factorize(drug_products["product_name"])
+    pathway_codes, pathways = pd.factorize(drug_pathways["pathway-name"])
+
+    num_drugs = len(drugs)
+    return DrugGraph(
+        pd.Index(drugs, name="drug-name"),
+        pd.Index(targets, name="target-id"),
+        pd.Index(genes, name="gene-name"),
+        pd.Index(products, name="product_name"),
+        pd.Index(pathways, name="pathway-name"),
+        Adjacency.from_pairs(target_drug_codes, target_codes, num_drugs, len(targets)),
+        Adjacency.from_pairs(gene_target_codes, gene_codes, len(targets), len(genes)),
+        Adjacency.from_pairs(product_drug_codes, product_codes, num_drugs, len(products)),
+        Adjacency.from_pairs(pathway_drug_codes, pathway_codes, num_drugs, len(pathways)),
+    )
@@ -0,0 +1,237 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import time
+import pandas as pd
+from utils.cache import TableCache, atomic_write, read_frame, write_frame
+from utils.offset_index import scan_drugs
+from utils.parallel import find_root_tags
+from utils.parser import PATHWAYS_SPEC, PRODUCTS_SPEC, Parser, make_spec, proteins_cache_args
+
+# bump whenever the layout of the manifest or the stored tables changes
+MANIFEST_VERSION = 2
+
+# hidden column with the primary id of the drug every row came from, dropped from the returned tables
+KEY = "__drug"
+
+# the tables kept up to date by default, same extractions as utils.other and cache_tables.py
+DEFAULT_SPECS = {"products": PRODUCTS_SPEC, "pathways": PATHWAYS_SPEC}
+
+# one row per drug with its name, used for the id-name table
+_NAMES_SPEC = dict(prefix_path=".", drug_name="name", drug_id=KEY)
+
+_UPDATED_PATTERN = re.compile(rb"""\supdated\s*=\s*["']([^"']*)["']""")
+
+def scan_release(file):
+    """
+        Single raw scan of file, returns the root header and footer and, in document order,
+        a dict of primary id -> (start, end, content hash, updated attribute, all ids).
+        Drugs without a primary id are skipped, they have no rows in the extracted tables.
+    """
+    drugs = {}
+    with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header, footer, position = find_root_tags(data, file)
+        for start, length, primary, ids, start_tag in scan_drugs(data, position, start_tags=True):
+            end = start + length
+            updated = _UPDATED_PATTERN.search(start_tag)
+            drugs[primary] = (
+                start,
+                end,
+                hashlib.blake2b(data[start:end], digest_size=16).hexdigest(),
+                updated.group(1).decode("utf-8") if updated is not None else None,
+                ids,
+            )
+    return header, footer, drugs
+
+class ChangeReport():
+    """What a refresh found, ids are primary drugbank-ids in document order."""
+    def __init__(self, added, changed, removed, unchanged, changed_without_update, full, seconds):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.unchanged = unchanged
+        # drugs whose contents changed while their `updated` attribute didn't
+        self.changed_without_update = changed_without_update
+        # True when everything was extracted again (first run, other specs or namespaces)
+        self.full = full
+        self.seconds = seconds
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return (
+            f"ChangeReport(added={len(self.added)}, changed={len(self.changed)}, removed={len(self.removed)}, "
+            f"unchanged={self.unchanged}, full={self.full}, seconds={self.seconds:.2f})"
+        )
+
+class IncrementalExtractor():
+    """
+        Keeps the extracted tables of a DrugBank file up to date between releases.
+        A manifest of per-drug content hashes is stored with the tables in state_dir;
+        a refresh diffs the new file against it, extracts only the added and changed drugs
+        and patches their rows into the stored tables.
+        specs: table name -> keyword arguments of Parser.extract (without explode or categorical),
+        a "proteins" table (extract_proteins) and an "id_name" table (extract_id_name_df) are always kept.
+    """
+    def __init__(self, state_dir, specs=None, ns=None):
+        self.state_dir = state_dir
+        self.specs = dict(DEFAULT_SPECS if specs is None else specs)
+        self.ns = ns if ns is not None else {"db": "http://www.drugbank.ca"}
+        for name, spec in self.specs.items():
+            if name in ("proteins", "id_name", "names"):
+                raise ValueError(f"{name} is a reserved table name")
+            if spec.get("explode") is not None or spec.get("categorical"):
+                raise ValueError(f"{name}: explode and categorical aren't supported, apply them to the table")
+        self._manifest = None
+
+    def _path(self, name):
+        return os.path.join(self.state_dir, name)
+
+    def _key_column(self, name):
+        """The column identifying the drug of every row of a stored table."""
+        if name in self.specs and self.specs[name].get("drug_id", "drugbank-id") is not None:
+            return self.specs[name].get("drug_id", "drugbank-id")
+        return KEY
+
+    def _specs_key(self):
+        payload = json.dumps([MANIFEST_VERSION, self.specs, self.ns], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            path = self._path("manifest.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+        return self._manifest
+
+    def _extract(self, parser):
+        """Extracts every stored table from parser, each with its key column."""
+        names = list(self.specs)
+        specs = []
+        for name in names:
+            spec = dict(self.specs[name])
+            if self._key_column(name) == KEY:
+                spec["drug_id"] = KEY
+            specs.append(spec)
+        frames = parser.extract_many(specs + [_NAMES_SPEC])
+        tables = dict(zip(names + ["names"], frames))
+        tables["proteins"] = parser.extract_proteins(drug_id=KEY)
+        return tables
+
+    def _read_table(self, name):
+        return read_frame(self._path(f"{name}.arrow"))
+
+    def _write_table(self, name, df):
+        write_frame(self._path(f"{name}.arrow"), df, preserve_index=False)
+
+    def refresh(self, file):
+        """Brings the stored tables up to date with file, returns a ChangeReport."""
+        start_time = time.perf_counter()
+        header, footer, drugs = scan_release(file)
+        manifest = self.manifest
+        full = manifest is None or manifest["specs_key"] != self._specs_key()
+        old_drugs = {} if full else manifest["drugs"]
+
+        added = [key for key in drugs if key not in old_drugs]
+        changed = [key for key in drugs if key in old_drugs and old_drugs[key]["hash"] != drugs[key][2]]
+        removed = [key for key in old_drugs if key not in drugs]
+        changed_without_update = [key for key in changed if old_drugs[key]["updated"] == drugs[key][3]]
+        dirty = set(added) | set(changed)
+        positions = {key: position for position, key in enumerate(drugs)}
+
+        if full:
+            tables = self._extract(Parser(file, streaming=True, ns=self.ns))
+        elif dirty or removed or list(old_drugs) != list(drugs):
+            # only the dirty drugs are parsed, cut out of the file and wrapped in the root tags
+            with open(file, "rb") as f:
+                bodies = []
+                for key in drugs:
+                    if key in dirty:
+                        start, end = drugs[key][:2]
+                        f.seek(start)
+                        bodies.append(f.read(end - start))
+            new_rows = self._extract(Parser(io.BytesIO(header + b"\n".join(bodies) + footer), ns=self.ns))
+            stale = dirty | set(removed)
+            tables = {}
+            for name, rows in new_rows.items():
+                old = self._read_table(name)
+                key = self._key_column(name)
+                kept = old[~old[key].isin(stale)]
+                if not len(kept):
+                    # rows were extracted like Parser does, so an empty table keeps the dtypes Parser gives it
+                    merged = rows
+                elif not len(rows):
+                    merged = kept
+                else:
+                    merged = pd.concat([kept, rows], ignore_index=True)
+                # rows of a drug stay together and in their order, drugs follow the new document order
+                order = merged[key].map(positions).to_numpy().argsort(kind="stable")
+                tables[name] = merged.take(order).reset_index(drop=True)
+        else:
+            tables = {}
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        for name, df in tables.items():
+            self._write_table(name, df)
+
+        names = dict(zip(tables["names"][KEY], tables["names"]["name"])) if "names" in tables else {}
+        self._manifest = {
+            "version": MANIFEST_VERSION,
+            "specs_key": self._specs_key(),
+            "drugs": {
+                key: {
+                    "hash": digest,
+                    "updated": updated,
+                    "ids": ids,
+                    # drugs without a name aren't extracted, like in Parser.extract
+                    "name": names[key] if key in names else old_drugs.get(key, {}).get("name"),
+                }
+                for key, (_, _, digest, updated, ids) in drugs.items()
+            },
+        }
+        with atomic_write(self._path("manifest.json")) as f:
+            json.dump(self._manifest, f)
+
+        return ChangeReport(
+            added, changed, removed, len(drugs) - len(dirty), changed_without_update, full,
+            time.perf_counter() - start_time,
+        )
+
+    def table(self, name):
+        """
+            Returns a stored table, equal to the Parser call it stands for
+            ("proteins" is extract_proteins(), "id_name" is extract_id_name_df()).
+        """
+        if self.manifest is None:
+            raise ValueError("nothing extracted yet, call refresh first")
+        if name == "id_name":
+            # later ids overwrite earlier ones, like in extract_id_name_df
+            data = {}
+            for drug in self.manifest["drugs"].values():
+                for drug_id in drug["ids"]:
+                    data[drug_id] = drug["name"]
+            return pd.DataFrame({"id": list(data.keys()), "name": list(data.values())})
+        if name not in self.specs and name != "proteins":
+            raise KeyError(name)
+        df = self._read_table(name)
+        if KEY in df.columns:
+            df = df.drop(columns=KEY)
+        return df
+
+    def publish(self, file, cache_dir, key_mode="hash"):
+        """
+            Stores the tables in the TableCache of file, under the keys of the Parser calls they stand for,
+            so Parser(file, cache_dir=cache_dir) serves them without parsing.
+        """
+        cache = TableCache(cache_dir, file, key_mode=key_mode)
+        for name, spec in self.specs.items():
+            cache.store("extract", [make_spec(**spec), self.ns], self.table(name))
+        cache.store("extract_proteins", [proteins_cache_args(), self.ns], self.table("proteins"))
+        cache.store("extract_id_name_df", [[], self.ns], self.table("id_name"))
+        return cache.files()
@@ -0,0 +1,236 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# upper bounds of the latency histogram buckets in seconds, +Inf is implied
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram():
+    """Cumulative-bucket histogram in the Prometheus layout."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics():
+    """
+        Timings and counters keyed by metric name and a tuple of (label, value) pairs.
+        Every update takes the lock, so server threads can record concurrently.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(value)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """
+            Returns {function: {"calls", "seconds", counter: value, ...}} for the instrumented calls,
+            the short form for notebooks.
+        """
+        result = {}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                if name != "drugbank_call_seconds":
+                    continue
+                result[dict(labels)["function"]] = {"calls": histogram.count, "seconds": histogram.sum}
+            for (name, labels), value in self.counters.items():
+                function = dict(labels).get("function")
+                if function is not None:
+                    counter = name.removeprefix("drugbank_").removesuffix("_total")
+                    result.setdefault(function, {})[counter] = value
+        return result
+
+    def to_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+class _State():
+    def __init__(self):
+        self.enabled = os.environ.get("DRUGBANK_INSTRUMENT", "0") == "1"
+        # DRUGBANK_PROFILE names one instrumented function (e.g. Parser.extract_proteins),
+        # its next call is run under cProfile and tracemalloc and dumped to DRUGBANK_PROFILE_DIR
+        self.profile_target = os.environ.get("DRUGBANK_PROFILE") or None
+        self.profile_dir = os.environ.get("DRUGBANK_PROFILE_DIR", ".")
+        self.metrics = Metrics()
+
+_state = _State()
+# the outermost instrumented call of each thread owns the drugs and bytes counters
+_local = threading.local()
+
+def is_active():
+    """True when calls are recorded or a profile is pending, the only check done on the fast path."""
+    return _state.enabled or _state.profile_target is not None
+
+def get_metrics():
+    return _state.metrics
+
+def enable(metrics=None):
+    _state.enabled = True
+    if metrics is not None:
+        _state.metrics = metrics
+
+def disable():
+    _state.enabled = False
+
+def profile_next(function, directory="."):
+    """Profiles the next call of the instrumented function, like DRUGBANK_PROFILE does."""
+    _state.profile_target = function
+    _state.profile_dir = directory
+
+@contextmanager
+def recording():
+    """
+        Records into a fresh Metrics for the duration of the block and yields it, e.g. in a notebook:
+            with recording() as metrics:
+                parser.extract_proteins()
+            metrics.summary()
+    """
+    previous = (_state.enabled, _state.metrics)
+    metrics = Metrics()
+    enable(metrics)
+    try:
+        yield metrics
+    finally:
+        _state.enabled, _state.metrics = previous
+
+def current_function():
+    return getattr(_local, "function", None)
+
+def count(counter, value=1, function=None):
+    """Adds value to a counter of function, by default the outermost instrumented call, if recording."""
+    function = function or current_function()
+    if _state.enabled and function is not None:
+        _state.metrics.inc(f"drugbank_{counter}_total", (("function", function),), value)
+
+def count_bytes_read(file):
+    """Counts the size of file as read by the current call, file objects are not counted."""
+    if _state.enabled and isinstance(file, (str, bytes, os.PathLike)):
+        count("bytes_read", os.path.getsize(file))
+
+def count_rows(result):
+    """Rows of a DataFrame or Series, or of every DataFrame in a list, None for other results."""
+    if hasattr(result, "shape"):
+        return len(result)
+    if isinstance(result, list) and all(hasattr(df, "shape") for df in result):
+        return sum(len(df) for df in result)
+    return None
+
+def _profiled(name, fn, args, kwargs):
+    _state.profile_target = None
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        result = profiler.runcall(fn, *args, **kwargs)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        os.makedirs(_state.profile_dir, exist_ok=True)
+        stem = os.path.join(_state.profile_dir, f"{name}-{os.getpid()}-{int(time.time())}")
+        profiler.dump_stats(f"{stem}.prof")
+        snapshot.dump(f"{stem}.tracemalloc")
+    return result
+
+def instrumented(name):
+    """
+        Records the calls of the decorated function as drugbank_call_seconds{function=name}
+        and the rows it returns as drugbank_rows_emitted_total.
+        When nothing is recorded the wrapper costs a single flag check.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not is_active():
+                return fn(*args, **kwargs)
+
+            outermost = current_function() is None
+            if outermost:
+                _local.function = name
+            try:
+                start = time.perf_counter()
+                if _state.profile_target == name:
+                    result = _profiled(name, fn, args, kwargs)
+                else:
+                    result = fn(*args, **kwargs)
+                elapsed = time.perf_counter() - start
+            finally:
+                if outermost:
+                    _local.function = None
+
+            if _state.enabled:
+                labels = (("function", name),)
+                _state.metrics.observe("drugbank_call_seconds", labels, elapsed)
+                rows = count_rows(result)
+                if rows is not None:
+                    _state.metrics.inc("drugbank_rows_emitted_total", labels, rows)
+            return result
+        return wrapper
+    return decorator
+
+def counted(items):
+    """Yields from items, counting them as drugs scanned by the current call."""
+    function = current_function()
+    scanned = 0
+    try:
+        for item in items:
+            scanned += 1
+            yield item
+    finally:
+        count("drugs_scanned", scanned, function)
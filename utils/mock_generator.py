@@ -1,7 +1,13 @@
 import xml.etree.ElementTree as ET
 import random
 import copy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from utils.parser import Parser
+from utils.field_pool import FieldPool
+
+# number of mock IDs generated from one RNG stream, fixed so the output doesn't depend on the worker count
+SHARD_SIZE = 1000
 
 # Utility function to parse the XML file
 def parse_xml(input_file):
@@ -32,32 +38,37 @@ def add_real_drugs(mock_root, real_drugs):
 
 # Function to generate mock drugs with nested fields, including pathways
 def generate_mock_drugs(mock_root, num_mock_entries, field_data, nested_field_data, drug_types):
+    for i in range(1, num_mock_entries + 1):
+        mock_root.append(create_mock_drug(i, field_data, nested_field_data, drug_types))
+
+# Function to create a single mock drug element with the i-th mock ID
+def create_mock_drug(i, field_data, nested_field_data, drug_types, rng=random):
     if not drug_types:  # Fallback if no types were found
         drug_types = ['biotech', 'small molecule']
 
-    for i in range(1, num_mock_entries + 1):
-        # Randomly select a drug type
-        random_type = random.choice(drug_types)
+    # Randomly select a drug type
+    random_type = rng.choice(drug_types)
 
-        drug = ET.SubElement(
-            mock_root,
-            'drug',
-            attrib={'type': random_type, 'created': '2025-01-01', 'updated': '2025-01-01'}
-        )
+    drug = ET.Element(
+        'drug',
+        attrib={'type': random_type, 'created': '2025-01-01', 'updated': '2025-01-01'}
+    )
 
-        # Assign consecutive mock drug IDs
-        ET.SubElement(drug, 'drugbank-id', attrib={'primary': 'true'}).text = f"MOCK{i:05d}"
+    # Assign consecutive mock drug IDs
+    ET.SubElement(drug, 'drugbank-id', attrib={'primary': 'true'}).text = f"MOCK{i:05d}"
 
-        # Assign simple fields
-        for tag, values in field_data.items():
-            if values:
-                ET.SubElement(drug, tag).text = random.choice(values)
+    # Assign simple fields
+    for tag, values in field_data.items():
+        if values:
+            ET.SubElement(drug, tag).text = rng.choice(values)
 
-        # Assign nested fields (NEW!)
-        for tag, nested_values in nested_field_data.items():
-            parent_element = ET.SubElement(drug, tag)
-            for entry in nested_values:
-                _add_nested_field(parent_element, entry)
+    # Assign nested fields (NEW!)
+    for tag, nested_values in nested_field_data.items():
+        parent_element = ET.SubElement(drug, tag)
+        for entry in nested_values:
+            _add_nested_field(parent_element, entry)
+
+    return drug
 
 
 
@@ -81,16 +92,28 @@ def _add_nested_field(parent_element, nested_data):
 
 
 # Main function to generate the mock database
-def generate_mock_database(input_file, output_file, num_mock_entries, num_real_entries):
-    # Parse the input XML file
+def generate_mock_database(input_file, output_file, num_mock_entries, num_real_entries, streaming=False,
+                           seed=None, workers=None, nested_cap=None):
+    # seeded and parallel generation are only implemented by the streaming writer
+    if streaming or seed is not None or workers is not None:
+        return generate_mock_database_streaming(
+            input_file, output_file, num_mock_entries, num_real_entries,
+            seed=seed, workers=workers, nested_cap=nested_cap,
+        )
+
+    # Parse the input XML file (once, the parser reuses the root)
     tree, root = parse_xml(input_file)
-    parser = Parser(input_file)
+    parser = Parser(input_file, root=root)
 
     # Get namespaces
     namespaces = get_namespaces()
 
     # Extract simple and nested fields, as well as drug types
-    field_data, nested_field_data, drug_types = parser.extract_fields_and_types()
+    # plain lists by default, so a given random state generates the same drugs as before pools existed,
+    # with nested_cap the values are kept in pools and every nested field in a sample of nested_cap entries
+    field_data, nested_field_data, drug_types = parser.extract_fields_and_types(
+        compact=nested_cap is not None, nested_cap=nested_cap
+    )
 
     # Select random real entries
     real_drugs = select_real_drugs(root, namespaces, num_real_entries)
@@ -106,4 +129,134 @@ def generate_mock_database(input_file, output_file, num_mock_entries, num_real_e
 
     # Write the combined database to an output file
     write_mock_database(mock_root, output_file)
-    
\ No newline at end of file
+    
+
+# Streaming variant, memory doesn't grow with num_mock_entries
+
+def read_root_attrib(input_file):
+    """Returns the attributes of the root element, reading only the start of the file."""
+    if hasattr(input_file, "seek"):
+        input_file.seek(0)
+    for _, element in ET.iterparse(input_file, events=("start",)):
+        return dict(element.attrib)
+    return {}
+
+def sample_real_drugs(parser, num_real_entries, rng=random, nested_cap=None):
+    """
+    Single streaming pass over the input: collects the field data of every drug into FieldPools
+    and keeps a uniform reservoir sample of num_real_entries drugs, serialized as they are read.
+    """
+    field_data, nested_field_data, drug_types = {}, {}, set()
+    sampled = []
+    for seen, drug in enumerate(parser.iter_drugs()):
+        parser.collect_fields(
+            drug, field_data, nested_field_data, drug_types,
+            field_factory=FieldPool,
+            nested_factory=lambda: FieldPool(nested_cap, rng),
+        )
+        if seen < num_real_entries:
+            sampled.append(_serialize_drug(drug))
+        else:
+            j = rng.randint(0, seen)
+            if j < num_real_entries:
+                sampled[j] = _serialize_drug(drug)
+    # sorted, set order changes between processes and would change the generated types
+    return field_data, nested_field_data, sorted(drug_types), sampled
+
+def _serialize_drug(drug):
+    # drugs are cleared by the streaming parser afterwards, so they're copied as text right away
+    ET.indent(drug, space="  ", level=1)
+    drug.tail = None
+    return ET.tostring(drug, encoding="unicode")
+
+def _root_tags(root_attrib, namespaces):
+    # lets ElementTree write the namespace declarations, then splits around a marker
+    root = ET.Element(f"{{{namespaces['db']}}}drugbank", attrib=root_attrib)
+    marker = "@@DRUGS@@"
+    root.text = marker
+    start_tag, end_tag = ET.tostring(root, encoding="unicode").split(marker)
+    return start_tag, end_tag
+
+def shard_ranges(num_mock_entries, shard_size=SHARD_SIZE):
+    """Splits the mock IDs 1..num_mock_entries into (start, stop) shards."""
+    return [
+        (start, min(start + shard_size, num_mock_entries + 1))
+        for start in range(1, num_mock_entries + 1, shard_size)
+    ]
+
+def generate_shard(start, stop, seed, field_data, nested_field_data, drug_types):
+    """
+    Serialized mock drugs with IDs start..stop-1, drawn from an RNG seeded by (seed, start),
+    so a shard is the same whichever process generates it.
+    """
+    rng = random.Random(f"{seed}:{start}")
+    parts = []
+    for i in range(start, stop):
+        drug = create_mock_drug(i, field_data, nested_field_data, drug_types, rng)
+        ET.indent(drug, space="  ", level=1)
+        parts.append("\n  " + ET.tostring(drug, encoding="unicode"))
+    return "".join(parts)
+
+# field data of the pool workers, sent once per process by the initializer
+_worker_fields = None
+
+def _init_worker(field_data, nested_field_data, drug_types):
+    global _worker_fields
+    _worker_fields = (field_data, nested_field_data, drug_types)
+
+def _generate_worker_shard(shard):
+    start, stop, seed = shard
+    return generate_shard(start, stop, seed, *_worker_fields)
+
+def _map_in_order(executor, fn, items, max_pending):
+    """
+    Like executor.map, but with at most max_pending calls submitted and not yet consumed,
+    so results the caller hasn't taken yet don't pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def generate_mock_database_streaming(input_file, output_file, num_mock_entries, num_real_entries,
+                                     seed=None, workers=None, nested_cap=None):
+    """
+    Writes the mock database one drug at a time. Mock drugs are generated in shards of SHARD_SIZE IDs,
+    each with its own RNG stream, in a process pool when workers > 1.
+    For a given seed the output is byte-identical whatever the number of workers.
+    """
+    namespaces = get_namespaces()
+    ET.register_namespace('', namespaces['db'])  # Set default namespace
+    parser = Parser(input_file, streaming=True)
+    if seed is None:
+        seed = random.getrandbits(64)
+
+    field_data, nested_field_data, drug_types, real_drugs = sample_real_drugs(
+        parser, num_real_entries, random.Random(seed), nested_cap
+    )
+    start_tag, end_tag = _root_tags(read_root_attrib(input_file), namespaces)
+    shards = [(start, stop, seed) for start, stop in shard_ranges(num_mock_entries)]
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        f.write(start_tag)
+        for drug in real_drugs:
+            f.write("\n  " + drug)
+
+        if workers is not None and workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(field_data, nested_field_data, drug_types),
+            ) as executor:
+                # shards are written in order, a couple per worker are generated ahead
+                for text in _map_in_order(executor, _generate_worker_shard, shards, workers * 2):
+                    f.write(text)
+        else:
+            for start, stop, shard_seed in shards:
+                f.write(generate_shard(start, stop, shard_seed, field_data, nested_field_data, drug_types))
+
+        f.write("\n" + end_tag + "\n")
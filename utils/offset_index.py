@@ -0,0 +1,178 @@
+import json
+import mmap
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+from utils.cache import atomic_write, file_key
+from utils.parallel import find_root_tags
+
+# bump whenever the layout of the sidecar file changes
+OFFSET_INDEX_VERSION = 1
+
+# any start, end or empty element tag, comments and processing instructions don't match
+_TAG_PATTERN = re.compile(rb"<(/?)([A-Za-z_][\w.:-]*)([^>]*?)(/?)>")
+
+def _local_name(tag):
+    return tag.rsplit(b":", 1)[-1]
+
+def scan_drugs(data, position, start_tags=False):
+    """
+        Single pass over the tags of data from position (right after the root start tag) returning
+        (offset, length, primary id, all ids) of every top-level drug with a primary id,
+        looking only at <drugbank-id> children of the drug itself (not of interactions or pathway drugs).
+        With start_tags the raw <drug ...> start tag is appended to every tuple.
+    """
+    drugs = []
+    depth = 0
+    drug_start = None
+    start_tag = None
+    id_start = None
+    is_primary = False
+    primary = None
+    ids = []
+    for match in _TAG_PATTERN.finditer(data, position):
+        closing, tag, attributes, empty = match.groups()
+        if closing:
+            depth -= 1
+            if depth < 0:  # the root end tag
+                break
+            if depth == 0 and drug_start is not None:
+                if primary is not None:
+                    drug = (drug_start, match.end() - drug_start, primary, ids)
+                    drugs.append(drug + (start_tag,) if start_tags else drug)
+                drug_start = None
+            elif depth == 1 and id_start is not None:
+                drug_id = unescape(data[id_start:match.start()].decode("utf-8")).strip()
+                ids.append(drug_id)
+                if is_primary:
+                    primary = drug_id
+                id_start = None
+            continue
+        if empty:
+            continue
+        if depth == 0 and _local_name(tag) == b"drug":
+            drug_start = match.start()
+            start_tag = match.group(0)
+            primary = None
+            ids = []
+        elif depth == 1 and drug_start is not None and _local_name(tag) == b"drugbank-id":
+            id_start = match.end()
+            is_primary = re.search(rb"""primary\s*=\s*["']true["']""", attributes) is not None
+        depth += 1
+    return drugs
+
+class StaleIndexError(ValueError):
+    """The file changed since the OffsetIndex was built, its offsets can't be trusted."""
+
+class OffsetIndex():
+    """
+        Byte offset and length of every top-level <drug> of a DrugBank file, by primary and secondary id.
+        Single drugs are read through an mmap of the file and parsed on their own.
+    """
+    def __init__(self, file, source_key, header, footer, drugs):
+        self.file = file
+        self.source_key = source_key
+        self.header = header
+        self.footer = footer
+        # (offset, length, primary id, all ids) in document order
+        self.drugs = drugs
+        self.positions = {}
+        for offset, length, primary, ids in drugs:
+            # later drugs overwrite shared secondary ids, like extract_id_name_df
+            for drug_id in ids:
+                self.positions[drug_id] = (offset, length)
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, file):
+        """Builds the index with a single raw scan of file, nothing is parsed."""
+        with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header, footer, position = find_root_tags(data, file)
+            drugs = scan_drugs(data, position)
+        return cls(file, file_key(file, "mtime"), header, footer, drugs)
+
+    def save(self, path):
+        """Writes the index as JSON."""
+        with atomic_write(path) as f:
+            json.dump({
+                "version": OFFSET_INDEX_VERSION,
+                "source_key": self.source_key,
+                "header": self.header.decode("utf-8"),
+                "footer": self.footer.decode("utf-8"),
+                "drugs": self.drugs,
+            }, f)
+
+    @classmethod
+    def load(cls, file, path):
+        """Loads the index of file saved at path, None if it's missing, of another version or stale."""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != OFFSET_INDEX_VERSION or state.get("source_key") != file_key(file, "mtime"):
+            return None
+        return cls(
+            file, state["source_key"], state["header"].encode("utf-8"), state["footer"].encode("utf-8"),
+            [tuple(drug) for drug in state["drugs"]],
+        )
+
+    @classmethod
+    def load_or_build(cls, file, path=None):
+        """
+            Loads the sidecar index at path (by default file + ".idx"), building and saving it if needed.
+            If the sidecar can't be written the index is only kept in memory.
+        """
+        if path is None:
+            path = f"{file}.idx"
+        index = cls.load(file, path)
+        if index is None:
+            index = cls.build(file)
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        return index
+
+    def __len__(self):
+        return len(self.drugs)
+
+    def __contains__(self, drug_id):
+        return drug_id in self.positions
+
+    def read(self, drug_id):
+        """
+            Returns the bytes of the <drug> element with the given (primary or secondary) id, or None.
+            Raises StaleIndexError if the file changed since the index was built.
+        """
+        position = self.positions.get(drug_id)
+        if position is None:
+            return None
+        offset, length = position
+        with self._lock:
+            # a file rewritten in place would make the old offsets (and the mapping) point at garbage
+            if file_key(self.file, "mtime") != self.source_key:
+                if self._mmap is not None:
+                    self._mmap.close()
+                    self._mmap = None
+                raise StaleIndexError(f"{self.file} changed since its offset index was built")
+            if self._mmap is None:
+                with open(self.file, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap[offset:offset + length]
+
+    def element(self, drug_id):
+        """Parses only the <drug> element with the given id, None if there is no such drug."""
+        body = self.read(drug_id)
+        if body is None:
+            return None
+        # wrapped in the root tags so the namespace declarations apply
+        return ET.fromstring(self.header + body + self.footer)[0]
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
@@ -1,36 +1,97 @@
+import os
+import weakref
+import numpy as np
 import pandas as pd
-from utils.parser import Parser
+from utils.parser import PATHWAYS_SPEC, Parser
+from utils.instrumentation import instrumented
 
+# id/name maps are built once per parser and version of its file, and shared by the helpers below
+_id_name_maps = weakref.WeakKeyDictionary()
+
+class IdNameMap():
+    """
+        The id/name table of a parser with the names replaced by integer codes,
+        so the helpers can join on small integers instead of long name strings.
+    """
+    def __init__(self, id_name_df):
+        self.ids = id_name_df["id"]
+        self.names = id_name_df["name"]
+        # unique names in order of appearance, name_codes[i] is the code of the i-th id's name
+        # missing names (None and NaN alike) share a code, pd.merge matches them to each other too
+        self.name_codes, unique_names = pd.factorize(self.names, use_na_sentinel=False)
+        self.unique_names = pd.Index(unique_names)
+        missing = np.flatnonzero(pd.isna(self.unique_names))
+        self.missing_code = missing[0] if len(missing) else -1
+
+    def codes_of(self, names):
+        """Codes of the given names, -1 for names not in the map."""
+        codes = self.unique_names.get_indexer(names)
+        codes[pd.isna(names)] = self.missing_code
+        return codes
+
+def _source_version(parser: Parser):
+    """
+        What the id/name table of parser depends on: the cache key of its file with a TableCache,
+        the file's stat when drugs are read from the file on every call, None for a parsed tree.
+    """
+    # anything with extract_id_name_df can be passed in, e.g. the benchmarks' FrozenParser
+    cache = getattr(parser, "cache", None)
+    if cache is not None:
+        return cache.source_key
+    reads_file = getattr(parser, "streaming", False) or getattr(parser, "workers", None) is not None
+    if reads_file and isinstance(getattr(parser, "file", None), (str, os.PathLike)):
+        stat = os.stat(parser.file)
+        return (stat.st_mtime_ns, stat.st_size)
+    return None
+
+def get_id_name_map(parser: Parser) -> IdNameMap:
+    """Returns the memoized IdNameMap of parser, rebuilt when its file changes."""
+    version = _source_version(parser)
+    memo = _id_name_maps.get(parser)
+    if memo is None or memo[0] != version:
+        memo = _id_name_maps[parser] = (version, IdNameMap(parser.extract_id_name_df()))
+    return memo[1]
+
+@instrumented("get_pathway_id_df")
 def get_pathway_id_df(parser: Parser):
-    prefix = "db:pathways/db:pathway"
-    simple = {"pathway-name": "db:name"}
-    nested = {"drugs": "db:drugs/db:drug/db:name"}
-    pathways_df = parser.extract(
-        prefix,
-        simple_fields=simple, 
-        nested_fields=nested,
-        drug_id=None,
-        drug_name=None
-    ).explode("drugs")
-
-    id_name_df = parser.extract_id_name_df()
-
-    id_pathways_df = pd.merge(
-        id_name_df, 
-        pathways_df, 
-        left_on="name", 
-        right_on="drugs",
-        how="left"
-    ).drop(columns=["name", "drugs"])
-
-    id_no_pathways = id_pathways_df.groupby("id")['pathway-name'].count()
+    pathways_df = parser.extract(**PATHWAYS_SPEC).explode("drugs")
+
+    id_names = get_id_name_map(parser)
+
+    # count the pathways of every name code, then read the counts of every id through its name code
+    has_pathway = pathways_df["pathway-name"].notna().to_numpy()
+    codes = id_names.codes_of(pathways_df["drugs"].to_numpy()[has_pathway])
+    counts_by_code = np.bincount(codes[codes >= 0], minlength=len(id_names.unique_names))
+    counts = np.where(id_names.name_codes >= 0, counts_by_code[id_names.name_codes], 0)
+
+    id_no_pathways = pd.Series(
+        counts.astype("int64"), index=pd.Index(id_names.ids, name="id"), name="pathway-name"
+    ).sort_index()
     id_no_pathways.sort_values(ascending=False, inplace=True)
     return id_no_pathways
 
+@instrumented("get_id_to_synonyms_df")
 def get_id_to_synonyms_df(parser: Parser):
-    id_name_df = parser.extract_id_name_df()
+    id_names = get_id_name_map(parser)
 
     nested_fields = {'synonyms': 'db:synonyms/db:synonym'}
     id_to_synonyms_df = parser.extract(".", nested_fields=nested_fields, drug_id=None)
-    id_to_synonyms_df = pd.merge(id_name_df, id_to_synonyms_df, on='name', how='inner')
-    return id_to_synonyms_df
\ No newline at end of file
+
+    # inner join on the name codes, keeping the order of the ids like pd.merge does
+    right_codes = id_names.codes_of(id_to_synonyms_df["name"].to_numpy())
+    rows_per_code = np.bincount(right_codes[right_codes >= 0], minlength=len(id_names.unique_names))
+    # rows of the right frame grouped by code, in their original order
+    right_order = np.argsort(right_codes, kind="stable")[np.count_nonzero(right_codes < 0):]
+    code_starts = np.cumsum(rows_per_code) - rows_per_code
+
+    left_codes = id_names.name_codes
+    left_counts = np.where(left_codes >= 0, rows_per_code[left_codes], 0)
+    left_rows = np.repeat(np.arange(len(left_codes)), left_counts)
+    within = np.arange(len(left_rows)) - np.repeat(np.cumsum(left_counts) - left_counts, left_counts)
+    right_rows = right_order[code_starts[left_codes[left_rows]] + within]
+
+    # taking rows keeps the dtypes, so pandas doesn't infer them again
+    result = id_to_synonyms_df.drop(columns="name").take(right_rows).reset_index(drop=True)
+    result.insert(0, "id", id_names.ids.array.take(left_rows))
+    result.insert(1, "name", id_names.names.array.take(left_rows))
+    return result
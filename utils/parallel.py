@@ -0,0 +1,161 @@
+import io
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# opening and closing <drug> tags, but not <drugbank>, <drug-interactions> etc.
+_DRUG_TAG_PATTERN = re.compile(rb"<(/?)drug(?=[\s/>])")
+_START_TAG_PATTERN = re.compile(rb"<([A-Za-z_][\w.:-]*)[^>]*>")
+
+def _find_root(data):
+    """Finds the root start tag, skipping the xml declaration, comments and doctype."""
+    position = 0
+    while True:
+        position = data.find(b"<", position)
+        if position == -1:
+            return None
+        if data[position:position + 4] == b"<!--":
+            end = data.find(b"-->", position)
+        elif data[position:position + 2] in (b"<?", b"<!"):
+            end = data.find(b">", position)
+        else:
+            return _START_TAG_PATTERN.match(data, position)
+        if end == -1:
+            return None
+        position = end + 1
+
+def find_root_tags(data, path):
+    """
+        Returns the root start tag of the mapped file data (with its namespace declarations),
+        the root end tag and the offset right after the start tag.
+    """
+    root = _find_root(data)
+    if root is None:
+        raise ValueError(f"{path} has no root element")
+    return data[:root.end()], b"</" + root.group(1) + b">", root.end()
+
+def find_drug_ranges(path):
+    """
+        Scans the raw bytes of a DrugBank file for top-level <drug> elements.
+        Returns the root start tag (with its namespace declarations), the root end tag
+        and a list of (start, end) byte ranges, one per top-level drug, in document order.
+        Assumes <drug> tags don't appear inside comments or CDATA sections.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header, footer, body_start = find_root_tags(data, path)
+
+        ranges = []
+        depth = 0
+        start = None
+        for match in _DRUG_TAG_PATTERN.finditer(data, body_start):
+            if match.group(1):  # </drug>
+                depth -= 1
+                if depth == 0:
+                    ranges.append((start, data.find(b">", match.end()) + 1))
+                continue
+            tag_end = data.find(b">", match.end())
+            if data[tag_end - 1:tag_end] == b"/":  # <drug ... />
+                if depth == 0:
+                    ranges.append((match.start(), tag_end + 1))
+                continue
+            if depth == 0:
+                start = match.start()
+            depth += 1
+
+    return header, footer, ranges
+
+def split_ranges(ranges, workers, chunk_size=None):
+    """
+        Groups consecutive drug ranges into chunks of chunk_size drugs,
+        by default a few chunks per worker so the pool stays balanced.
+    """
+    if not ranges:
+        return []
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(ranges) // (workers * 4)))
+    return [
+        (ranges[i][0], ranges[min(i + chunk_size, len(ranges)) - 1][1])
+        for i in range(0, len(ranges), chunk_size)
+    ]
+
+def _run_chunk(path, header, footer, start, end, ns, method, args):
+    # imported here to avoid a circular import, utils.parser uses this module
+    from utils.parser import Parser
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+    parser = Parser(io.BytesIO(header + body + footer), ns)
+    return getattr(parser, method)(*args)
+
+def map_chunks(path, ns, method, args, workers=None, chunk_size=None, executor=None, drug_ranges=None):
+    """
+        Runs Parser.<method>(*args) on every chunk of top-level drugs in a process pool.
+        Returns the per-chunk results in document order.
+        executor: a pool to reuse, by default one is created for the call.
+        drug_ranges: the find_drug_ranges result of path if it's already known.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    header, footer, ranges = drug_ranges if drug_ranges is not None else find_drug_ranges(path)
+    chunks = split_ranges(ranges, workers, chunk_size)
+    if not chunks:
+        chunks = [(len(header), len(header))]
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return _submit_chunks(executor, path, header, footer, chunks, ns, method, args)
+    return _submit_chunks(executor, path, header, footer, chunks, ns, method, args)
+
+def _submit_chunks(executor, path, header, footer, chunks, ns, method, args):
+    futures = [
+        executor.submit(_run_chunk, path, header, footer, start, end, ns, method, args)
+        for start, end in chunks
+    ]
+    return [future.result() for future in futures]
+
+def concat_frames(frames):
+    """
+        Concatenates per-chunk DataFrames so the result equals the serial one.
+        Integer row labels (RangeIndex, or the repeated labels left by explode) are shifted
+        by the number of rows of the previous chunks.
+    """
+    frames = list(frames)
+    categorical = {
+        name for df in frames for name in df.columns
+        if isinstance(df[name].dtype, pd.CategoricalDtype)
+    }
+    offset = 0
+    shifted = []
+    for df in frames:
+        # empty chunks are left out, pandas would otherwise warn and let them change the result dtypes
+        if not len(df):
+            continue
+        df = df.set_axis(df.index + offset)
+        offset = df.index.max() + 1
+        # concatenated as objects, a chunk with only missing values has float categories
+        df = df.astype({name: object for name in categorical if name in df.columns})
+        shifted.append(df)
+    if not shifted:
+        # with no drugs at all, the empty frame of the first chunk keeps the columns and dtypes
+        return frames[0]
+    result = pd.concat(shifted)
+    if len(result.index) and result.index.equals(pd.RangeIndex(len(result))):
+        result.index = pd.RangeIndex(len(result))
+
+    for name in result.columns:
+        if name in categorical:
+            # categories differ between chunks, recompute them over the whole column
+            values = result[name].astype(object)
+            # a column with only missing values would infer float categories, the serial one has object
+            if values.notna().any():
+                values = values.infer_objects()
+            result[name] = values.astype("category")
+        elif result[name].dtype == object:
+            # a chunk with only missing values leaves object dtype behind
+            result[name] = result[name].infer_objects()
+    return result
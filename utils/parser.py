@@ -1,63 +1,368 @@
 import xml.etree.ElementTree as ET
 import pandas as pd
+import os
 import re
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from utils.extraction_plan import ExtractionPlan, find_id_and_name
+from utils.columnar import ColumnarBuilder, to_categorical
+from utils.cache import TableCache
+from utils.parallel import map_chunks, concat_frames, find_drug_ranges
+from utils.field_pool import FieldPool
+from utils.offset_index import OffsetIndex
+from utils.records import RecordSchema, DEFAULT_SCHEMA, load_records
+from utils.instrumentation import instrumented, is_active, counted, count_bytes_read
 
 def text_or_none(element):
     return element.text if element is not None else None
 
+def iterparse_drugs(file, ns):
+    """
+        Yields top-level drug elements one at a time using iterparse.
+        Every drug is cleared and detached from the root once the consumer moves on,
+        so memory is bounded by the largest single drug entry rather than the file size.
+    """
+    drug_tag = f"{{{ns['db']}}}drug"
+    # file objects (e.g. StringIO) have to be rewound so the stream can be read again
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+    root = None
+    depth = 0
+    for event, element in ET.iterparse(file, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        # nested <drug> tags (e.g. pathways/drugs/drug) live deeper than 1
+        if depth == 1:
+            if element.tag == drug_tag:
+                yield element
+            element.clear()
+            del root[:]
+
+PROTEIN_COLUMNS = [
+    "drug-name",
+    "target-id",
+    "source",
+    "polypeptide-id",
+    "polypeptide-name",
+    "gene-name",
+    "genatlas-id",
+    "locus",
+    "chromosome",
+    "location",
+]
+
+# repeated values of extract_proteins, returned as Categoricals with categorical=True
+PROTEIN_CATEGORICAL_COLUMNS = ("source", "chromosome", "location")
+
+# chromosome of each locus of a field: "11p15.5" -> 11, "Xcen-q13" -> X, "MT" -> MT,
+# a locus starts the field or follows "and", "or", ",", ";" or "/" as in "Xp22.32 and Yp11.3"
+# the lookahead keeps words like "MTHFR" or "unknown" out
+CHROMOSOME_PATTERN = re.compile(r"(?:^|\band\b|\bor\b|[,;/])\s*(\d+|MT|X|Y)(?=cen|[pq]|[^A-Za-z]|$)")
+
+def locus_chromosomes(locus):
+    """
+        Chromosomes of every locus in the Series in a single vectorized pass, None where there is none.
+        Fields with several loci get their distinct chromosomes joined in order: "Xp22.32 and Yp11.3" -> "X,Y".
+    """
+    # an empty or all-missing column isn't of object dtype, .str needs one
+    positions = locus.astype(object).reset_index(drop=True)
+    matches = positions.str.extractall(CHROMOSOME_PATTERN)[0]
+    chromosomes = matches.groupby(level=0).agg(lambda values: ",".join(dict.fromkeys(values)))
+    chromosomes = chromosomes.reindex(positions.index).astype(object)
+    return pd.Series(chromosomes.where(chromosomes.notna(), None).to_numpy(), index=locus.index, dtype=object)
+
+def proteins_cache_args(categorical=None, drug_id=None, columns=None):
+    """Cache args of `Parser.extract_proteins`, also used by IncrementalExtractor.publish to store under the same key."""
+    if drug_id is None and columns is None:
+        return [categorical]
+    return [categorical, drug_id, columns]
+
+def make_spec(prefix_path, simple_fields=None, nested_fields=None, drug_name='name', drug_id='drugbank-id',
+              explode=None, categorical=None):
+    """Normalizes the arguments of `Parser.extract` into a spec dict."""
+    return {
+        "prefix_path": prefix_path,
+        "simple_fields": simple_fields if simple_fields is not None else dict(),
+        "nested_fields": nested_fields if nested_fields is not None else dict(),
+        "drug_name": drug_name,
+        "drug_id": drug_id,
+        "explode": explode,
+        "categorical": categorical,
+    }
+
+# `extract` arguments of the products and pathways tables of analysis.ipynb, the pathways one is also used by
+# utils.other.get_pathway_id_df and the DrugIndex; defined once so every caller hits the same cache entries
+PRODUCTS_SPEC = dict(
+    prefix_path="db:products/db:product",
+    simple_fields={
+        "product_name": "db:name",
+        "labeller": "db:labeller",
+        "ndc_product_code": "db:ndc-product-code",
+        "dosage_form": "db:dosage-form",
+        "route": "db:route",
+        "strength": "db:strength",
+        "country": "db:country",
+        "source": "db:source",
+    },
+)
+PATHWAYS_SPEC = dict(
+    prefix_path="db:pathways/db:pathway",
+    simple_fields={"pathway-name": "db:name"},
+    nested_fields={"drugs": "db:drugs/db:drug/db:name"},
+    drug_id=None,
+    drug_name=None,
+)
+
 class Parser():
-    def __init__(self, file, ns=None):
-        self.et_root = ET.parse(file).getroot()
+    @instrumented("Parser.__init__")
+    def __init__(self, file, ns=None, streaming=False, cache_dir=None, cache_key="hash", workers=None, chunk_size=None,
+                 root=None):
+        # root: an already parsed root element of file, so it isn't parsed a second time
+        if workers is not None and workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        if workers is not None and not isinstance(file, (str, os.PathLike)):
+            raise ValueError("workers needs the file to be a path, the chunks are read from it by every worker")
+        self.file = file
+        self.streaming = streaming
+        # with workers set drugs are split into chunks of chunk_size
+        # and extracted in a process pool, each worker parses only its own chunk
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # extracted tables are cached on disk, only possible when file is a path
+        self.cache = None
+        if cache_dir is not None and isinstance(file, (str, bytes, os.PathLike)):
+            self.cache = TableCache(cache_dir, file, key_mode=cache_key)
+        # in streaming mode the tree is never held, drugs are read from the file on demand
+        # with a cache the tree is only parsed on the first miss
+        self._et_root = root
+        self._offset_index = None
+        # process pool and (file stat, find_drug_ranges result) reused by the calls with workers
+        self._pool = None
+        self._pool_finalizer = None
+        self._drug_ranges = None
+        if root is None and not streaming and self.cache is None and self.workers is None:
+            count_bytes_read(file)
+            self._et_root = ET.parse(file).getroot()
         if ns is not None:
             self.ns = ns
         else:
             self.ns = {
                 "db": "http://www.drugbank.ca", 
             }
+
+    @property
+    def et_root(self):
+        if self._et_root is None and not self.streaming:
+            count_bytes_read(self.file)
+            self._et_root = ET.parse(self.file).getroot()
+        return self._et_root
+
+    @property
+    def offset_index(self):
+        """The OffsetIndex of the file, loaded from or saved to the file + ".idx" sidecar on first use."""
+        if self._offset_index is None:
+            if not isinstance(self.file, (str, os.PathLike)):
+                raise ValueError("random access by id needs the file to be a path")
+            self._offset_index = OffsetIndex.load_or_build(self.file)
+        return self._offset_index
+
+    def get_drug(self, drug_id):
+        """
+            Returns the <drug> element with the given primary or secondary id, or None.
+            Only that element is read (through an mmap) and parsed, the tree is never needed.
+        """
+        return self.offset_index.element(drug_id)
+
+    def _map_chunks(self, method, *args):
+        """
+            Runs method(*args) on every chunk in the process pool, returns the results in drug order.
+            The pool is started on the first call and kept, the drug ranges are scanned again only when the file changes.
+        """
+        stat = os.stat(self.file)
+        stat = (stat.st_mtime_ns, stat.st_size)
+        if self._drug_ranges is None or self._drug_ranges[0] != stat:
+            self._drug_ranges = (stat, find_drug_ranges(self.file))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1)
+            # the workers are stopped once the parser is garbage collected, or by close()
+            self._pool_finalizer = weakref.finalize(self, self._pool.shutdown, wait=False)
+        return map_chunks(
+            self.file, self.ns, method, args, self.workers, self.chunk_size,
+            executor=self._pool, drug_ranges=self._drug_ranges[1],
+        )
+
+    def close(self):
+        """Stops the process pool of a parser with workers, a later call starts a new one."""
+        if self._pool is not None:
+            self._pool_finalizer.detach()
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _cached(self, method, args, compute):
+        """Returns compute() through the table cache if there is one."""
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(method, [args, self.ns], compute)
+
+    def iter_drugs(self):
+        """
+            Yields every top-level drug element, either from the parsed tree or from the stream.
+            With instrumentation on, the drugs are counted as scanned by the calling extract method.
+        """
+        if self.streaming:
+            count_bytes_read(self.file)
+            drugs = iterparse_drugs(self.file, self.ns)
+        else:
+            drugs = self.et_root.findall("db:drug", self.ns)
+        yield from counted(drugs) if is_active() else drugs
     
-    def extract(self, prefix_path, simple_fields=None, nested_fields=None, drug_name='name', drug_id='drugbank-id'):
+    @instrumented("Parser.extract_records")
+    def extract_records(self, schema=DEFAULT_SCHEMA):
+        """
+            Returns a RecordStore keeping only the schema fields of every drug in __slots__ records,
+            with the byte range of each drug so the other fields can be read from the file on demand.
+            Needs file to be a path, the tree is never held.
+        """
+        if not isinstance(self.file, (str, os.PathLike)):
+            raise ValueError("extract_records needs the file to be a path")
+        if schema.ns != self.ns:
+            schema = RecordSchema(schema.simple_fields, schema.list_fields, self.ns)
+        count_bytes_read(self.file)
+        return load_records(self.file, schema)
+
+    @instrumented("Parser.extract")
+    def extract(self, prefix_path, simple_fields=None, nested_fields=None, drug_name='name', drug_id='drugbank-id',
+                compiled=True, explode=None, categorical=None):
         """
             For every drug, goes to every prefix_path and extracts simple_fields and nested_fields.
+            explode: a nested field to explode, cheaper than calling .explode() on the result.
+            categorical: True or a list of columns to return as pandas Categorical.
         """
-        if simple_fields is None:
-            simple_fields = dict()
-        if nested_fields is None:
-            nested_fields = dict()
-        
-        nested_data = []
-        for drug in self.et_root.findall("db:drug", self.ns):
-            id = text_or_none(drug.find("db:drugbank-id[@primary='true']", self.ns))
-            if id is None:
-                continue
-            name = text_or_none(drug.find("db:name", self.ns))
-            if name is None:
+        return self.extract_many([
+            (prefix_path, simple_fields, nested_fields, drug_name, drug_id, explode, categorical)
+        ], compiled=compiled)[0]
+
+    @instrumented("Parser.extract_many")
+    def extract_many(self, specs, compiled=True):
+        """
+            Runs many extractions in a single pass over the drugs.
+            Every spec is either a tuple or a dict of the `extract` arguments
+            (prefix_path, simple_fields, nested_fields, drug_name, drug_id).
+            Returns a list of DataFrames in the same order as specs.
+            With compiled=True the specs are compiled into ExtractionPlans,
+            otherwise every field is looked up with ElementPath.
+        """
+        specs = [
+            make_spec(**spec) if isinstance(spec, dict) else make_spec(*spec)
+            for spec in specs
+        ]
+        if self.cache is None:
+            return self._extract_many(specs, compiled)
+
+        # only the specs missing from the cache are extracted, still in a single pass
+        results = [self.cache.load("extract", [spec, self.ns]) for spec in specs]
+        missing = [i for i, df in enumerate(results) if df is None]
+        if missing:
+            computed = self._extract_many([specs[i] for i in missing], compiled)
+            for i, df in zip(missing, computed):
+                self.cache.store("extract", [specs[i], self.ns], df)
+                results[i] = df
+        return results
+
+    def _extract_many(self, specs, compiled):
+        if self.workers is not None:
+            chunks = self._map_chunks("_extract_many", specs, compiled)
+            return [concat_frames(frames) for frames in zip(*chunks)]
+
+        plans = [ExtractionPlan(spec, self.ns) for spec in specs] if compiled else None
+        id_tag = f"{{{self.ns['db']}}}drugbank-id"
+        name_tag = f"{{{self.ns['db']}}}name"
+        if compiled:
+            all_data = [ColumnarBuilder(plan.columns, plan.nested_columns) for plan in plans]
+        else:
+            all_data = [[] for _ in specs]
+
+        for drug in self.iter_drugs():
+            # id and name are resolved once per drug and shared by all specs
+            if compiled:
+                id, name = find_id_and_name(drug, id_tag, name_tag)
+            else:
+                id = text_or_none(drug.find("db:drugbank-id[@primary='true']", self.ns))
+                name = text_or_none(drug.find("db:name", self.ns))
+            if id is None or name is None:
                 continue
-        
-            for prefix in drug.findall(prefix_path, self.ns):
-                current_data = dict()
-                if drug_name is not None:
-                    current_data[drug_name] = name
-                if drug_id is not None:
-                    current_data[drug_id] = id
 
-                for field_name, field_path in simple_fields.items():
-                    current_data[field_name] = text_or_none(prefix.find(field_path, self.ns))
+            if compiled:
+                for plan, nested_data in zip(plans, all_data):
+                    plan.extract_rows(drug, id, name, nested_data)
+            else:
+                for spec, nested_data in zip(specs, all_data):
+                    self._extract_from_drug(drug, id, name, spec, nested_data)
+
+        if compiled:
+            return [
+                builder.to_frame(spec["explode"], spec["categorical"])
+                for spec, builder in zip(specs, all_data)
+            ]
 
-                for field_name, field_path in nested_fields.items():
-                    current_data[field_name] = [
-                        text_or_none(e) for e in prefix.findall(field_path, self.ns)
-                    ]
-                
-                nested_data.append(current_data)
+        results = []
+        for spec, nested_data in zip(specs, all_data):
+            df = pd.DataFrame(nested_data)
+            if spec["explode"] is not None:
+                df = df.explode(spec["explode"])
+            results.append(to_categorical(df, spec["categorical"]))
+        return results
 
-        return pd.DataFrame(nested_data)
+    def _extract_from_drug(self, drug, id, name, spec, nested_data):
+        """Appends a row to nested_data for every prefix_path element of the drug."""
+        drug_name = spec["drug_name"]
+        drug_id = spec["drug_id"]
+        for prefix in drug.findall(spec["prefix_path"], self.ns):
+            current_data = dict()
+            if drug_name is not None:
+                current_data[drug_name] = name
+            if drug_id is not None:
+                current_data[drug_id] = id
 
+            for field_name, field_path in spec["simple_fields"].items():
+                current_data[field_name] = text_or_none(prefix.find(field_path, self.ns))
+
+            for field_name, field_path in spec["nested_fields"].items():
+                current_data[field_name] = [
+                    text_or_none(e) for e in prefix.findall(field_path, self.ns)
+                ]
+
+            nested_data.append(current_data)
+
+    @instrumented("Parser.extract_id_name_df")
     def extract_id_name_df(self):
         """
             Returns a DataFrame with columns 'id' and 'name' containing all ids and names.
         """
+        return self._cached("extract_id_name_df", [], self._extract_id_name_df)
+
+    def _extract_id_name_df(self):
+        if self.workers is not None:
+            # later ids overwrite earlier ones, like in the serial dict
+            data = dict()
+            for df in self._map_chunks("_extract_id_name_df"):
+                data.update(zip(df["id"], df["name"]))
+            return pd.DataFrame({"id": list(data.keys()), "name": list(data.values())})
+
         data = dict()
-        for drug in self.et_root.findall("db:drug", self.ns):
+        for drug in self.iter_drugs():
             ids = drug.findall("db:drugbank-id", self.ns)
             if len(ids) == 0:
                 continue
@@ -73,9 +378,36 @@ class Parser():
             
         return pd.DataFrame(dfdict)
     
-    def extract_proteins(self):
-        nested_data = []
-        for drug in self.et_root.findall("db:drug", self.ns):
+    @instrumented("Parser.extract_proteins")
+    def extract_proteins(self, categorical=None, drug_id=None, columns=None):
+        """
+            Returns a DataFrame with a row for every target polypeptide of every drug.
+            categorical: True for PROTEIN_CATEGORICAL_COLUMNS or a list of columns to return as pandas Categorical.
+            drug_id: name of an extra column (after drug-name) with the primary drugbank-id, like in extract.
+            columns: the PROTEIN_COLUMNS to return, the external identifiers are only read for genatlas-id.
+        """
+        return self._cached(
+            "extract_proteins", proteins_cache_args(categorical, drug_id, columns),
+            lambda: self._extract_proteins(categorical, drug_id, columns),
+        )
+
+    def _extract_proteins(self, categorical, drug_id=None, columns=None):
+        if self.workers is not None:
+            return concat_frames(self._map_chunks("_extract_proteins", categorical, drug_id, columns))
+
+        if columns is None:
+            columns = PROTEIN_COLUMNS
+        unknown = set(columns) - set(PROTEIN_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown protein columns {sorted(unknown)}, expected some of {PROTEIN_COLUMNS}")
+        with_genatlas = "genatlas-id" in columns
+
+        # chromosome is derived from the locus column afterwards
+        builder_columns = [column for column in PROTEIN_COLUMNS if column != "chromosome"]
+        if drug_id is not None:
+            builder_columns.insert(1, drug_id)
+        builder = ColumnarBuilder(builder_columns)
+        for drug in self.iter_drugs():
             id = text_or_none(drug.find("db:drugbank-id[@primary='true']", self.ns))
             if id is None:
                 continue
@@ -86,15 +418,15 @@ class Parser():
             
             for target in drug.findall('db:targets/db:target', self.ns):
                 target_id = text_or_none(target.find('db:id', self.ns))
-                target_name = text_or_none(target.find('db:name', self.ns))
 
                 polypeptide = target.find('db:polypeptide', self.ns)
                 if polypeptide is None:
                     continue
                 # attributes used to extract from tag of form
                 # <polypeptide id="P00734" source="Swiss-Prot" />
-                polypeptide_id = polypeptide.attrib['id'] # assume this is the external id
-                polypeptide_source = polypeptide.attrib['source']
+                # None when they're missing, like the mock drugs, which copy nested fields without attributes
+                polypeptide_id = polypeptide.attrib.get('id') # assume this is the external id
+                polypeptide_source = polypeptide.attrib.get('source')
 
                 polypeptide_name = text_or_none(polypeptide.find('db:name', self.ns))
                 polypeptide_gene = text_or_none(polypeptide.find('db:gene-name', self.ns))
@@ -102,58 +434,101 @@ class Parser():
                 # genatlas id is actually used as the polypepide_gene field in our db
                 # but we'll extract it since it's a separate field
                 polypeptide_genatlas_id = None
-                for ext_id in polypeptide.findall('db:external-identifiers/db:external-identifier', self.ns):
-                    if ext_id.find('db:resource', self.ns).text == "GenAtlas":
-                        polypeptide_genatlas_id = ext_id.find('db:identifier', self.ns).text
+                if with_genatlas:
+                    for ext_id in polypeptide.findall('db:external-identifiers/db:external-identifier', self.ns):
+                        if text_or_none(ext_id.find('db:resource', self.ns)) == "GenAtlas":
+                            polypeptide_genatlas_id = text_or_none(ext_id.find('db:identifier', self.ns))
 
                 # locus is made of chromosome number and some more information
                 polypeptide_locus = text_or_none(polypeptide.find('db:locus', self.ns))
-                # getting the chromosome number is actually a little more complicated but this mostly works
-                # e.g. there locus can be of form "Xp22.32 and Yp11.3"
-                polypeptide_chromosome = None
-                if polypeptide_locus is not None and re.match(r'(\d+)', polypeptide_locus) is not None:
-                    polypeptide_chromosome = re.match(r'(\d+)', polypeptide_locus).group(1)
-                #polypeptide_chromosome = re.match(r'(\d+)', polypeptide_locus).group(1) if polypeptide_locus is not None else None
                 polypeptide_location = text_or_none(polypeptide.find('db:cellular-location', self.ns))
-                nested_data.append({
-                    "drug-name": name,
-                    "target-id": target_id,
-                    "source": polypeptide_source,
-                    "polypeptide-id": polypeptide_id,
-                    "polypeptide-name": polypeptide_name,
-                    "gene-name": polypeptide_gene,
-                    "genatlas-id": polypeptide_genatlas_id,
-                    "locus" : polypeptide_locus,
-                    "chromosome": polypeptide_chromosome,
-                    "location": polypeptide_location,
-                })
-
-        return pd.DataFrame(nested_data)
+                # same order as PROTEIN_COLUMNS, without chromosome
+                row = [
+                    name,
+                    target_id,
+                    polypeptide_source,
+                    polypeptide_id,
+                    polypeptide_name,
+                    polypeptide_gene,
+                    polypeptide_genatlas_id,
+                    polypeptide_locus,
+                    polypeptide_location,
+                ]
+                if drug_id is not None:
+                    row.insert(1, id)
+                builder.append(row)
+
+        df = builder.to_frame()
+        if "chromosome" in columns:
+            df.insert(df.columns.get_loc("locus") + 1, "chromosome", locus_chromosomes(df["locus"]))
+        selected = [column for column in df.columns if column in columns or column == drug_id]
+        if len(selected) != len(df.columns):
+            df = df[selected]
+        return to_categorical(df, PROTEIN_CATEGORICAL_COLUMNS if categorical is True else categorical)
     
         # Function to extract unique `type` attributes and field data
     
-    def extract_fields_and_types(self):
+    @instrumented("Parser.extract_fields_and_types")
+    def extract_fields_and_types(self, compact=False, reservoir_size=None, nested_cap=None):
+        """
+            Collects every simple field value, every nested field entry and the drug types.
+            With compact=True the values are kept in FieldPools (distinct values with counts)
+            instead of lists, so memory grows with the vocabulary and not with the dataset.
+            reservoir_size / nested_cap turn the simple / nested pools into fixed-size uniform samples.
+        """
         field_data = {}  # Stores simple fields
         nested_field_data = {}  # Stores all nested fields
         drug_types = set()
+        field_factory, nested_factory = list, list
+        if compact:
+            field_factory = lambda: FieldPool(reservoir_size)
+            nested_factory = lambda: FieldPool(nested_cap)
 
-        for drug in self.et_root.findall('db:drug', self.ns):
-            # Collect drug type
-            if 'type' in drug.attrib:
-                drug_types.add(drug.attrib['type'])
+        if self.workers is not None:
+            chunks = self._map_chunks("extract_fields_and_types", compact, reservoir_size, nested_cap)
+            for chunk_fields, chunk_nested, chunk_types in chunks:
+                for data, chunk_data, factory in (
+                    (field_data, chunk_fields, field_factory),
+                    (nested_field_data, chunk_nested, nested_factory),
+                ):
+                    for tag, values in chunk_data.items():
+                        if tag not in data:
+                            data[tag] = factory()
+                        if compact:
+                            data[tag].merge(values)
+                        else:
+                            data[tag].extend(values)
+                drug_types.update(chunk_types)
+            return field_data, nested_field_data, list(drug_types)
 
-            # Extract fields dynamically, handling nested structures
-            for field in drug:
-                tag = field.tag.split('}')[-1]
-
-                if list(field):  # If the field has nested elements, process recursively
-                    nested_field_data.setdefault(tag, []).append(self._extract_nested_field(field))
-                else:  # Otherwise, treat it as a simple field
-                    if field.text and field.text.strip():
-                        field_data.setdefault(tag, []).append(field.text.strip())
+        for drug in self.iter_drugs():
+            self.collect_fields(drug, field_data, nested_field_data, drug_types, field_factory, nested_factory)
 
         return field_data, nested_field_data, list(drug_types)
 
+    def collect_fields(self, drug, field_data, nested_field_data, drug_types, field_factory=list, nested_factory=list):
+        """
+            Adds the type and the simple and nested fields of a single drug, see extract_fields_and_types.
+            The factories create the containers of new tags (lists or FieldPools).
+        """
+        # Collect drug type
+        if 'type' in drug.attrib:
+            drug_types.add(drug.attrib['type'])
+
+        # Extract fields dynamically, handling nested structures
+        for field in drug:
+            tag = field.tag.split('}')[-1]
+
+            if list(field):  # If the field has nested elements, process recursively
+                if tag not in nested_field_data:
+                    nested_field_data[tag] = nested_factory()
+                nested_field_data[tag].append(self._extract_nested_field(field))
+            else:  # Otherwise, treat it as a simple field
+                if field.text and field.text.strip():
+                    if tag not in field_data:
+                        field_data[tag] = field_factory()
+                    field_data[tag].append(field.text.strip())
+
 
     def _extract_nested_field(self, element):
         """Recursively extracts nested field data"""
@@ -0,0 +1,240 @@
+import keyword
+import xml.etree.ElementTree as ET
+from utils.extraction_plan import resolve_path
+from utils.parallel import find_drug_ranges
+
+class DrugRecord():
+    """
+        Base of the compact records built by RecordSchema, a slot per declared field
+        plus the byte range of the drug in the file, so everything else can be read back lazily.
+    """
+    __slots__ = ("drugbank_id", "start", "end")
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in ("drugbank_id", *self.__class__.fields)}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.drugbank_id!r})"
+
+class RecordSchema():
+    """
+        The fields kept for every drug, as plain child paths relative to the <drug> element.
+        simple_fields keep the text of the first match, list_fields a tuple of the texts of all matches.
+    """
+    def __init__(self, simple_fields=None, list_fields=None, ns=None):
+        self.ns = ns if ns is not None else {"db": "http://www.drugbank.ca"}
+        self.simple_fields = dict(simple_fields or {})
+        self.list_fields = dict(list_fields or {})
+        self.paths = {}
+        for name, path in {**self.simple_fields, **self.list_fields}.items():
+            if not name.isidentifier() or keyword.iskeyword(name) or name in (*DrugRecord.__slots__, "fields"):
+                raise ValueError(f"{name} can't be a record field name")
+            tags = resolve_path(path, self.ns)
+            if not tags:
+                raise ValueError(f"{path} is not a plain child path, records support only those")
+            self.paths[name] = tags
+        fields = tuple(self.paths)
+        self.record_class = type("Record", (DrugRecord,), {"__slots__": fields, "fields": fields})
+
+    def build(self, values, drugbank_id, start, end, pool):
+        """Builds a record from the texts of every field in document order, list values are shared through pool."""
+        record = self.record_class()
+        record.drugbank_id = drugbank_id
+        record.start = start
+        record.end = end
+        for name in self.simple_fields:
+            texts = values[name]
+            setattr(record, name, texts[0] if texts else None)
+        for name in self.list_fields:
+            # values like groups repeat across drugs, keep a single copy of each
+            setattr(record, name, tuple(pool.setdefault(text, text) for text in values[name]))
+        return record
+
+# the fields most queries need
+DEFAULT_SCHEMA = RecordSchema(
+    simple_fields={"name": "db:name"},
+    list_fields={
+        "ids": "db:drugbank-id",
+        "groups": "db:groups/db:group",
+        "pathways": "db:pathways/db:pathway/db:name",
+    },
+)
+
+class RecordStore():
+    """
+        Compact records of every drug with a primary id, in document order.
+        Only the schema fields are held, other fields are parsed from the file on demand.
+    """
+    def __init__(self, file, schema, header, footer, records):
+        self.file = file
+        self.schema = schema
+        self.header = header
+        self.footer = footer
+        self.records = records
+        self.aliases = {}
+        for record in records:
+            for drug_id in getattr(record, "ids", (record.drugbank_id,)):
+                self.aliases[drug_id] = record
+            self.aliases.setdefault(record.drugbank_id, record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, drug_id):
+        return drug_id in self.aliases
+
+    def get(self, drug_id):
+        """Returns the record of the drug with the given (primary or secondary) id, or None."""
+        return self.aliases.get(drug_id)
+
+    def raw(self, record):
+        """Returns the bytes of the <drug> element of record."""
+        with open(self.file, "rb") as f:
+            f.seek(record.start)
+            return f.read(record.end - record.start)
+
+    def element(self, record):
+        """Parses the whole <drug> element of record back from the file."""
+        # wrapped in the root tags so the namespace declarations apply
+        root = ET.fromstring(self.header + self.raw(record) + self.footer)
+        return root[0]
+
+    def read_field(self, record, path, all=False):
+        """
+            Reads a field that isn't kept in the record, e.g. read_field(record, "db:description").
+            Returns the text of the first match, or a list of all texts with all=True.
+        """
+        drug = self.element(record)
+        if all:
+            return [element.text for element in drug.findall(path, self.schema.ns)]
+        element = drug.find(path, self.schema.ns)
+        return element.text if element is not None else None
+
+class _FieldNode():
+    """A node of the trie of schema paths, with the fields ending at its tag."""
+    __slots__ = ("children", "fields")
+
+    def __init__(self):
+        self.children = {}
+        self.fields = []
+
+def field_trie(schema):
+    """Merges the paths of the schema fields into a trie of tags, rooted at the <drug> element."""
+    root = _FieldNode()
+    for name, tags in schema.paths.items():
+        node = root
+        for tag in tags:
+            node = node.children.setdefault(tag, _FieldNode())
+        node.fields.append(name)
+    return root
+
+class _OpenElement():
+    __slots__ = ("node", "parts", "primary", "has_child")
+
+    def __init__(self, node, parts, primary):
+        self.node = node  # trie node, None off the schema paths
+        self.parts = parts  # text chunks, None when the text isn't needed
+        self.primary = primary
+        self.has_child = False
+
+class RecordTarget():
+    """
+        XMLParser target collecting the schema fields of every top-level drug from the parse events.
+        Elements are never created: only the text of the elements on a schema path (and of the primary
+        drugbank-id) is kept, everything else in a drug is skipped as it's parsed.
+        Finished drugs are appended to `drugs` as (primary id or None, {field: values}).
+    """
+    def __init__(self, schema):
+        self.schema = schema
+        self.trie = field_trie(schema)
+        self.drug_tag = f"{{{schema.ns['db']}}}drug"
+        self.id_tag = f"{{{schema.ns['db']}}}drugbank-id"
+        self.depth = 0
+        self.stack = []
+        self.drugbank_id = None
+        self.values = None
+        self.drugs = []
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.depth == 1:
+            return
+        if self.depth == 2:
+            node = self.trie if tag == self.drug_tag else None
+            self.drugbank_id = None
+            self.values = {name: [] for name in self.schema.paths}
+            self.stack.append(_OpenElement(node, None, False))
+            return
+        parent = self.stack[-1]
+        # like element.text, only the text before the first child counts
+        parent.has_child = True
+        node = parent.node.children.get(tag) if parent.node is not None else None
+        primary = self.depth == 3 and tag == self.id_tag and attrib.get("primary") == "true"
+        wanted = primary or (node is not None and bool(node.fields))
+        self.stack.append(_OpenElement(node, [] if wanted else None, primary))
+
+    def data(self, data):
+        if self.stack:
+            element = self.stack[-1]
+            if element.parts is not None and not element.has_child:
+                element.parts.append(data)
+
+    def end(self, tag):
+        self.depth -= 1
+        if self.depth == 0:
+            return
+        element = self.stack.pop()
+        if self.depth == 1:
+            if element.node is not None:
+                self.drugs.append((self.drugbank_id, self.values))
+            return
+        if element.parts is None:
+            return
+        text = "".join(element.parts) if element.parts else None
+        # the first primary id, like find_id_and_name
+        if element.primary and self.drugbank_id is None:
+            self.drugbank_id = text
+        if element.node is not None:
+            for name in element.node.fields:
+                self.values[name].append(text)
+
+    def close(self):
+        return None
+
+def iter_drug_fields(file, schema, block_size=1 << 16):
+    """Yields (primary id or None, {field: values}) of every top-level drug of the file at path file, see RecordTarget."""
+    target = RecordTarget(schema)
+    parser = ET.XMLParser(target=target)
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            parser.feed(block)
+            yield from target.drugs
+            target.drugs.clear()
+    parser.close()
+    yield from target.drugs
+
+def load_records(file, schema=DEFAULT_SCHEMA):
+    """
+        Builds a RecordStore from the DrugBank file at path file in a single streaming pass.
+        Only the elements on the schema paths are read, the rest of every drug is skipped while parsing,
+        so no drug is ever built as a tree. Drug byte ranges come from a raw scan of the file.
+    """
+    header, footer, ranges = find_drug_ranges(file)
+    pool = {}
+    records = []
+    count = 0
+    for drugbank_id, values in iter_drug_fields(file, schema):
+        # the raw scan and the parser see the drugs in the same order
+        if count == len(ranges):
+            raise ValueError(f"{file}: parsed more drugs than the {len(ranges)} drug tags found")
+        start, end = ranges[count]
+        count += 1
+        if drugbank_id is None:
+            continue
+        records.append(schema.build(values, drugbank_id, start, end, pool))
+    if count != len(ranges):
+        raise ValueError(f"{file}: found {len(ranges)} drug tags but parsed {count} drugs")
+    return RecordStore(file, schema, header, footer, records)
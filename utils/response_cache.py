@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+class LRUResponseCache():
+    """
+        Bounded LRU cache of serialized response bodies, keyed by endpoint and request payload.
+        Entries belong to one dataset version, the first lookup with another version empties the cache.
+        Server threads share it, every operation takes the lock.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, version, key):
+        """Returns the cached body of key for the dataset version, or None."""
+        with self._lock:
+            self._check_version(version)
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version, key, body):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.version = None
+
+    def stats(self):
+        """Hit ratio, counters and size, size_bytes counting the cached bodies only."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "maxsize": self.maxsize,
+                "size_bytes": sum(len(body) for body in self.entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def to_prometheus(self):
+        """Returns the stats in the Prometheus text exposition format, appended to /metrics."""
+        stats = self.stats()
+        lines = []
+        for name, kind, value in (
+            ("drugbank_response_cache_hits_total", "counter", stats["hits"]),
+            ("drugbank_response_cache_misses_total", "counter", stats["misses"]),
+            ("drugbank_response_cache_evictions_total", "counter", stats["evictions"]),
+            ("drugbank_response_cache_invalidations_total", "counter", stats["invalidations"]),
+            ("drugbank_response_cache_entries", "gauge", stats["entries"]),
+            ("drugbank_response_cache_bytes", "gauge", stats["size_bytes"]),
+            ("drugbank_response_cache_hit_ratio", "gauge", stats["hit_ratio"]),
+        ):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+import bisect
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from utils.cache import atomic_write
+
+# bump whenever the layout of the saved index changes
+SEARCH_INDEX_VERSION = 2
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    """Lowercased alphanumeric tokens of text with the accents stripped, "Bivalirudina®" -> ["bivalirudina"]."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_PATTERN.findall(text)
+
+def token_trigrams(token):
+    """Trigrams of a token padded with spaces, so short tokens and word starts get their own."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex():
+    """
+        Inverted index from the tokens of drug names, synonyms and product names to drugs.
+        Drugs are numbered in the order they were added, postings are sorted tuples of those numbers.
+        Terms are kept sorted for prefix lookups, trigrams of the terms (optional) for fuzzy ones.
+    """
+    def __init__(self, drug_ids, names, postings, term_trigrams=None):
+        self.drug_ids = drug_ids
+        self.names = names
+        self.postings = postings
+        self.terms = sorted(postings)
+        # trigram -> indices into self.terms
+        self.term_trigrams = term_trigrams
+
+    def __len__(self):
+        return len(self.drug_ids)
+
+    def _exact(self, token):
+        return set(self.postings.get(token, ()))
+
+    def _prefix(self, token):
+        start = bisect.bisect_left(self.terms, token)
+        end = bisect.bisect_left(self.terms, token + "\uffff")
+        matches = set()
+        for term in self.terms[start:end]:
+            matches.update(self.postings[term])
+        return matches
+
+    def _fuzzy(self, token, min_similarity):
+        """Drugs of the terms sharing enough trigrams with token, with the best similarity of each drug."""
+        if self.term_trigrams is None:
+            raise ValueError("fuzzy search needs an index built with trigrams=True")
+        query = token_trigrams(token)
+        shared = defaultdict(int)
+        for trigram in query:
+            for term_index in self.term_trigrams.get(trigram, ()):
+                shared[term_index] += 1
+        scores = {}
+        for term_index, count in shared.items():
+            term = self.terms[term_index]
+            # jaccard similarity of the trigram sets
+            similarity = count / (len(query) + len(token_trigrams(term)) - count)
+            if similarity < min_similarity:
+                continue
+            for drug in self.postings[term]:
+                if similarity > scores.get(drug, 0):
+                    scores[drug] = similarity
+        return scores
+
+    def search(self, query, mode="exact", limit=20, min_similarity=0.3):
+        """
+            Returns up to limit (drugbank_id, name, score) tuples of the drugs matching every token of query.
+            mode="exact" matches whole tokens, "prefix" tokens starting with the query tokens
+            and "fuzzy" tokens with a trigram similarity of at least min_similarity.
+            Exact and prefix matches score 1 and come in drug order, fuzzy ones by descending score.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        if mode == "fuzzy":
+            scores = None
+            for token in tokens:
+                token_scores = self._fuzzy(token, min_similarity)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {drug: score + token_scores[drug] for drug, score in scores.items() if drug in token_scores}
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [(self.drug_ids[drug], self.names[drug], score / len(tokens)) for drug, score in ranked]
+
+        if mode == "exact":
+            lookup = self._exact
+        elif mode == "prefix":
+            lookup = self._prefix
+        else:
+            raise ValueError(f"Unknown search mode {mode}, expected exact, prefix or fuzzy")
+        # rarest token first, so the intersection shrinks fast
+        matches = None
+        for token in sorted(tokens, key=lambda token: len(self.postings.get(token, ()))):
+            token_matches = lookup(token)
+            matches = token_matches if matches is None else matches & token_matches
+            if not matches:
+                return []
+        return [(self.drug_ids[drug], self.names[drug], 1.0) for drug in sorted(matches)[:limit]]
+
+    def save(self, path):
+        """
+            Writes the index as JSON.
+            Not pickled, loading a pickle from a writable cache dir would run whatever code it holds.
+        """
+        with atomic_write(path) as f:
+            json.dump({
+                "version": SEARCH_INDEX_VERSION,
+                "drug_ids": list(self.drug_ids),
+                "names": list(self.names),
+                "postings": self.postings,
+                "term_trigrams": self.term_trigrams,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with save, None if the file is missing or of another version."""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != SEARCH_INDEX_VERSION:
+            return None
+        term_trigrams = state["term_trigrams"]
+        if term_trigrams is not None:
+            term_trigrams = {trigram: tuple(terms) for trigram, terms in term_trigrams.items()}
+        postings = {term: tuple(drugs) for term, drugs in state["postings"].items()}
+        return cls(state["drug_ids"], state["names"], postings, term_trigrams)
+
+def build_search_index(entries, trigrams=True):
+    """
+        Builds a SearchIndex from (drugbank_id, name, texts) entries,
+        texts being every other string the drug should be found by (synonyms, product names).
+    """
+    drug_ids = []
+    names = []
+    postings = defaultdict(set)
+    for drug, (drug_id, name, texts) in enumerate(entries):
+        drug_ids.append(drug_id)
+        names.append(name)
+        for text in (name, *texts):
+            if isinstance(text, str):
+                for token in tokenize(text):
+                    postings[token].add(drug)
+    postings = {token: tuple(sorted(drugs)) for token, drugs in postings.items()}
+
+    term_trigrams = None
+    if trigrams:
+        term_trigrams = defaultdict(list)
+        for term_index, term in enumerate(sorted(postings)):
+            for trigram in token_trigrams(term):
+                term_trigrams[trigram].append(term_index)
+        term_trigrams = {trigram: tuple(terms) for trigram, terms in term_trigrams.items()}
+    return SearchIndex(drug_ids, names, postings, term_trigrams)
+
+def search_index_from_drug_index(index, trigrams=True):
+    """Builds the SearchIndex of the names, synonyms and product names of a DrugIndex."""
+    return build_search_index(
+        (
+            (primary, record["name"], (*record["synonyms"], *record["products"]))
+            for primary, record in index.records.items()
+        ),
+        trigrams=trigrams,
+    )
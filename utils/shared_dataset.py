@@ -0,0 +1,365 @@
+import bisect
+import json
+import mmap
+import operator
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.cache import atomic_write
+from utils.dataset import Dataset, load_dataset
+from utils.drug_index import DrugIndex
+from utils.offset_index import OffsetIndex
+from utils.search import SearchIndex
+
+# bump whenever the layout of a snapshot changes
+SNAPSHOT_VERSION = 3
+
+# name of the file pointing at the current snapshot of a snapshot dir, workers watch it
+POINTER_NAME = "current.json"
+
+class SharedDrugIndex(DrugIndex):
+    """
+        Read-only DrugIndex over the arrays of a snapshot, memory mapped so every worker
+        attaching to the same snapshot shares a single copy of the pages.
+        Ids are kept sorted for binary search, records are JSON decoded on every lookup.
+    """
+    def __init__(self, ids, slots, offsets, records):
+        # every primary and secondary id, sorted, with the number of its record
+        self.ids = ids
+        self.slots = slots
+        # record i is records[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self.records = records
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _slot(self, drug_id):
+        position = int(np.searchsorted(self.ids, drug_id))
+        if position == len(self.ids) or self.ids[position] != drug_id:
+            return None
+        return int(self.slots[position])
+
+    def __contains__(self, drug_id):
+        return self._slot(drug_id) is not None
+
+    def get(self, drug_id):
+        """Returns the record of the drug with the given (primary or secondary) id, or None."""
+        slot = self._slot(drug_id)
+        if slot is None:
+            return None
+        return json.loads(self.records[int(self.offsets[slot]):int(self.offsets[slot + 1])])
+
+class MappedStrings():
+    """
+        Read-only sequence of the strings written by _write_strings: UTF-8 bytes back to back
+        and an offsets array, string i is blob[offsets[i]:offsets[i + 1]], decoded on access.
+    """
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("MappedStrings index out of range")
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class MappedTable():
+    """
+        Read-only dict of sorted string keys to tuples of ints, written by _write_table.
+        The values of key i are values[offsets[i]:offsets[i + 1]], keys are found by binary search.
+    """
+    def __init__(self, keys, offsets, values):
+        self.keys = keys
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _position(self, key):
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            return None
+        return position
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def get(self, key, default=None):
+        position = self._position(key)
+        if position is None:
+            return default
+        return tuple(self.values[int(self.offsets[position]):int(self.offsets[position + 1])].tolist())
+
+    def __getitem__(self, key):
+        values = self.get(key)
+        if values is None:
+            raise KeyError(key)
+        return values
+
+class SharedSearchIndex(SearchIndex):
+    """
+        SearchIndex over the memory mapped tables of a snapshot, so the postings and trigrams
+        of every name, synonym and product are shared by the workers instead of loaded by each.
+    """
+    def __init__(self, drug_ids, names, postings, term_trigrams=None):
+        self.drug_ids = drug_ids
+        self.names = names
+        self.postings = postings
+        # the postings are keyed by the sorted terms already
+        self.terms = postings.keys
+        self.term_trigrams = term_trigrams
+
+class SharedPathwayCounts():
+    """
+        Read-only stand-in for the pathway counts Series over the arrays of a snapshot,
+        with the lookups the server does. Ids are kept sorted for binary search,
+        order gives the positions of the ids in the order of the Series.
+    """
+    def __init__(self, ids, counts, order):
+        self.ids = ids
+        self.counts = counts
+        self.order = order
+        self.index = SharedPathwayIds(self)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, drug_ids):
+        """Positions of drug_ids in ids, -1 for the missing ones."""
+        drug_ids = np.asarray(drug_ids, dtype=str)
+        positions = np.searchsorted(self.ids, drug_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == drug_ids[found]
+        return np.where(found, positions, -1)
+
+    def __getitem__(self, drug_id):
+        position = self._positions([drug_id])[0]
+        if position < 0:
+            raise KeyError(drug_id)
+        return int(self.counts[position])
+
+    def reindex(self, drug_ids):
+        """Counts of drug_ids as a Series, NaN for the missing ones, like pd.Series.reindex."""
+        positions = self._positions(drug_ids)
+        found = positions >= 0
+        counts = np.asarray(self.counts)[positions[found]]
+        if found.all():
+            values = counts.astype("int64")
+        else:
+            values = np.full(len(positions), np.nan)
+            values[found] = counts
+        return pd.Series(values, index=pd.Index(list(drug_ids), name="id"), name="pathway-name")
+
+    def to_series(self):
+        """The whole Series, copied out of the mapping."""
+        order = np.asarray(self.order)
+        return pd.Series(
+            np.asarray(self.counts)[order].astype("int64"),
+            index=pd.Index(np.asarray(self.ids)[order].tolist(), name="id"),
+            name="pathway-name",
+        )
+
+class SharedPathwayIds():
+    """The index of a SharedPathwayCounts, ids in the order of the Series."""
+    def __init__(self, counts):
+        self._counts = counts
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, drug_id):
+        return self._counts._positions([drug_id])[0] >= 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [str(drug_id) for drug_id in self._counts.ids[self._counts.order[i]]]
+        return str(self._counts.ids[self._counts.order[i]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def _write_strings(directory, name, strings):
+    """Writes strings as name.bin and their offsets as name_offsets.npy, read back by MappedStrings."""
+    offsets = [0]
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for string in strings:
+            body = string.encode("utf-8")
+            f.write(body)
+            offsets.append(offsets[-1] + len(body))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), np.array(offsets, dtype="int64"))
+
+def _write_table(directory, name, table):
+    """Writes a dict of string keys to sequences of ints as sorted keys and CSR arrays, read back by MappedTable."""
+    keys = sorted(table)
+    _write_strings(directory, f"{name}_keys", keys)
+    lengths = [len(table[key]) for key in keys]
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), np.concatenate([[0], np.cumsum(lengths, dtype="int64")]))
+    values = np.fromiter((value for key in keys for value in table[key]), dtype="int64", count=sum(lengths))
+    np.save(os.path.join(directory, f"{name}_values.npy"), values)
+
+def _write_snapshot_files(dataset, directory):
+    """Writes the serving tables of dataset into the existing directory."""
+    index = dataset.index
+    slots = {primary: slot for slot, primary in enumerate(index.records)}
+    _write_strings(directory, "records", (json.dumps(record) for record in index.records.values()))
+    ids = sorted(index.aliases)
+    np.save(os.path.join(directory, "ids.npy"), np.array(ids, dtype=str))
+    np.save(os.path.join(directory, "slots.npy"), np.array([slots[index.aliases[drug_id]] for drug_id in ids], dtype="int64"))
+
+    pathway_counts = dataset.pathway_counts.sort_index()
+    np.save(os.path.join(directory, "pathway_ids.npy"), np.array(pathway_counts.index, dtype=str))
+    np.save(os.path.join(directory, "pathway_counts.npy"), pathway_counts.to_numpy(dtype="int64"))
+    # positions of the ids in the order of the Series, so lookups in it keep that order
+    np.save(
+        os.path.join(directory, "pathway_order.npy"),
+        pathway_counts.index.get_indexer(dataset.pathway_counts.index).astype("int64"),
+    )
+
+    search = dataset.search
+    if search is not None:
+        _write_strings(directory, "search_drug_ids", search.drug_ids)
+        _write_strings(directory, "search_names", search.names)
+        _write_table(directory, "search_postings", search.postings)
+        if search.term_trigrams is not None:
+            _write_table(directory, "search_trigrams", search.term_trigrams)
+    if dataset.offsets is not None:
+        dataset.offsets.save(os.path.join(directory, "offsets.idx"))
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "snapshot_version": SNAPSHOT_VERSION,
+            "file": dataset.file,
+            "version": dataset.version,
+            "build_seconds": dataset.build_seconds,
+            "built_at": dataset.built_at.isoformat(),
+            "modified_at": dataset.modified_at.isoformat(),
+        }, f)
+
+def write_snapshot(dataset, directory):
+    """
+        Writes the serving tables of dataset to a new directory, atomically:
+        everything goes to a temporary directory first, renamed once it's complete
+        and removed if writing fails.
+    """
+    tmp_directory = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+        _write_snapshot_files(dataset, tmp_directory)
+        os.replace(tmp_directory, directory)
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+    return directory
+
+def publish_snapshot(dataset, snapshot_dir, keep=2):
+    """
+        Writes a snapshot of dataset to snapshot_dir and points POINTER_NAME at it.
+        Only the newest keep snapshots are left, workers still mapping an older one keep their pages
+        until they attach to the new one (unlinking a mapped file doesn't invalidate the mapping).
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    name = f"{dataset.version}-{time.time_ns()}"
+    write_snapshot(dataset, os.path.join(snapshot_dir, name))
+    pointer = os.path.join(snapshot_dir, POINTER_NAME)
+    with atomic_write(pointer) as f:
+        json.dump({"snapshot": name}, f)
+
+    snapshots = sorted(
+        (
+            entry for entry in os.listdir(snapshot_dir)
+            if not entry.endswith(".tmp") and os.path.isfile(os.path.join(snapshot_dir, entry, "meta.json"))
+        ),
+        key=lambda entry: int(entry.rsplit("-", 1)[-1]),
+    )
+    for old in snapshots[:-keep]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+    return pointer
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        # an empty file can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def attach_snapshot(directory):
+    """
+        Returns a Dataset backed by the snapshot in directory.
+        Its tables are memory mapped read-only, so the pages are shared by every worker attached to it.
+    """
+    start = time.perf_counter()
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["snapshot_version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"{directory} is a snapshot of version {meta['snapshot_version']}, expected {SNAPSHOT_VERSION}")
+
+    def path(name):
+        return os.path.join(directory, name)
+
+    def array(name):
+        return np.load(path(f"{name}.npy"), mmap_mode="r")
+
+    def strings(name):
+        return MappedStrings(_map_file(path(f"{name}.bin")), array(f"{name}_offsets"))
+
+    def table(name):
+        return MappedTable(strings(f"{name}_keys"), array(f"{name}_offsets"), array(f"{name}_values"))
+
+    records = strings("records")
+    index = SharedDrugIndex(array("ids"), array("slots"), records.offsets, records.blob)
+    pathway_counts = SharedPathwayCounts(array("pathway_ids"), array("pathway_counts"), array("pathway_order"))
+    search = None
+    if os.path.exists(path("search_names.bin")):
+        term_trigrams = table("search_trigrams") if os.path.exists(path("search_trigrams_keys.bin")) else None
+        search = SharedSearchIndex(
+            strings("search_drug_ids"), strings("search_names"), table("search_postings"), term_trigrams
+        )
+    offsets = None
+    if os.path.exists(path("offsets.idx")):
+        # rebuilt in memory by a raw scan if the file changed after the snapshot was written,
+        # a published snapshot is never written to since every worker reads it
+        offsets = OffsetIndex.load(meta["file"], path("offsets.idx")) or OffsetIndex.build(meta["file"])
+
+    dataset = Dataset(
+        meta["file"], meta["version"], index, pathway_counts, time.perf_counter() - start, search, offsets,
+        datetime.fromisoformat(meta["modified_at"]),
+    )
+    dataset.built_at = datetime.fromisoformat(meta["built_at"])
+    return dataset
+
+def attach_dataset(pointer, cache_dir=None):
+    """
+        Loader for a worker's DatasetHolder: attaches to the snapshot POINTER_NAME points at.
+        The holder watches the pointer, so a worker attaches again whenever the loader publishes.
+    """
+    with open(pointer, encoding="utf-8") as f:
+        name = json.load(f)["snapshot"]
+    return attach_snapshot(os.path.join(os.path.dirname(pointer), name))
+
+def publishing_loader(snapshot_dir):
+    """
+        Loader for the DatasetHolder of the loader process: parses the file as usual
+        and publishes every dataset it builds to snapshot_dir.
+    """
+    def load(file, cache_dir=None):
+        dataset = load_dataset(file, cache_dir)
+        publish_snapshot(dataset, snapshot_dir)
+        return dataset
+    return load
@@ -1,48 +1,223 @@
-import requests
-import pandas as pd
-import matplotlib.pyplot as plt
-from collections import Counter
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import httpx
+from utils.cache import atomic_write
 
 # Base UniProt API URL
 UNIPROT_API_URL = "https://rest.uniprot.org/uniprotkb/search"
+UNIPROT_FIELDS = "date_created,protein_families"
+# statuses worth retrying, everything else is reported as an error right away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# largest page the search endpoint accepts, bigger requests follow the Link header
+MAX_PAGE_SIZE = 500
+
+def build_query(names):
+    """Query for one name, or an OR-joined query for several."""
+    if len(names) == 1:
+        return f"protein_name={names[0]}"
+    return " OR ".join(f"(protein_name={name})" for name in names)
+
+def collect_results(data, creation_dates, families):
+    """Adds the creation dates and families of a UniProt search response."""
+    for result in data.get("results", []):
+        # Dates
+        date_str = result["entryAudit"]["firstPublicDate"]
+        creation_dates.append(date_str)
+        # and Families
+        for comment in result.get("comments", []):
+            if comment.get("commentType") == "SIMILARITY":
+                for text in comment.get("texts", []):
+                    family = text.get("value")
+                    if family:
+                        families.add(family)
+
+class TokenBucket():
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`."""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class ResponseCache():
+    """Successful responses stored as JSON files, keyed by a hash of the request parameters."""
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, params):
+        key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, params):
+        path = self._path(params)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, params, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with atomic_write(self._path(params)) as f:
+            json.dump(data, f)
+
+class UniProtClient():
+    """
+        Async UniProt search client with a pooled connection, bounded concurrency,
+        a token-bucket rate limit, retries with exponential backoff on 429/5xx
+        and an optional on-disk response cache.
+        Use as `async with UniProtClient() as client: ...`.
+    """
+    def __init__(self, url=UNIPROT_API_URL, concurrency=8, rate=10, max_retries=5, backoff=0.5,
+                 cache_dir=None, timeout=30):
+        self.url = url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.cache = ResponseCache(cache_dir) if cache_dir is not None else None
+        self.stats = {"requests": 0, "cache_hits": 0, "retries": 0, "errors": 0}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._session = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.aclose()
+        self._session = None
+
+    async def search(self, query, size=None, label=None):
+        """
+            Returns the decoded JSON response for query, or None if it failed.
+            With size, pages of at most MAX_PAGE_SIZE entries are followed until size entries are read.
+            label names the query in error messages, the query itself by default.
+        """
+        label = label if label is not None else query
+        params = {"query": query, "fields": UNIPROT_FIELDS, "format": "json"}
+        cache_key = params
+        if size is not None:
+            params["size"] = min(size, MAX_PAGE_SIZE)
+            cache_key = {**params, "total": size}
+        if self.cache is not None:
+            data = self.cache.get(cache_key)
+            if data is not None:
+                self.stats["cache_hits"] += 1
+                return data
+
+        async with self._semaphore:
+            page = await self._get(self.url, params, label)
+            if page is None:
+                return None
+            data, next_url = page
+            # without a size only the first page is read, like a plain search
+            while size is not None and next_url is not None and len(data.get("results", [])) < size:
+                page = await self._get(next_url, None, label)
+                if page is None:
+                    return None
+                more, next_url = page
+                data["results"] = data.get("results", []) + more.get("results", [])
+            if size is not None:
+                data["results"] = data.get("results", [])[:size]
+
+        if self.cache is not None:
+            self.cache.put(cache_key, data)
+        return data
+
+    async def _get(self, url, params, label):
+        """One page with retries, returns (decoded JSON, URL of the next page or None), or None if it failed."""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                response = await self._session.get(url, params=params)
+            except httpx.TransportError as e:
+                error, delay = e, self.backoff * 2 ** attempt
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                print(f"Error fetching data for {label}: {e}")
+                return None
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()  # Raise an error for bad responses (4xx)
+                        data = response.json()
+                    except (ValueError, httpx.HTTPError) as e:
+                        # error statuses and bodies that aren't JSON
+                        self.stats["errors"] += 1
+                        print(f"Error fetching data for {label}: {e}")
+                        return None
+                    return data, response.links.get("next", {}).get("url")
+                error = f"status {response.status_code}"
+                delay = self._retry_after(response, attempt)
+
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+        self.stats["errors"] += 1
+        print(f"Error fetching data for {label}: {error}")
+        return None
+
+    def _retry_after(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return int(retry_after)
+        return self.backoff * 2 ** attempt
+
+    async def fetch(self, polypeptide_names, batch_size=1):
+        """
+            Async version of fetch_uniprot. With batch_size > 1 names are sent as OR-joined queries,
+            entries matching several names of a batch are then counted once.
+        """
+        names = list(polypeptide_names)
+        batches = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+        # a batch asks for as many entries as its names would have got separately (25 is the default page)
+        size = None if batch_size == 1 else 25 * batch_size
+        responses = await asyncio.gather(*(
+            self.search(build_query(batch), size, label=", ".join(batch)) for batch in batches
+        ))
+
+        creation_dates = []
+        families = set()
+        for data in responses:
+            if data is not None:
+                collect_results(data, creation_dates, families)
+
+        creation_years = [datetime.strptime(date, "%Y-%m-%d").year for date in creation_dates]
+        return creation_years, families
+
+def _run(coroutine):
+    # asyncio.run can't be used inside a running loop (e.g. a notebook), use a helper thread there
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
 
-def fetch_uniprot(polypeptide_names):
+def fetch_uniprot(polypeptide_names, concurrency=8, rate=10, cache_dir=None, batch_size=1, url=UNIPROT_API_URL):
     """Fetches the creation dates of proteins given a list of polypeptide names."""
-    creation_dates = []
-    families = set()
-
-    for name in polypeptide_names:
-        query = f"protein_name={name}"
-        params = {
-            "query": query,
-            "fields": "date_created,protein_families",
-            "format": "json"
-        }
-
-        try:
-            response = requests.get(UNIPROT_API_URL, params=params)
-            response.raise_for_status()  # Raise an error for bad responses (4xx, 5xx)
-            data = response.json()
-
-            for result in data.get("results", []):
-                # Dates
-                date_str = result["entryAudit"]["firstPublicDate"]
-                creation_dates.append(date_str)
-                # and Families
-                for comment in result.get("comments", []):
-                    if comment.get("commentType") == "SIMILARITY":
-                        for text in comment.get("texts", []):
-                            family = text.get("value")
-                            if family:
-                                families.add(family)
-
-
-            # time.sleep(1)  # Pause to avoid rate limits
-
-        except requests.RequestException as e:
-            print(f"Error fetching data for {name}: {e}")
-
-    creation_years = [datetime.strptime(date, "%Y-%m-%d").year for date in creation_dates]
-    return creation_years, families
\ No newline at end of file
+    async def fetch():
+        async with UniProtClient(url, concurrency=concurrency, rate=rate, cache_dir=cache_dir) as client:
+            return await client.fetch(polypeptide_names, batch_size=batch_size)
+    return _run(fetch())